@@ -1,40 +1,314 @@
-from flask import Flask, request, send_file, jsonify, render_template_string
-import pandas as pd
-import requests
-from bs4 import BeautifulSoup
+from flask import Flask, request, send_file, jsonify, render_template_string, Response, stream_with_context
 import re
+import json
 import time
 import os
-import random
 from werkzeug.utils import secure_filename
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
 import threading
-from concurrent.futures import ThreadPoolExecutor
+import uuid
+from urllib.parse import urlsplit
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import OrderedDict, deque
+from itertools import islice
 import logging
+import contact_extractor
+import metrics
+import tracing
+from async_search import AsyncSearchEngine
+from field_plan import MergedResult, meets_completeness, wanted_source
+from backoff import RETRYABLE_STATUSES, RetryPolicy, parse_retry_after
+from circuit_breaker import STATE_VALUES, CircuitBreakers, breaker_key
+from crawler import ContactCrawler, site_root
+from driver_pool import DriverPool, chrome_available, create_chrome_driver
+from contact_cache import ContactCache, DAY
+from company_names import canonicalize_company_name
+from source_stats import SourceStats
+from dns_cache import DomainResolver, NegativeDNSCache
+from page_store import PageStore
+from rate_limit import DEFAULT_HOST_RATES, HostRateLimiter, host_key, parse_host_rates
+from search_urls import DEFAULT_SEARCH_URLS, parse_search_urls, parse_sources, search_url
+from company_io import (SUPPORTED_EXTENSIONS, MissingCompanyColumn, ResultWriter,
+                        count_company_rows, iter_company_names)
+from job_journal import JobJournal, unfinished_jobs
+from row_queue import RowQueue
+from jobs import JobManager, JobQueueFull, new_progress_data
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['RESULT_FOLDER'] = 'results'
-
-# สร้าง folder หากไม่มี
-for folder in [app.config['UPLOAD_FOLDER'], app.config['RESULT_FOLDER']]:
-    if not os.path.exists(folder):
-        os.makedirs(folder)
+# จำนวน worker ที่ค้นหาบริษัทพร้อมกัน (แต่ละ worker มี session และ driver ของตัวเอง)
+app.config['MAX_WORKERS'] = int(os.environ.get('MAX_WORKERS', 4))
+# ค้นหาจากทุกแหล่งพร้อมกัน (asyncio) และหยุดเมื่อได้ข้อมูลครบตาม REQUIRED_FIELDS
+app.config['ASYNC_SEARCH'] = os.environ.get('ASYNC_SEARCH', '1') != '0'
+app.config['REQUIRED_FIELDS'] = tuple(
+    field for field in os.environ.get('REQUIRED_FIELDS', 'email,phone').split(',') if field
+)
+# Chrome ที่เปิดค้างไว้ใช้ร่วมกันทุก worker และทุกงาน
+app.config['DRIVER_POOL_SIZE'] = int(os.environ.get('DRIVER_POOL_SIZE', 2))
+app.config['DRIVER_MAX_PAGES'] = int(os.environ.get('DRIVER_MAX_PAGES', 100))
+app.config['DRIVER_MAX_MEMORY_MB'] = int(os.environ.get('DRIVER_MAX_MEMORY_MB', 512))
+# Cache ผลการค้นหาข้ามงาน (ตั้ง CACHE_PATH เป็นค่าว่างเพื่อปิด)
+app.config['CACHE_PATH'] = os.environ.get('CACHE_PATH', os.path.join('cache', 'contacts.sqlite3'))
+app.config['CACHE_TTL_DAYS'] = float(os.environ.get('CACHE_TTL_DAYS', 30))
+app.config['CACHE_NEGATIVE_TTL_DAYS'] = float(os.environ.get('CACHE_NEGATIVE_TTL_DAYS', 3))
+app.config['CACHE_MAX_ENTRIES'] = int(os.environ.get('CACHE_MAX_ENTRIES', 100000))
+# อ่านไฟล์ทีละแถว: จำนวนแถวที่ส่งให้ worker ล่วงหน้าต่อ worker และจำนวนชื่อที่จำไว้รวมแถวซ้ำ
+app.config['STREAM_WINDOW_PER_WORKER'] = int(os.environ.get('STREAM_WINDOW_PER_WORKER', 16))
+app.config['DEDUPE_MEMORY'] = int(os.environ.get('DEDUPE_MEMORY', 50000))
+# จำนวนงาน (ไฟล์) ที่รันพร้อมกัน และจำนวนงานที่รอคิวได้ก่อนปฏิเสธการอัปโหลด
+app.config['MAX_CONCURRENT_JOBS'] = int(os.environ.get('MAX_CONCURRENT_JOBS', 2))
+app.config['MAX_QUEUED_JOBS'] = int(os.environ.get('MAX_QUEUED_JOBS', 10))
+app.config['SSE_HEARTBEAT_SECONDS'] = float(os.environ.get('SSE_HEARTBEAT_SECONDS', 15))
+# อัตรา request ต่อ host เช่น "google.com=0.3:2,bing.com=1:3" (request/วินาที:burst)
+# host ที่ไม่ได้ระบุใช้ค่าเริ่มต้นใน rate_limit.DEFAULT_HOST_RATES หรือ DEFAULT_HOST_RATE
+app.config['HOST_RATES'] = {**DEFAULT_HOST_RATES, **parse_host_rates(os.environ.get('HOST_RATES', ''))}
+app.config['DEFAULT_HOST_RATE'] = float(os.environ.get('DEFAULT_HOST_RATE', 2))
+app.config['DEFAULT_HOST_BURST'] = int(os.environ.get('DEFAULT_HOST_BURST', 5))
+app.config['RATE_LIMIT_JITTER'] = float(os.environ.get('RATE_LIMIT_JITTER', 0.5))
+# จัดลำดับ/ข้ามแหล่งค้นหาตามสถิติอัตราที่พบข้อมูลและเวลา (0 = ใช้ลำดับเดิมเสมอ)
+app.config['ADAPTIVE_SOURCES'] = os.environ.get('ADAPTIVE_SOURCES', '1') != '0'
+app.config['SOURCE_STATS_PATH'] = os.environ.get('SOURCE_STATS_PATH', os.path.join('cache', 'source_stats.json'))
+# ผลเก่าของแต่ละแหล่งมีน้ำหนักลดลงครึ่งหนึ่งทุกกี่ชั่วโมง และนับย้อนหลังไม่เกินกี่ครั้ง
+app.config['SOURCE_STATS_HALF_LIFE_HOURS'] = float(os.environ.get('SOURCE_STATS_HALF_LIFE_HOURS', 24))
+app.config['SOURCE_STATS_WINDOW'] = int(os.environ.get('SOURCE_STATS_WINDOW', 200))
+# เดาโดเมนบริษัท: resolve DNS ก่อนยิง HTTP และจำชื่อที่ไม่มีอยู่จริงไว้ ('' = ไม่จำ)
+app.config['DNS_CACHE_PATH'] = os.environ.get('DNS_CACHE_PATH', os.path.join('cache', 'dns.sqlite3'))
+app.config['DNS_NEGATIVE_TTL_HOURS'] = float(os.environ.get('DNS_NEGATIVE_TTL_HOURS', 24))
+app.config['DNS_TIMEOUT'] = float(os.environ.get('DNS_TIMEOUT', 2))
+app.config['DIRECT_CONNECT_TIMEOUT'] = float(os.environ.get('DIRECT_CONNECT_TIMEOUT', 3))
+app.config['DIRECT_MAX_BYTES'] = int(os.environ.get('DIRECT_MAX_BYTES', 512 * 1024))
+# หยุดอ่าน body ของหน้าค้นหาและไดเรกทอรีเมื่อเกินขนาดนี้
+app.config['MAX_PAGE_BYTES'] = int(os.environ.get('MAX_PAGE_BYTES', 2 * 1024 * 1024))
+# เก็บหน้าเว็บดิบ (บีบอัด) ไว้ดึงข้อมูลใหม่ด้วย reextract.py โดยไม่ต้องค้นหาใหม่ ('' = ปิด)
+app.config['PAGE_STORE_PATH'] = os.environ.get('PAGE_STORE_PATH', '')
+app.config['PAGE_STORE_MAX_MB'] = int(os.environ.get('PAGE_STORE_MAX_MB', 1024))
+# เปิดหน้าติดต่อของเว็บไซต์ที่พบเมื่อยังขาด email/phone: จำนวนหน้า ชั้นลิงก์ และเวลาสูงสุดต่อแถว
+app.config['CRAWL_CONTACT_PAGES'] = os.environ.get('CRAWL_CONTACT_PAGES', '1') != '0'
+app.config['CRAWL_MAX_PAGES'] = int(os.environ.get('CRAWL_MAX_PAGES', 6))
+app.config['CRAWL_MAX_DEPTH'] = int(os.environ.get('CRAWL_MAX_DEPTH', 1))
+app.config['CRAWL_DEADLINE'] = float(os.environ.get('CRAWL_DEADLINE', 8))
+app.config['CRAWL_CONCURRENCY'] = int(os.environ.get('CRAWL_CONCURRENCY', 4))
+# URL ของแหล่งค้นหา เช่น "bing=http://127.0.0.1:8000/bing?q={query}" (ใช้กับ server จำลองของ bench_search.py)
+app.config['SEARCH_URLS'] = {**DEFAULT_SEARCH_URLS, **parse_search_urls(os.environ.get('SEARCH_URLS', ''))}
+# ค้นหา Google ผ่าน Selenium (0 = ใช้เฉพาะแหล่งที่ดึงด้วย HTTP)
+app.config['SELENIUM_SEARCH'] = os.environ.get('SELENIUM_SEARCH', '1') != '0'
+# แหล่งค้นหาที่ใช้ เช่น "duckduckgo,bing,direct" (ค่าว่าง = ทุกแหล่ง ดูชื่อใน search_urls.SOURCE_ALIASES)
+app.config['SEARCH_SOURCES'] = parse_sources(os.environ.get('SEARCH_SOURCES', ''))
+# บันทึก span ของทุกแถวเป็นไฟล์ trace (เปิดด้วย chrome://tracing) ดาวน์โหลดได้คู่กับไฟล์ผลลัพธ์
+app.config['TRACE_JOBS'] = os.environ.get('TRACE_JOBS', '0') != '0'
+app.config['TRACE_MAX_EVENTS'] = int(os.environ.get('TRACE_MAX_EVENTS', 200000))
+# connection pool ของ requests ต่อ worker: จำนวน host ที่เก็บ keep-alive ไว้ และ connection ต่อ host
+app.config['HTTP_POOL_HOSTS'] = int(os.environ.get('HTTP_POOL_HOSTS', 64))
+app.config['HTTP_POOL_PER_HOST'] = int(os.environ.get('HTTP_POOL_PER_HOST', 2))
+# ลองใหม่เมื่อได้ 429/5xx หรือ connection หลุดกลางทาง (เฉพาะ GET) รอแบบ exponential backoff + jitter
+app.config['HTTP_RETRIES'] = int(os.environ.get('HTTP_RETRIES', 2))
+app.config['HTTP_BACKOFF'] = float(os.environ.get('HTTP_BACKOFF', 0.5))
+app.config['HTTP_BACKOFF_MAX'] = float(os.environ.get('HTTP_BACKOFF_MAX', 10))
+# พักแหล่งค้นหาที่ถูกบล็อก (429/403/captcha) ติดกันครบ BREAKER_THRESHOLD แถว (0 = ไม่พัก)
+# เป็นเวลา BREAKER_COOLDOWN วินาที แล้วลองใหม่หนึ่งแถว ถ้ายังถูกบล็อกพักนานขึ้นเท่าตัว (ไม่เกิน BREAKER_MAX_COOLDOWN)
+app.config['BREAKER_THRESHOLD'] = int(os.environ.get('BREAKER_THRESHOLD', 3))
+app.config['BREAKER_COOLDOWN'] = float(os.environ.get('BREAKER_COOLDOWN', 300))
+app.config['BREAKER_MAX_COOLDOWN'] = float(os.environ.get('BREAKER_MAX_COOLDOWN', 3600))
+# journal ของงานที่ยังไม่เสร็จ ใช้ทำงานต่อหลังโปรเซสล่มหรือรีสตาร์ท
+app.config['JOURNAL_FOLDER'] = os.environ.get('JOURNAL_FOLDER', os.path.join('results', 'journals'))
+# คิวแถวใน SQLite ที่ worker แยกโปรเซส (queue_worker.py) ยืมไปค้นหา ค่าว่าง = ค้นหาในโปรเซสเว็บเอง
+app.config['ROW_QUEUE_PATH'] = os.environ.get('ROW_QUEUE_PATH', '')
+app.config['ROW_LEASE_SECONDS'] = float(os.environ.get('ROW_LEASE_SECONDS', 120))
+app.config['ROW_MAX_ATTEMPTS'] = int(os.environ.get('ROW_MAX_ATTEMPTS', 3))
+app.config['ROW_QUEUE_POLL_SECONDS'] = float(os.environ.get('ROW_QUEUE_POLL_SECONDS', 1))
 
 # กำหนด logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Pool ของ Chrome (ยังไม่เปิด Chrome จนกว่าจะ start() หรือถูกยืมครั้งแรก)
+driver_pool = DriverPool(
+    size=app.config['DRIVER_POOL_SIZE'],
+    max_pages=app.config['DRIVER_MAX_PAGES'],
+    max_memory_mb=app.config['DRIVER_MAX_MEMORY_MB'],
+)
+
+# โควตา request ต่อ host ที่ใช้ร่วมกันทุก worker และทุกงาน
+host_rate_limiter = HostRateLimiter(
+    app.config['HOST_RATES'],
+    default_rate=app.config['DEFAULT_HOST_RATE'],
+    default_burst=app.config['DEFAULT_HOST_BURST'],
+    jitter=app.config['RATE_LIMIT_JITTER'],
+)
+
+# แหล่งค้นหาที่ถูกบล็อกถูกพักร่วมกันทุก worker และทุกงาน
+source_breakers = CircuitBreakers(
+    threshold=app.config['BREAKER_THRESHOLD'],
+    cooldown=app.config['BREAKER_COOLDOWN'],
+    max_cooldown=app.config['BREAKER_MAX_COOLDOWN'],
+)
+
+# ตรวจ DNS ของโดเมนที่เดาไว้พร้อมกัน ก่อนยิง HTTP
+domain_resolver = DomainResolver(
+    NegativeDNSCache(app.config['DNS_CACHE_PATH'], ttl=app.config['DNS_NEGATIVE_TTL_HOURS'] * 3600)
+    if app.config['DNS_CACHE_PATH'] else None,
+    timeout=app.config['DNS_TIMEOUT'],
+)
+
+# ที่เก็บหน้าเว็บดิบ (None เมื่อปิดใช้งาน)
+raw_page_store = PageStore(
+    app.config['PAGE_STORE_PATH'],
+    max_bytes=app.config['PAGE_STORE_MAX_MB'] * 1024 * 1024,
+) if app.config['PAGE_STORE_PATH'] else None
+
+# สถิติของแหล่งค้นหาสะสมข้ามงาน (บันทึกลงไฟล์เมื่อจบแต่ละงาน)
+global_source_stats = SourceStats(half_life=app.config['SOURCE_STATS_HALF_LIFE_HOURS'] * 3600,
+                                  window=app.config['SOURCE_STATS_WINDOW'])
+if app.config['SOURCE_STATS_PATH']:
+    global_source_stats.load(app.config['SOURCE_STATS_PATH'])
+
+# Cache ผลการค้นหาที่ใช้ร่วมกันทุกงาน (None เมื่อปิดใช้งาน)
+contact_cache = ContactCache(
+    app.config['CACHE_PATH'],
+    ttl=app.config['CACHE_TTL_DAYS'] * DAY,
+    negative_ttl=app.config['CACHE_NEGATIVE_TTL_DAYS'] * DAY,
+    max_entries=app.config['CACHE_MAX_ENTRIES'],
+) if app.config['CACHE_PATH'] else None
+
+# คิวแถวที่ใช้ร่วมกับ worker (None = ค้นหาในโปรเซสนี้)
+row_queue = RowQueue(
+    app.config['ROW_QUEUE_PATH'],
+    lease_seconds=app.config['ROW_LEASE_SECONDS'],
+    max_attempts=app.config['ROW_MAX_ATTEMPTS'],
+    dedupe_memory=app.config['DEDUPE_MEMORY'],
+) if app.config['ROW_QUEUE_PATH'] else None
+
 class ImprovedContactSearcher:
-    def __init__(self):
-        self.session = requests.Session()
-        self.setup_session()
+    def __init__(self, use_async=None, required_fields=None, driver_pool=None, rate_limiter=None,
+                 source_stats=None, resolver=None, page_store=None, search_urls=None, use_selenium=None,
+                 sources=None, retry_policy=None, breakers=None):
+        self._session = None
         self.driver = None
+        self.driver_pool = driver_pool
+        self.rate_limiter = host_rate_limiter if rate_limiter is None else rate_limiter
+        self.breakers = source_breakers if breakers is None else breakers
+        if source_stats is None and app.config['ADAPTIVE_SOURCES']:
+            source_stats = global_source_stats
+        self.source_stats = source_stats
+        self.resolver = domain_resolver if resolver is None else resolver
+        self.page_store = raw_page_store if page_store is None else page_store
+        self.search_urls = {**app.config['SEARCH_URLS'], **(search_urls or {})}
+        # host ของเครื่องมือค้นหาและไดเรกทอรี เว็บไซต์ที่อยู่บน host เหล่านี้ไม่ใช่เว็บไซต์ของบริษัท
+        # (ยกเว้น host ที่ให้บริการเว็บไซต์บริษัทด้วย เช่น server จำลองของ bench_search.py)
+        website_host = host_key(self.search_urls['website'])
+        self.search_hosts = frozenset(
+            host_key(template) for name, template in [*DEFAULT_SEARCH_URLS.items(), *self.search_urls.items()]
+            if name != 'website'
+        ) - {website_host}
+        metrics.label_hosts(host_key(template) for name, template in self.search_urls.items() if name != 'website')
+        self.sources = tuple(app.config['SEARCH_SOURCES'] if sources is None else sources)
+        self.use_selenium = ((app.config['SELENIUM_SEARCH'] if use_selenium is None else use_selenium)
+                             and 'Selenium Google' in self.sources)
+        self.use_async = app.config['ASYNC_SEARCH'] if use_async is None else use_async
+        self.required_fields = (app.config['REQUIRED_FIELDS'] if required_fields is None
+                                else tuple(required_fields))
+        # เมื่อจะเปิดหน้าติดต่อของเว็บไซต์ที่พบอยู่แล้ว ไม่ต้องเดาโดเมนของบริษัทอีก
+        self.crawl_known_website = app.config['CRAWL_CONTACT_PAGES']
+        self.retry_policy = retry_policy or RetryPolicy(
+            retries=app.config['HTTP_RETRIES'],
+            backoff=app.config['HTTP_BACKOFF'],
+            max_backoff=app.config['HTTP_BACKOFF_MAX'],
+        )
+        # แหล่งที่ค้นหาไม่ได้ในการค้นหาครั้งล่าสุด (ดู comprehensive_search)
+        self.unavailable_sources = ()
+        self._async_engine = None
+        self._contact_crawler = None
+        
+    @property
+    def session(self):
+        """requests.Session ของ searcher นี้ (import requests และสร้างเมื่อใช้ครั้งแรก)"""
+        if self._session is None:
+            from http_session import create_session
+            
+            self._session = create_session(app.config['HTTP_POOL_HOSTS'], app.config['HTTP_POOL_PER_HOST'])
+            self.setup_session()
+        return self._session
+    
+    @property
+    def async_engine(self):
+        """AsyncSearchEngine ของ searcher นี้ (สร้างเมื่อใช้งานครั้งแรก)"""
+        if self._async_engine is None:
+            self._async_engine = AsyncSearchEngine(
+                self,
+                required_fields=self.required_fields,
+                include_selenium=self.use_selenium,
+                enabled_sources=self.sources,
+                direct_max_bytes=app.config['DIRECT_MAX_BYTES'],
+                direct_connect_timeout=app.config['DIRECT_CONNECT_TIMEOUT'],
+                max_page_bytes=app.config['MAX_PAGE_BYTES'],
+            )
+        return self._async_engine
+    
+    def fetch_text(self, url, timeout, max_bytes=None, source=None):
+        """GET (หลังรอโควตาของ host นั้น) แล้วอ่าน body แบบ stream ไม่เกิน max_bytes
+        (ค่าเริ่มต้น MAX_PAGE_BYTES) คืน HTML เมื่อได้ status 200 ไม่เช่นนั้นคืน None
+        
+        ลองใหม่ตาม retry_policy เมื่อได้ 429/5xx หรือ connection หลุดกลางทาง
+        ถ้าระบุ source จะแจ้ง breaker ของแหล่งนั้นเมื่อถูกบล็อก (หน้า captcha ถือว่าไม่ได้ผลและคืน None)
+        """
+        import requests
+        from http_session import retryable_error
+        
+        max_bytes = max_bytes or app.config['MAX_PAGE_BYTES']
+        host = host_key(url)
+        breaker = breaker_key(source, url) if source is not None else None
+        attempt = 0
+        while True:
+            self.rate_limiter.wait(url)
+            retry_after = None
+            try:
+                with tracing.span('fetch', 'http', url=url), \
+                        self.session.get(url, timeout=timeout, stream=True) as response:
+                    metrics.observe_response(host, response.status_code)
+                    if response.status_code == 200:
+                        chunks = []
+                        size = 0
+                        for chunk in response.iter_content(64 * 1024):
+                            chunks.append(chunk)
+                            size += len(chunk)
+                            if size >= max_bytes:
+                                break
+                        text = b''.join(chunks)[:max_bytes].decode(response.encoding or 'utf-8', errors='replace')
+                        if breaker is not None and self.breakers.observe(breaker, 200, text):
+                            return None
+                        return text
+                    if (response.status_code not in RETRYABLE_STATUSES
+                            or not self.retry_policy.should_retry(attempt)):
+                        if breaker is not None:
+                            self.breakers.observe(breaker, response.status_code)
+                        return None
+                    reason = str(response.status_code)
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            except requests.Timeout:
+                metrics.observe_response(host, 'timeout')
+                raise
+            except requests.RequestException as e:
+                metrics.observe_response(host, 'error')
+                if not (retryable_error(e) and self.retry_policy.should_retry(attempt)):
+                    raise
+                reason = 'disconnect'
+            
+            metrics.http_retries.inc(host=metrics.host_label(host), reason=reason)
+            with tracing.span('backoff', 'http', url=url):
+                time.sleep(self.retry_policy.delay(attempt, retry_after))
+            attempt += 1
+    
+    def store_page(self, company_name, source, url, html):
+        """เก็บหน้าเว็บที่ดึงมาแล้วลง page store (ถ้าเปิดใช้งาน)"""
+        if self.page_store is not None:
+            self.page_store.put(company_name, source, url, html)
+    
+    def resolvable_urls(self, urls):
+        """URL ที่ host resolve ได้ (ตรวจทุกชื่อพร้อมกัน)"""
+        if self.resolver is None:
+            return list(urls)
+        resolved = self.resolver.resolve_many(urlsplit(url).hostname for url in urls)
+        return [url for url in urls if resolved.get(urlsplit(url).hostname)]
         
     def setup_session(self):
         """ตั้งค่า session สำหรับ HTTP requests"""
@@ -54,17 +328,8 @@ class ImprovedContactSearcher:
     def init_selenium_driver(self):
         """เริ่มต้น Selenium WebDriver"""
         try:
-            chrome_options = Options()
-            chrome_options.add_argument('--headless')
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-            chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-            chrome_options.add_experimental_option('useAutomationExtension', False)
-            chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-            
-            self.driver = webdriver.Chrome(options=chrome_options)
-            self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+            with tracing.span('chrome_start', 'selenium'):
+                self.driver = create_chrome_driver()
             return True
         except Exception as e:
             logger.error(f"Error initializing Selenium: {e}")
@@ -79,125 +344,129 @@ class ImprovedContactSearcher:
             except:
                 pass
     
-    def extract_contact_info(self, text_content):
-        """ดึงข้อมูลติดต่อจาก text"""
-        email = None
-        phone = None
-        website = None
-        
-        # ค้นหา Email (รูปแบบไทยและสากล)
-        email_patterns = [
-            r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
-            r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.(com|co\.th|net|org|th)',
-        ]
-        
-        for pattern in email_patterns:
-            emails = re.findall(pattern, text_content, re.IGNORECASE)
-            if emails:
-                # กรองอีเมลที่ไม่ใช่ spam
-                valid_emails = [e for e in emails if not any(spam in e.lower() 
-                    for spam in ['noreply', 'no-reply', 'donotreply', 'google', 'facebook'])]
-                if valid_emails:
-                    email = valid_emails[0]
-                    break
-        
-        # ค้นหาเบอร์โทรไทย
-        phone_patterns = [
-            r'0[2-9][0-9]{7,8}',  # เบอร์ไทย 02-xxx-xxxx, 08x-xxx-xxxx
-            r'\+66[0-9]{8,9}',    # +66 format
-            r'66[0-9]{8,9}',      # 66 format
-            r'0[0-9]{1,2}[-\s]?[0-9]{3}[-\s]?[0-9]{4}',  # 02-xxx-xxxx
-            r'0[0-9]{2}[-\s]?[0-9]{3}[-\s]?[0-9]{3,4}',  # 08x-xxx-xxxx
+    def close(self):
+        """ปิด async engine และ Selenium WebDriver"""
+        if self._async_engine is not None:
+            self._async_engine.close()
+            self._async_engine = None
+            self._contact_crawler = None
+        self.close_driver()
+    
+    def duckduckgo_url(self, company_name):
+        query = f"{company_name} contact email phone thailand"
+        return search_url(self.search_urls, 'duckduckgo', query)
+    
+    def bing_url(self, company_name):
+        query = f"{company_name} contact email phone thailand"
+        return search_url(self.search_urls, 'bing', query)
+    
+    def candidate_website_urls(self, company_name):
+        """URL ที่เดาจากชื่อบริษัท เรียงตามลำดับความน่าจะเป็น"""
+        base = company_name.lower().replace(' ', '')
+        possible_domains = [
+            f"{base}.com",
+            f"{base}.co.th",
+            f"{base}.net",
+            f"www.{base}.com",
+            f"www.{base}.co.th"
         ]
-        
-        for pattern in phone_patterns:
-            phones = re.findall(pattern, text_content.replace(' ', '').replace('-', ''))
-            if phones:
-                phone = phones[0]
-                break
-        
-        # ค้นหาเว็บไซต์
-        website_patterns = [
-            r'https?://[^\s<>"]+(?:\.[^\s<>"]+)*',
-            r'www\.[^\s<>"]+(?:\.[^\s<>"]+)+',
-            r'[a-zA-Z0-9.-]+\.(?:com|co\.th|net|org|th)(?:/[^\s<>"]*)?'
+        # ลบอักขระพิเศษออก
+        return [search_url(self.search_urls, 'website', domain=re.sub(r'[^\w.-]', '', domain))
+                for domain in possible_domains]
+    
+    def directory_urls(self, company_name):
+        return [
+            search_url(self.search_urls, 'yellowpages', company_name),
+            search_url(self.search_urls, 'thailandyp', company_name),
         ]
-        
-        for pattern in website_patterns:
-            websites = re.findall(pattern, text_content, re.IGNORECASE)
-            if websites:
-                # กรองเว็บไซต์ที่ไม่เกี่ยวข้อง
-                valid_sites = []
-                for site in websites:
-                    site = site.rstrip('.,)')
-                    if not any(exclude in site.lower() for exclude in 
-                        ['google', 'facebook', 'twitter', 'youtube', 'instagram', 'linkedin']):
-                        valid_sites.append(site)
-                
-                if valid_sites:
-                    website = valid_sites[0]
-                    if not website.startswith('http'):
-                        website = 'https://' + website
-                    break
-        
-        return email, phone, website
     
-    def search_with_selenium(self, company_name):
-        """ค้นหาด้วย Selenium"""
+    def extract_contact_info(self, text_content):
+        """ดึงข้อมูลติดต่อจาก HTML (ตัด script/style และอ่าน mailto:/tel: ก่อน)"""
+        with tracing.span('extract', 'extract', size=len(text_content or '')):
+            return contact_extractor.extract_contact_info_html(text_content)
+    
+    def search_with_selenium(self, company_name, cancel_event=None):
+        """ค้นหาด้วย Selenium (หยุดก่อนคำค้นถัดไปเมื่อ cancel_event ถูก set)"""
         try:
+            if self.driver_pool is not None:
+                # ยืม Chrome ที่เปิดค้างไว้จาก pool แทนการเปิดใหม่
+                with self.driver_pool.driver() as driver:
+                    return self.google_search(driver, company_name, cancel_event)
+            
             if not self.driver:
                 if not self.init_selenium_driver():
                     return None, None, None
             
-            # สร้าง search query
-            queries = [
-                f"{company_name} ติดต่อ เบอร์โทร อีเมล",
-                f"{company_name} contact phone email thailand",
-                f'"{company_name}" email phone website'
-            ]
-            
-            for query in queries:
-                try:
-                    # ค้นหาใน Google
-                    search_url = f"https://www.google.com/search?q={query.replace(' ', '+')}"
-                    self.driver.get(search_url)
-                    
-                    # รอให้หน้าโหลด
-                    WebDriverWait(self.driver, 10).until(
-                        EC.presence_of_element_located((By.TAG_NAME, "body"))
-                    )
-                    
-                    time.sleep(random.uniform(2, 4))
-                    
-                    # ดึงข้อมูล
-                    page_source = self.driver.page_source
-                    email, phone, website = self.extract_contact_info(page_source)
-                    
-                    if any([email, phone, website]):
-                        return email, phone, website
-                        
-                except TimeoutException:
-                    logger.warning(f"Timeout searching for {company_name} with query: {query}")
-                    continue
-                except Exception as e:
-                    logger.error(f"Error in selenium search: {e}")
-                    continue
-            
-            return None, None, None
+            return self.google_search(self.driver, company_name, cancel_event)
             
         except Exception as e:
             logger.error(f"Selenium search error for {company_name}: {e}")
             return None, None, None
     
+    def google_search(self, driver, company_name, cancel_event=None):
+        """ค้นหาใน Google ด้วย WebDriver ที่กำหนด"""
+        # โหลด selenium เมื่อใช้ครั้งแรก โปรเซสที่ไม่ได้เปิดแหล่งนี้จึงไม่ต้อง import เลย
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+        
+        # สร้าง search query
+        queries = [
+            f"{company_name} ติดต่อ เบอร์โทร อีเมล",
+            f"{company_name} contact phone email thailand",
+            f'"{company_name}" email phone website'
+        ]
+        
+        for query in queries:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            try:
+                # ค้นหาใน Google
+                google_url = search_url(self.search_urls, 'google', query)
+                self.rate_limiter.wait(google_url)
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                with tracing.span('driver.get', 'selenium', url=google_url):
+                    driver.get(google_url)
+                metrics.selenium_page_loads.inc()
+                
+                # รอให้หน้าโหลด
+                with tracing.span('WebDriverWait', 'selenium'):
+                    WebDriverWait(driver, 10).until(
+                        EC.presence_of_element_located((By.TAG_NAME, "body"))
+                    )
+                
+                # ดึงข้อมูล (หน้า captcha ของ Google ไม่มีผลการค้นหา คำค้นถัดไปก็จะเจอหน้าเดิม)
+                page_source = driver.page_source
+                reason = self.breakers.observe("Selenium Google", 200, page_source, driver.current_url)
+                if reason:
+                    logger.warning(f"Google blocked the search for {company_name} ({reason})")
+                    break
+                self.store_page(company_name, "Selenium Google", google_url, page_source)
+                email, phone, website = self.extract_contact_info(page_source)
+                
+                if any([email, phone, website]):
+                    return email, phone, website
+                    
+            except TimeoutException:
+                logger.warning(f"Timeout searching for {company_name} with query: {query}")
+                continue
+            except Exception as e:
+                logger.error(f"Error in selenium search: {e}")
+                continue
+        
+        return None, None, None
+    
     def search_duckduckgo(self, company_name):
         """ค้นหาจาก DuckDuckGo"""
         try:
-            query = f"{company_name} contact email phone thailand"
-            url = f"https://duckduckgo.com/html/?q={query.replace(' ', '+')}"
+            url = self.duckduckgo_url(company_name)
             
-            response = self.session.get(url, timeout=15)
-            if response.status_code == 200:
-                return self.extract_contact_info(response.text)
+            text = self.fetch_text(url, timeout=15, source="DuckDuckGo")
+            if text:
+                self.store_page(company_name, "DuckDuckGo", url, text)
+                return self.extract_contact_info(text)
                 
         except Exception as e:
             logger.error(f"DuckDuckGo search error: {e}")
@@ -207,12 +476,12 @@ class ImprovedContactSearcher:
     def search_bing(self, company_name):
         """ค้นหาจาก Bing"""
         try:
-            query = f"{company_name} contact email phone thailand"
-            url = f"https://www.bing.com/search?q={query.replace(' ', '+')}"
+            url = self.bing_url(company_name)
             
-            response = self.session.get(url, timeout=15)
-            if response.status_code == 200:
-                return self.extract_contact_info(response.text)
+            text = self.fetch_text(url, timeout=15, source="Bing")
+            if text:
+                self.store_page(company_name, "Bing", url, text)
+                return self.extract_contact_info(text)
                 
         except Exception as e:
             logger.error(f"Bing search error: {e}")
@@ -222,28 +491,19 @@ class ImprovedContactSearcher:
     def search_company_website_direct(self, company_name):
         """ค้นหาเว็บไซต์บริษัทโดยตรง"""
         try:
-            # ลองหาเว็บไซต์โดยตรง
-            possible_domains = [
-                f"{company_name.lower().replace(' ', '')}.com",
-                f"{company_name.lower().replace(' ', '')}.co.th",
-                f"{company_name.lower().replace(' ', '')}.net",
-                f"www.{company_name.lower().replace(' ', '')}.com",
-                f"www.{company_name.lower().replace(' ', '')}.co.th"
-            ]
-            
-            for domain in possible_domains:
+            # ลองหาเว็บไซต์โดยตรง เฉพาะโดเมนที่มีอยู่จริง และอ่านแค่ส่วนต้นของหน้า
+            timeout = (app.config['DIRECT_CONNECT_TIMEOUT'], 10)
+            for url in self.resolvable_urls(self.candidate_website_urls(company_name)):
                 try:
-                    # ลบอักขระพิเศษออก
-                    domain = re.sub(r'[^\w.-]', '', domain)
-                    url = f"https://{domain}"
-                    
-                    response = self.session.get(url, timeout=10)
-                    if response.status_code == 200:
-                        email, phone, website = self.extract_contact_info(response.text)
+                    text = self.fetch_text(url, timeout, app.config['DIRECT_MAX_BYTES'])
+                    if text:
+                        self.store_page(company_name, "Direct Website", url, text)
+                        email, phone, website = self.extract_contact_info(text)
                         if any([email, phone]):
                             return email, phone, url
                             
-                except:
+                except Exception as e:
+                    logger.debug(f"Direct website fetch failed for {url}: {e}")
                     continue
                     
         except Exception as e:
@@ -254,19 +514,20 @@ class ImprovedContactSearcher:
     def search_business_directories(self, company_name):
         """ค้นหาจากไดเรกทอรีธุรกิจ"""
         try:
-            directories = [
-                f"https://www.yellowpages.co.th/search?q={company_name.replace(' ', '+')}",
-                f"https://www.thailandyp.com/search.php?keyword={company_name.replace(' ', '+')}",
-            ]
-            
-            for directory_url in directories:
+            for directory_url in self.directory_urls(company_name):
+                if not self.breakers.allow(breaker_key("Business Directories", directory_url)):
+                    # ไดเรกทอรีนี้ถูกบล็อกและยังอยู่ในช่วงพัก ไดเรกทอรีอื่นยังถามได้
+                    metrics.note_blocked()
+                    continue
                 try:
-                    response = self.session.get(directory_url, timeout=15)
-                    if response.status_code == 200:
-                        email, phone, website = self.extract_contact_info(response.text)
+                    text = self.fetch_text(directory_url, timeout=15, source="Business Directories")
+                    if text:
+                        self.store_page(company_name, "Business Directories", directory_url, text)
+                        email, phone, website = self.extract_contact_info(text)
                         if any([email, phone, website]):
                             return email, phone, website
-                except:
+                except Exception as e:
+                    logger.debug(f"Directory fetch failed for {directory_url}: {e}")
                     continue
                     
         except Exception as e:
@@ -275,10 +536,25 @@ class ImprovedContactSearcher:
         return None, None, None
     
     def comprehensive_search(self, company_name):
-        """ค้นหาแบบครอบคลุมจากหลายแหล่ง"""
+        """ค้นหาแบบครอบคลุมจากหลายแหล่ง แล้วเติมข้อมูลที่ขาดจากหน้าติดต่อของเว็บไซต์ที่พบ
+        
+        หลังค้นหา unavailable_sources คือแหล่งที่ถามไม่ได้ในครั้งนี้ (breaker พักอยู่ หรือ error)
+        """
         logger.info(f"Starting comprehensive search for: {company_name}")
         
-        # ลำดับการค้นหา
+        with tracing.span('comprehensive_search', company=company_name):
+            if self.use_async:
+                result = self.concurrent_search(company_name)
+            else:
+                result = self.sequential_search(company_name)
+            return self.crawl_contact_pages(company_name, *result)
+    
+    def sequential_search(self, company_name):
+        """ค้นหาทีละแหล่ง รวมผลบางส่วนของแต่ละแหล่ง และหยุดเมื่อครบตาม required_fields
+        
+        ข้ามแหล่งที่ไม่น่าจะเติม field ที่ยังขาดได้ (ดู field_plan.wanted_source)
+        """
+        # ลำดับการค้นหา (ค่าเริ่มต้น) จัดใหม่ทุกแถวตามสถิติเมื่อเปิด ADAPTIVE_SOURCES
         search_methods = [
             ("Selenium Google", self.search_with_selenium),
             ("DuckDuckGo", self.search_duckduckgo),
@@ -286,29 +562,105 @@ class ImprovedContactSearcher:
             ("Direct Website", self.search_company_website_direct),
             ("Business Directories", self.search_business_directories)
         ]
+        search_methods = [(name, func) for name, func in search_methods
+                          if name in self.sources and (self.use_selenium or name != "Selenium Google")]
+        if self.source_stats is not None and search_methods:
+            methods = dict(search_methods)
+            search_methods = [(name, methods[name]) for name in self.source_stats.plan(list(methods))]
         
+        merged = MergedResult()
         for method_name, search_func in search_methods:
+            if not wanted_source(method_name, merged, self.required_fields, self.source_stats,
+                                 self.crawl_known_website):
+                continue
+            if not self.breakers.allow(method_name):
+                # แหล่งนี้ถูกบล็อกและยังอยู่ในช่วงพัก
+                metrics.search_results.inc(source=method_name, outcome='breaker_open')
+                merged.unavailable.append(method_name)
+                continue
             try:
                 logger.info(f"Searching {company_name} using {method_name}")
-                email, phone, website = search_func(company_name)
-                
-                if any([email, phone, website]):
-                    logger.info(f"Found data for {company_name} via {method_name}")
-                    return email, phone, website, method_name
+                started = time.monotonic()
+                with tracing.span(method_name), metrics.track_source(method_name) as call:
+                    result = call.result = search_func(company_name)
+                if call.outcome == 'blocked':
+                    # ไม่ได้ข้อมูลเพราะถูกบล็อก ไม่ใช่เพราะแหล่งนี้ไม่มีข้อมูลของบริษัทนี้ จึงไม่นับเป็น miss
+                    merged.unavailable.append(method_name)
+                elif self.source_stats is not None:
+                    self.source_stats.record(method_name, result, time.monotonic() - started)
                 
-                # Delay ระหว่างการค้นหา
-                time.sleep(random.uniform(1, 3))
+                filled = merged.add(method_name, result)
+                if filled:
+                    logger.info(f"Found {', '.join(filled)} for {company_name} via {method_name}")
+                if merged.complete(self.required_fields):
+                    break
                 
             except Exception as e:
                 logger.error(f"Error in {method_name} for {company_name}: {e}")
+                merged.unavailable.append(method_name)
                 continue
         
+        self.unavailable_sources = tuple(merged.unavailable)
+        if not merged.sources:
+            logger.info(f"No data found for {company_name}")
+        return (*merged.as_tuple(), merged.source_label())
+    
+    @property
+    def contact_crawler(self):
+        """ContactCrawler ที่ใช้ session และ event loop เดียวกับ async engine"""
+        if self._contact_crawler is None:
+            self._contact_crawler = ContactCrawler(
+                self.async_engine.fetch,
+                max_pages=app.config['CRAWL_MAX_PAGES'],
+                max_depth=app.config['CRAWL_MAX_DEPTH'],
+                deadline=app.config['CRAWL_DEADLINE'],
+                concurrency=app.config['CRAWL_CONCURRENCY'],
+            )
+        return self._contact_crawler
+    
+    def crawl_contact_pages(self, company_name, email, phone, website, source):
+        """ถ้าพบเว็บไซต์แต่ข้อมูลยังไม่ครบ เปิดหน้าติดต่อของเว็บไซต์นั้นเพื่อเติม email/phone
+        
+        ไม่เปิดเมื่อ "เว็บไซต์" ที่ได้จากหน้าค้นหาเป็นเครื่องมือค้นหาหรือไดเรกทอรีเอง
+        เพราะข้อมูลติดต่อในนั้นไม่ใช่ของบริษัท
+        """
+        if (not app.config['CRAWL_CONTACT_PAGES'] or not website
+                or meets_completeness((email, phone, website), self.required_fields)):
+            return email, phone, website, source
+        if host_key(site_root(website)) in self.search_hosts:
+            logger.info(f"Not crawling {website} for {company_name}: it is a search or directory site")
+            return email, phone, website, source
+        
+        try:
+            with tracing.span('crawl_contact_pages', website=website):
+                crawled_email, crawled_phone = self.async_engine.run_coroutine(
+                    self.contact_crawler.crawl(website, self.required_fields))
+        except Exception as e:
+            logger.error(f"Contact page crawl error for {company_name}: {e}")
+            return email, phone, website, source
+        
+        filled = [field for field, crawled, known in (('email', crawled_email, email), ('phone', crawled_phone, phone))
+                  if crawled and not known]
+        if filled:
+            logger.info(f"Filled {', '.join(filled)} for {company_name} from {website}")
+            source = f"{source} + Contact Page ({', '.join(filled)})"
+        return email or crawled_email, phone or crawled_phone, website, source
+    
+    def concurrent_search(self, company_name):
+        """ค้นหาจากทุกแหล่งพร้อมกัน คืนผลทันทีเมื่อข้อมูลครบตาม required_fields"""
+        try:
+            email, phone, website, source = self.async_engine.run(company_name)
+            self.unavailable_sources = self.async_engine.unavailable_sources
+            if any([email, phone, website]):
+                logger.info(f"Found data for {company_name} via {source}")
+                return email, phone, website, source
+        except Exception as e:
+            logger.error(f"Error in concurrent search for {company_name}: {e}")
+            self.unavailable_sources = tuple(name for name, _ in self.async_engine.sources())
+        
         logger.info(f"No data found for {company_name}")
         return None, None, None, "ไม่พบข้อมูล"
 
-# Global searcher instance
-searcher = ImprovedContactSearcher()
-
 # HTML Template
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -437,6 +789,23 @@ HTML_TEMPLATE = """
             margin-top: 5px;
         }
         
+        .source-table {
+            width: 100%;
+            border-collapse: collapse;
+            background: white;
+            margin: 10px 0 20px;
+        }
+        
+        .source-table th, .source-table td {
+            padding: 8px;
+            border-bottom: 1px solid #eee;
+            text-align: right;
+        }
+        
+        .source-table th:first-child, .source-table td:first-child {
+            text-align: left;
+        }
+        
         .file-info {
             background: #fff3cd;
             border: 1px solid #ffeaa7;
@@ -486,9 +855,9 @@ HTML_TEMPLATE = """
         </p>
         
         <div class="upload-area" onclick="document.getElementById('fileInput').click()">
-            <input type="file" id="fileInput" accept=".xlsx,.xls" style="display:none">
+            <input type="file" id="fileInput" accept=".xlsx,.xls,.csv,.parquet" style="display:none">
             <div style="font-size: 3em; margin-bottom: 15px;">📁</div>
-            <h3>เลือกไฟล์ Excel (.xlsx)</h3>
+            <h3>เลือกไฟล์ Excel (.xlsx), CSV หรือ Parquet</h3>
             <p>ไฟล์ต้องมีคอลัมน์ "Company" สำหรับชื่อบริษัทที่ต้องการค้นหา</p>
             <div id="fileInfo" class="file-info" style="display:none;"></div>
         </div>
@@ -514,15 +883,20 @@ HTML_TEMPLATE = """
                 <div id="progressFill" class="progress-fill"></div>
             </div>
             <div id="currentCompany" style="margin-top: 10px; font-weight: bold;"></div>
+            <div id="breakerStatus" style="margin-top: 5px; color: #c0392b; white-space: pre-line;"></div>
             <div class="log-area" id="logArea"></div>
         </div>
         
         <div class="result" id="result" style="display:none;">
             <h3>✅ ผลลัพธ์การค้นหา</h3>
             <div class="stats" id="stats"></div>
+            <div id="sourceStats"></div>
             <button class="btn" onclick="downloadResult()" id="downloadBtn">
                 💾 ดาวน์โหลดผลลัพธ์ (.xlsx)
             </button>
+            <button class="btn" onclick="downloadTrace()" id="traceBtn" style="display:none;">
+                ⏱️ ดาวน์โหลด trace (.json)
+            </button>
         </div>
         
         <div class="footer">
@@ -533,8 +907,10 @@ HTML_TEMPLATE = """
 
     <script>
         let selectedFile = null;
-        let resultFilename = null;
+        let jobId = null;
         let searchInterval = null;
+        let progressSource = null;
+        let jobFinished = false;
 
         document.getElementById('fileInput').addEventListener('change', function(e) {
             selectedFile = e.target.files[0];
@@ -571,29 +947,83 @@ HTML_TEMPLATE = """
                 `กำลังค้นหา: ${companyName} ${found ? '✅' : '⏳'}`;
         }
 
+        function updateBreakers(breakers) {
+            document.getElementById('breakerStatus').textContent = (breakers || []).map(b =>
+                `⛔ พักแหล่ง ${b.source} (ถูกบล็อก: ${b.reason}) ลองใหม่ในอีก ${Math.ceil(b.retry_in)} วินาที`
+            ).join('\\n');
+        }
+
+        function handleProgress(data) {
+            updateProgress(data.current, data.total, data.current_company, data.found_data);
+            updateBreakers(data.breakers);
+            
+            if (data.completed && !jobFinished) {
+                jobFinished = true;
+                clearInterval(searchInterval);
+                if (progressSource) {
+                    progressSource.close();
+                }
+                updateLog(data.message);
+                showResults(data.results);
+            }
+        }
+
+        const ROW_STATE_LABELS = {
+            found: 'พบข้อมูล',
+            not_found: 'ไม่พบข้อมูล',
+            skipped: 'ข้าม'
+        };
+
+        function handleRow(row) {
+            if (row.state === 'searching') {
+                document.getElementById('currentCompany').textContent = `กำลังค้นหา: ${row.company} ⏳`;
+                return;
+            }
+            const detail = [row.email, row.phone, row.website].filter(Boolean).join(', ');
+            updateLog(`#${row.row} ${ROW_STATE_LABELS[row.state]}: ${row.company}` +
+                (detail ? ` (${detail})` : ''));
+        }
+
         async function checkProgress() {
             try {
-                const response = await fetch('/progress');
+                const response = await fetch(`/progress/${jobId}`);
                 if (response.ok) {
                     const data = await response.json();
-                    updateProgress(data.current, data.total, data.current_company, data.found_data);
                     updateLog(data.message);
-                    
-                    if (data.completed) {
-                        clearInterval(searchInterval);
-                        showResults(data.results);
-                    }
+                    handleProgress(data);
                 }
             } catch (error) {
                 console.error('Error checking progress:', error);
             }
         }
 
+        function startPolling() {
+            clearInterval(searchInterval);
+            searchInterval = setInterval(checkProgress, 2000);
+        }
+
+        function watchProgress() {
+            // ใช้ Server-Sent Events (การเชื่อมต่อเดียวต่อหน้า) ถ้าใช้ไม่ได้ค่อยกลับไป poll
+            if (!window.EventSource) {
+                startPolling();
+                return;
+            }
+            progressSource = new EventSource(`/progress/${jobId}/stream`);
+            progressSource.addEventListener('progress', (e) => handleProgress(JSON.parse(e.data)));
+            progressSource.addEventListener('row', (e) => handleRow(JSON.parse(e.data)));
+            progressSource.onerror = () => {
+                progressSource.close();
+                if (!jobFinished) {
+                    updateLog('การเชื่อมต่อแบบ stream ขาด เปลี่ยนไปตรวจสอบทุก 2 วินาที');
+                    startPolling();
+                }
+            };
+        }
+
         function showResults(results) {
             document.getElementById('progress').style.display = 'none';
             document.getElementById('result').style.display = 'block';
             
-            resultFilename = results.filename;
             
             const stats = `
                 <div class="stat-card">
@@ -612,13 +1042,48 @@ HTML_TEMPLATE = """
                     <div class="stat-number">${results.found_websites}</div>
                     <div class="stat-label">พบเว็บไซต์</div>
                 </div>
+                <div class="stat-card">
+                    <div class="stat-number">${results.from_cache}</div>
+                    <div class="stat-label">ใช้ผลจากแคช</div>
+                </div>
+                <div class="stat-card">
+                    <div class="stat-number">${Math.round(results.dedupe_ratio * 100)}%</div>
+                    <div class="stat-label">แถวซ้ำ (${results.unique_companies} บริษัทไม่ซ้ำ)</div>
+                </div>
             `;
             
             document.getElementById('stats').innerHTML = stats;
+            document.getElementById('sourceStats').innerHTML = renderSourceStats(results.sources || []);
+            document.getElementById('traceBtn').style.display = results.trace_filename ? 'inline-block' : 'none';
             document.getElementById('searchBtn').disabled = false;
             document.getElementById('searchBtn').innerHTML = '🚀 ค้นหาไฟล์ใหม่';
         }
 
+        function renderSourceStats(sources) {
+            if (!sources.length) {
+                return '';
+            }
+            const rows = sources.map(s => `
+                <tr>
+                    <td>${s.source}</td>
+                    <td>${s.first_choice}</td>
+                    <td>${s.skipped}</td>
+                    <td>${s.attempts}</td>
+                    <td>${Math.round(s.hit_rate * 100)}%</td>
+                    <td>${s.avg_latency === null ? '-' : s.avg_latency + ' วินาที'}</td>
+                </tr>`).join('');
+            return `
+                <h4>ลำดับแหล่งค้นหา</h4>
+                <table class="source-table">
+                    <tr>
+                        <th>แหล่ง</th><th>ได้ไปก่อน</th><th>ถูกข้าม</th>
+                        <th>ค้นหา</th><th>พบข้อมูล</th><th>เวลาเฉลี่ย</th>
+                    </tr>
+                    ${rows}
+                </table>
+            `;
+        }
+
         async function startSearch() {
             if (!selectedFile) {
                 alert('กรุณาเลือกไฟล์ Excel ก่อน');
@@ -642,10 +1107,13 @@ HTML_TEMPLATE = """
                 });
 
                 if (response.ok) {
-                    updateLog('อัปโหลดไฟล์สำเร็จ เริ่มค้นหาข้อมูล...');
+                    const data = await response.json();
+                    jobId = data.job_id;
+                    updateLog(`อัปโหลดไฟล์สำเร็จ (งาน ${jobId}) ${data.message}`);
                     
-                    // เริ่มตรวจสอบความคืบหนา
-                    searchInterval = setInterval(checkProgress, 2000);
+                    // เริ่มติดตามความคืบหน้า
+                    jobFinished = false;
+                    watchProgress();
                     
                 } else {
                     const error = await response.json();
@@ -663,8 +1131,14 @@ HTML_TEMPLATE = """
         }
 
         function downloadResult() {
-            if (resultFilename) {
-                window.open(`/download/${resultFilename}`, '_blank');
+            if (jobId) {
+                window.open(`/download/${jobId}`, '_blank');
+            }
+        }
+
+        function downloadTrace() {
+            if (jobId) {
+                window.open(`/download/${jobId}/trace`, '_blank');
             }
         }
     </script>
@@ -672,25 +1146,12 @@ HTML_TEMPLATE = """
 </html>
 """
 
-# Global variables for progress tracking
-progress_data = {
-    'current': 0,
-    'total': 0,
-    'current_company': '',
-    'found_data': False,
-    'completed': False,
-    'results': None,
-    'message': ''
-}
-
 @app.route('/')
 def index():
     return render_template_string(HTML_TEMPLATE)
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    global progress_data
-    
     if 'file' not in request.files:
         return jsonify({'error': 'ไม่มีไฟล์'}), 400
     
@@ -698,139 +1159,517 @@ def upload_file():
     if file.filename == '':
         return jsonify({'error': 'ไม่มีไฟล์ที่เลือก'}), 400
     
-    if file and file.filename.endswith(('.xlsx', '.xls')):
-        filename = secure_filename(file.filename)
+    if file and file.filename.lower().endswith(SUPPORTED_EXTENSIONS):
+        # ใส่รหัสงานนำหน้าชื่อไฟล์ เพื่อไม่ให้ไฟล์ชื่อซ้ำของผู้ใช้คนอื่นเขียนทับกัน
+        job_id = uuid.uuid4().hex[:12]
+        filename = f"{job_id}_{secure_filename(file.filename)}"
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
         file.save(filepath)
         
-        # Reset progress
-        progress_data = {
-            'current': 0,
-            'total': 0,
-            'current_company': '',
-            'found_data': False,
-            'completed': False,
-            'results': None,
-            'message': 'เริ่มการประมวลผล...'
-        }
-        
-        # Start processing in background thread
-        thread = threading.Thread(target=process_companies_async, args=(filepath,))
-        thread.daemon = True
-        thread.start()
+        try:
+            job = job_manager.submit(filepath, job_id)
+        except JobQueueFull as e:
+            os.remove(filepath)
+            return jsonify({'error': f'ระบบไม่ว่าง {e} กรุณาลองใหม่ภายหลัง'}), 429
         
-        return jsonify({'message': 'เริ่มการประมวลผล'})
+        queued = job_manager.queued()
+        message = f'รอคิว ({queued} งานในคิว)' if queued > 0 else 'เริ่มการประมวลผล'
+        return jsonify({'message': message, 'job_id': job.job_id, 'status': job.progress['status']})
+    
+    return jsonify({'error': 'ไฟล์ต้องเป็น .xlsx, .xls, .csv หรือ .parquet'}), 400
+
+@app.route('/progress/<job_id>')
+def get_progress(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'ไม่พบงาน'}), 404
+    return jsonify(job.snapshot())
+
+@app.route('/progress/<job_id>/stream')
+def stream_progress(job_id):
+    """ส่งความคืบหน้าแบบ Server-Sent Events: event "row" ทุกครั้งที่แถวเปลี่ยนสถานะ
+    ตามด้วย event "progress" (ยอดรวมล่าสุด) และปิด stream เมื่องานเสร็จ
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'ไม่พบงาน'}), 404
     
-    return jsonify({'error': 'ไฟล์ต้องเป็น .xlsx หรือ .xls'}), 400
+    def sse(event, data):
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
+    def generate():
+        last_seq = 0
+        yield sse('progress', job.snapshot())
+        while True:
+            events, closed = job.feed.wait(last_seq, timeout=app.config['SSE_HEARTBEAT_SECONDS'])
+            for last_seq, event in events:
+                yield sse('row', event)
+            if events or closed:
+                yield sse('progress', job.snapshot())
+            else:
+                # heartbeat กัน proxy ปิดการเชื่อมต่อที่เงียบนานเกินไป
+                yield ': keep-alive\n\n'
+            if closed:
+                return
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/progress')
-def get_progress():
-    return jsonify(progress_data)
+def get_latest_progress():
+    """ความคืบหน้าของงานล่าสุด (สำหรับหน้าเว็บเดิมที่ยังไม่ส่ง job_id)"""
+    job = job_manager.latest()
+    return jsonify(job.snapshot() if job else new_progress_data())
+
+def search_company_row(company_name, get_searcher, cache=None, required_fields=None):
+    """ค้นหาข้อมูลของบริษัทหนึ่งแถว และคืนค่าเป็น dict สำหรับไฟล์ผลลัพธ์
 
-def process_companies_async(filepath):
-    global progress_data
+    ถ้ามีผลใน cache ที่ยังไม่หมดอายุและใช้กับ required_fields (ค่าเริ่มต้น REQUIRED_FIELDS) ได้
+    จะไม่เรียก comprehensive_search เลย
+    """
+    if not company_name or company_name == 'nan':
+        return {
+            'Company': company_name,
+            'Email': '',
+            'Phone': '',
+            'Website': '',
+            'Address': '',
+            'Source': 'ไม่มีข้อมูล',
+            'Cached': ''
+        }
     
-    try:
-        # อ่านไฟล์ Excel
-        df = pd.read_excel(filepath)
-        
-        if 'Company' not in df.columns:
-            progress_data['message'] = 'ข้อผิดพลาด: ไฟล์ต้องมีคอลัมน์ "Company"'
-            progress_data['completed'] = True
-            return
-        
-        total_companies = len(df)
-        progress_data['total'] = total_companies
-        progress_data['message'] = f'เริ่มค้นหา {total_companies} บริษัท'
-        
-        results = []
-        found_emails = 0
-        found_phones = 0
-        found_websites = 0
-        
-        for index, row in df.iterrows():
-            company_name = str(row['Company']).strip()
-            progress_data['current'] = index + 1
-            progress_data['current_company'] = company_name
-            progress_data['found_data'] = False
-            
-            if not company_name or company_name == 'nan':
-                results.append({
-                    'Company': company_name,
-                    'Email': '',
-                    'Phone': '',
-                    'Website': '',
-                    'Address': '',
-                    'Source': 'ไม่มีข้อมูล'
-                })
-                progress_data['message'] = f'ข้าม: {company_name} (ชื่อไม่ถูกต้อง)'
-                continue
-            
-            progress_data['message'] = f'กำลังค้นหา: {company_name}'
-            
-            # ค้นหาข้อมูล
-            email, phone, website, source = searcher.comprehensive_search(company_name)
-            
-            if any([email, phone, website]):
-                progress_data['found_data'] = True
-                if email: found_emails += 1
-                if phone: found_phones += 1
-                if website: found_websites += 1
-                progress_data['message'] = f'พบข้อมูล: {company_name} ({source})'
+    required_fields = app.config['REQUIRED_FIELDS'] if required_fields is None else tuple(required_fields)
+    with tracing.span('cache.get', 'cache'):
+        cached = cache.get(company_name, required_fields) if cache is not None else None
+    if cached is not None:
+        email, phone, website, source = cached
+    else:
+        searcher = get_searcher()
+        email, phone, website, source = searcher.comprehensive_search(company_name)
+        if cache is not None:
+            if (searcher.unavailable_sources
+                    and not meets_completeness((email, phone, website), searcher.required_fields)):
+                # ผลที่ไม่ครบเพราะบางแหล่งถูกพักหรือ error ไม่เก็บลง cache ให้งานถัดไปค้นหาใหม่
+                logger.info(f"Not caching {company_name}: {', '.join(searcher.unavailable_sources)} unavailable")
             else:
-                progress_data['message'] = f'ไม่พบข้อมูล: {company_name}'
-            
-            results.append({
-                'Company': company_name,
-                'Email': email or '',
-                'Phone': phone or '',
-                'Website': website or '',
-                'Address': '',
-                'Source': source
+                cache.set(company_name, email, phone, website, source, searcher.required_fields)
+    
+    return {
+        'Company': company_name,
+        'Email': email or '',
+        'Phone': phone or '',
+        'Website': website or '',
+        'Address': '',
+        'Source': source,
+        'Cached': 'ใช่' if cached is not None else ''
+    }
+
+def process_companies_async(filepath, max_workers=None, progress=None, job_id=None, feed=None):
+    """ค้นหาทุกแถวของไฟล์ และอัปเดต progress (dict ของงานนี้) ระหว่างทำงาน
+
+    ถ้าส่ง feed (ProgressFeed) มาด้วย จะ publish เหตุการณ์ทุกครั้งที่แถวเปลี่ยนสถานะ
+    เพื่อส่งต่อให้หน้าเว็บผ่าน /progress/<job_id>/stream
+    """
+    if progress is None:
+        progress = new_progress_data(job_id or '')
+    publish = feed.publish if feed is not None else (lambda event: None)
+    progress['status'] = 'running'
+    max_workers = max_workers or app.config['MAX_WORKERS']
+    progress_lock = threading.Lock()
+    worker_local = threading.local()
+    worker_searchers = []
+    # สถิติของงานนี้ (บันทึกต่อไปยังสถิติรวมด้วย) ใช้แสดงลำดับแหล่งใน summary
+    job_source_stats = SourceStats(parent=global_source_stats) if app.config['ADAPTIVE_SOURCES'] else None
+    run_key = job_id or str(int(time.time()))
+    tracer = tracing.Tracer(run_key, max_events=app.config['TRACE_MAX_EVENTS']) if app.config['TRACE_JOBS'] else None
+    trace_filename = None
+    
+    def save_trace():
+        """เขียนไฟล์ trace ของงานนี้ข้างไฟล์ผลลัพธ์ คืนชื่อไฟล์ (None ถ้าเขียนไม่ได้)"""
+        filename = trace_filename_for(run_key)
+        try:
+            os.makedirs(app.config['RESULT_FOLDER'], exist_ok=True)
+            tracer.save(os.path.join(app.config['RESULT_FOLDER'], filename))
+        except OSError as e:
+            logger.error(f"Could not save trace for {run_key}: {e}")
+            return None
+        return filename
+    
+    def get_worker_searcher():
+        """คืน searcher ประจำ thread (สร้างใหม่เมื่อ worker เริ่มทำงานครั้งแรก)"""
+        if not hasattr(worker_local, 'searcher'):
+            worker_local.searcher = ImprovedContactSearcher(driver_pool=driver_pool,
+                                                            source_stats=job_source_stats)
+            with progress_lock:
+                worker_searchers.append(worker_local.searcher)
+        return worker_local.searcher
+    
+    def process_row(company_name):
+        # worker thread ไม่ได้ context ของ thread ที่ส่งงานมา จึงตั้ง tracer ของงานเองทุกแถว
+        token = tracing.activate(tracer)
+        try:
+            with tracing.span('row', 'row', company=company_name):
+                return search_row(company_name)
+        finally:
+            tracing.deactivate(token)
+    
+    def search_row(company_name):
+        with progress_lock:
+            progress['current_company'] = company_name
+            progress['message'] = f'กำลังค้นหา: {company_name}'
+        publish({'state': 'searching', 'company': company_name})
+        
+        row = search_company_row(company_name, get_worker_searcher, contact_cache)
+        found = any([row['Email'], row['Phone'], row['Website']])
+        breakers = source_breakers.snapshot()
+        
+        with progress_lock:
+            progress['current_company'] = company_name
+            progress['found_data'] = found
+            progress['breakers'] = breakers
+            if row['Source'] == 'ไม่มีข้อมูล':
+                progress['message'] = f'ข้าม: {company_name} (ชื่อไม่ถูกต้อง)'
+            elif found:
+                progress['message'] = f'พบข้อมูล: {company_name} ({row["Source"]})'
+            else:
+                progress['message'] = f'ไม่พบข้อมูล: {company_name}'
+        return row
+    
+    journal = None
+    try:
+        total_companies = count_company_rows(filepath)
+        progress['total'] = total_companies
+        
+        # ทุกแถวที่เสร็จแล้วบันทึกลง journal ทันที ถ้าเคยรันไฟล์นี้ค้างไว้จะทำต่อจากแถวล่าสุด
+        journal = JobJournal.open(app.config['JOURNAL_FOLDER'], filepath, job_id=job_id)
+        resumed_rows = journal.completed_rows
+        progress['current'] = resumed_rows
+        progress['resumed_rows'] = resumed_rows
+        
+        # แถวที่เป็นบริษัทเดียวกัน (ต่างกันแค่รูปแบบนิติบุคคล ช่องว่าง หรือตัวพิมพ์)
+        # ใช้ผลค้นหาร่วมกัน จำไว้ไม่เกิน DEDUPE_MEMORY ชื่อล่าสุด ที่เหลือพึ่ง cache
+        searched = OrderedDict()
+        if resumed_rows:
+            # ผลของแถวที่ทำไว้แล้วใช้กับแถวซ้ำที่เหลือ แถวเหล่านั้นจึงไม่ถูกนับเป็นบริษัทใหม่
+            for row in journal.iter_rows():
+                tally_found(progress['found'], row)
+                key = canonicalize_company_name(row['Company'])
+                done = Future()
+                done.set_result(row)
+                searched[key] = done
+                searched.move_to_end(key)
+                if len(searched) > app.config['DEDUPE_MEMORY']:
+                    searched.popitem(last=False)
+            progress['message'] = (f'ทำต่อจากแถวที่ {resumed_rows + 1} '
+                                        f'จาก {total_companies} แถว ({max_workers} workers)')
+        else:
+            progress['message'] = f'เริ่มค้นหา {total_companies} แถว ({max_workers} workers)'
+        
+        def write_row(company_name, future, first):
+            # คัดลอกผลของกลุ่มมาใช้ โดยคงชื่อบริษัทของแถวนี้ไว้
+            row = dict(future.result(), Company=company_name, First=first)
+            journal.append(row)
+            state = row_state(row)
+            with progress_lock:
+                progress['current'] = journal.completed_rows
+                tally_found(progress['found'], row)
+            metrics.rows.inc(state=state)
+            publish({
+                'state': state,
+                'row': journal.completed_rows,
+                'company': company_name,
+                'source': row['Source'],
+                'email': row['Email'],
+                'phone': row['Phone'],
+                'website': row['Website'],
             })
         
-        # บันทึกผลลัพธ์
-        result_df = pd.DataFrame(results)
-        result_filename = f"contact_results_{int(time.time())}.xlsx"
-        result_path = os.path.join(app.config['RESULT_FOLDER'], result_filename)
-        result_df.to_excel(result_path, index=False)
+        in_flight = deque()
+        window = max_workers * app.config['STREAM_WINDOW_PER_WORKER']
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for company_name in islice(iter_company_names(filepath), resumed_rows, None):
+                key = canonicalize_company_name(company_name)
+                future = searched.get(key)
+                first = future is None
+                if first:
+                    future = executor.submit(process_row, company_name)
+                    searched[key] = future
+                    if len(searched) > app.config['DEDUPE_MEMORY']:
+                        searched.popitem(last=False)
+                else:
+                    searched.move_to_end(key)
+                in_flight.append((company_name, future, first))
+                
+                # เขียนผลตามลำดับแถวเดิม โดยให้มีงานค้างไม่เกิน window แถว
+                while len(in_flight) > window:
+                    write_row(*in_flight.popleft())
+            
+            while in_flight:
+                write_row(*in_flight.popleft())
+        
+        # สร้างไฟล์ผลลัพธ์จาก journal (รวมแถวที่ทำไว้ก่อนรีสตาร์ท)
+        result_filename, counts = write_result_file(run_key, journal.iter_rows())
+        journal.remove()
+        
+        total_companies = counts['rows']
+        unique_companies = counts['unique']
+        
+        if tracer is not None:
+            trace_filename = save_trace()
         
         # Complete
-        progress_data['completed'] = True
-        progress_data['results'] = {
+        progress['status'] = 'completed'
+        progress['completed'] = True
+        progress['results'] = {
             'filename': result_filename,
             'total_companies': total_companies,
-            'found_emails': found_emails,
-            'found_phones': found_phones,
-            'found_websites': found_websites
+            'found_emails': counts['emails'],
+            'found_phones': counts['phones'],
+            'found_websites': counts['websites'],
+            'from_cache': counts['cached'],
+            'resumed_rows': resumed_rows,
+            'unique_companies': unique_companies,
+            'dedupe_ratio': round(1 - unique_companies / total_companies, 4) if total_companies else 0,
+            'sources': job_source_stats.summary() if job_source_stats is not None else [],
+            'trace_filename': trace_filename
         }
-        progress_data['message'] = 'เสร็จสิ้น!'
-        
-        # Close selenium driver
-        searcher.close_driver()
+        progress['message'] = 'เสร็จสิ้น!'
         
+    except MissingCompanyColumn:
+        if journal is not None:
+            journal.remove()
+            journal = None
+        progress['message'] = 'ข้อผิดพลาด: ไฟล์ต้องมีคอลัมน์ "Company"'
+        progress['status'] = 'failed'
+        progress['completed'] = True
+    
     except Exception as e:
         logger.error(f"Error in async processing: {e}")
-        progress_data['message'] = f'ข้อผิดพลาด: {str(e)}'
-        progress_data['completed'] = True
+        progress['message'] = f'ข้อผิดพลาด: {str(e)}'
+        progress['status'] = 'failed'
+        progress['completed'] = True
+    
+    finally:
+        # journal ที่ยังไม่ถูกลบ (งานล้มเหลว) เก็บไว้ทำต่อในครั้งถัดไป
+        if journal is not None:
+            journal.close()
+        # ปิด async engine ของทุก worker (Chrome ใน driver_pool เปิดค้างไว้ใช้กับงานถัดไป)
+        for worker_searcher in worker_searchers:
+            worker_searcher.close()
+        # งานที่ล้มเหลวก็ยังเก็บ trace ไว้ดูว่าช้าหรือค้างที่ขั้นตอนไหน
+        if tracer is not None and trace_filename is None:
+            save_trace()
+        if job_source_stats is not None and app.config['SOURCE_STATS_PATH']:
+            try:
+                global_source_stats.save(app.config['SOURCE_STATS_PATH'])
+            except OSError as e:
+                logger.error(f"Could not save source stats: {e}")
+    
+    return progress
+
+def process_companies_queued(filepath, progress=None, job_id=None, feed=None, queue=None):
+    """ส่งทุกแถวของไฟล์เข้า row_queue แล้วรอ worker (queue_worker.py) ค้นหาจนครบ
+
+    โปรเซสเว็บไม่ค้นหาเอง ความเร็วจึงเพิ่มได้ด้วยการเปิด worker เพิ่ม ผลที่เสร็จแล้วอยู่ในคิว
+    ถ้าเว็บรีสตาร์ทระหว่างทาง งานเดิม (job_id เดิม) จะรอผลต่อโดยไม่ส่งแถวเข้าคิวซ้ำ
+    """
+    queue = queue or row_queue
+    if progress is None:
+        progress = new_progress_data(job_id or '')
+    publish = feed.publish if feed is not None else (lambda event: None)
+    progress['status'] = 'running'
+    run_key = job_id or str(int(time.time()))
+    
+    try:
+        if queue.enqueue(run_key, filepath, iter_company_names(filepath)):
+            resumed_rows = 0
+        else:
+            resumed_rows = queue.counts(run_key).get('done', 0)
+        total_companies = queue.total(run_key)
+        progress['total'] = total_companies
+        progress['resumed_rows'] = resumed_rows
+        progress['message'] = f'ส่ง {total_companies} แถวเข้าคิว รอ worker ค้นหา'
+        
+        # ส่งผลให้หน้าเว็บตามลำดับแถว ส่วน current นับทุกแถวที่ worker ทำเสร็จแล้ว
+        next_row = 0
+        while True:
+            for row_index, row in queue.results(run_key, start=next_row, limit=1000):
+                if row_index != next_row:
+                    break
+                next_row += 1
+                state = row_state(row)
+                tally_found(progress['found'], row)
+                metrics.rows.inc(state=state)
+                publish({
+                    'state': state,
+                    'row': next_row,
+                    'company': row['Company'],
+                    'source': row['Source'],
+                    'email': row['Email'],
+                    'phone': row['Phone'],
+                    'website': row['Website'],
+                })
+            counts = queue.counts(run_key)
+            progress['current'] = counts.get('done', 0)
+            if next_row >= total_companies:
+                break
+            progress['message'] = (f"worker กำลังค้นหา {counts.get('leased', 0)} แถว "
+                                   f"(เสร็จ {progress['current']}/{total_companies})")
+            time.sleep(app.config['ROW_QUEUE_POLL_SECONDS'])
+        
+        result_filename, counts = write_result_file(
+            run_key, (row for _, row in queue.iter_results(run_key)))
+        queue.remove(run_key)
+        
+        unique_companies = counts['unique']
+        progress['status'] = 'completed'
+        progress['completed'] = True
+        progress['results'] = {
+            'filename': result_filename,
+            'total_companies': counts['rows'],
+            'found_emails': counts['emails'],
+            'found_phones': counts['phones'],
+            'found_websites': counts['websites'],
+            'from_cache': counts['cached'],
+            'resumed_rows': resumed_rows,
+            'unique_companies': unique_companies,
+            'dedupe_ratio': round(1 - unique_companies / counts['rows'], 4) if counts['rows'] else 0,
+            # สถิติแหล่งค้นหาอยู่ในโปรเซสของ worker
+            'sources': [],
+            'trace_filename': None
+        }
+        progress['message'] = 'เสร็จสิ้น!'
+    
+    except MissingCompanyColumn:
+        progress['message'] = 'ข้อผิดพลาด: ไฟล์ต้องมีคอลัมน์ "Company"'
+        progress['status'] = 'failed'
+        progress['completed'] = True
+    
+    except Exception as e:
+        logger.error(f"Error in queued processing: {e}")
+        progress['message'] = f'ข้อผิดพลาด: {str(e)}'
+        progress['status'] = 'failed'
+        progress['completed'] = True
+    
+    return progress
+
+def write_result_file(run_key, rows):
+    """เขียนไฟล์ผลลัพธ์ของงานจาก rows (เรียงตามลำดับแถว) คืน (ชื่อไฟล์, ยอดรวม)"""
+    result_filename = result_filename_for(run_key)
+    os.makedirs(app.config['RESULT_FOLDER'], exist_ok=True)
+    writer = ResultWriter(os.path.join(app.config['RESULT_FOLDER'], result_filename))
+    counts = {'rows': 0, 'emails': 0, 'phones': 0, 'websites': 0, 'cached': 0, 'unique': 0}
+    try:
+        for row in rows:
+            writer.append(row)
+            counts['rows'] += 1
+            tally_found(counts, row)
+            counts['cached'] += bool(row['Cached'])
+            counts['unique'] += row['First']
+    finally:
+        writer.close()
+    return result_filename, counts
+
+def tally_found(found, row):
+    found['emails'] += bool(row['Email'])
+    found['phones'] += bool(row['Phone'])
+    found['websites'] += bool(row['Website'])
 
-@app.route('/download/<filename>')
-def download_file(filename):
+def row_state(row):
+    if row['Source'] == 'ไม่มีข้อมูล':
+        return 'skipped'
+    if any([row['Email'], row['Phone'], row['Website']]):
+        return 'found'
+    return 'not_found'
+
+def result_filename_for(job_id):
+    return f"contact_results_{job_id}.xlsx"
+
+def trace_filename_for(job_id):
+    return f"contact_trace_{job_id}.json"
+
+def run_job(job):
+    if row_queue is not None:
+        return process_companies_queued(job.filepath, progress=job.progress, job_id=job.job_id, feed=job.feed)
+    return process_companies_async(job.filepath, progress=job.progress, job_id=job.job_id, feed=job.feed)
+
+job_manager = JobManager(
+    run_job,
+    max_running=app.config['MAX_CONCURRENT_JOBS'],
+    max_queued=app.config['MAX_QUEUED_JOBS'],
+)
+
+def job_metrics():
+    """จำนวนแถวต่อวินาทีของแต่ละงานที่เริ่มแล้ว"""
+    return [({'job': job.job_id}, job.rows_per_second())
+            for job in job_manager.jobs() if job.started_at is not None]
+
+metrics.REGISTRY.register(metrics.Gauge(
+    'contact_jobs', 'Jobs waiting in the queue or running', ['state'],
+    callback=lambda: [({'state': 'queued'}, job_manager.queued()),
+                      ({'state': 'running'}, job_manager.running())]))
+metrics.REGISTRY.register(metrics.Gauge(
+    'contact_breaker_state', 'Circuit breaker state of a search source (0 closed, 1 half open, 2 open)', ['source'],
+    callback=lambda: [({'source': source}, STATE_VALUES[state]) for source, state in source_breakers.states()]))
+metrics.REGISTRY.register(metrics.Gauge(
+    'contact_job_rows_per_second', 'Rows completed per second since the job started', ['job'],
+    callback=job_metrics))
+
+@app.route('/metrics')
+def get_metrics():
+    """metric ของโปรเซสนี้ในรูปแบบข้อความของ Prometheus"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+def resume_unfinished_jobs():
+    """ส่งงานที่ค้างอยู่ใน journal เข้าคิวใหม่ คืนจำนวนงานที่ส่งได้"""
+    resumed = 0
+    if row_queue is not None:
+        # งานในคิวแถวใช้ job_id เดิม เพื่อรอผลของแถวที่ worker ทำไว้แล้ว
+        pending = row_queue.unfinished_jobs()
+    else:
+        # journal เก็บรหัสงานของหน้าเว็บไว้ /progress และ /download ของงานเดิมจึงยังใช้ได้
+        pending = unfinished_jobs(app.config['JOURNAL_FOLDER'])
+    for job_id, filepath in pending:
+        try:
+            job_manager.submit(filepath, job_id=job_id)
+        except JobQueueFull:
+            logger.warning(f"Job queue full, not resuming {filepath}")
+            break
+        resumed += 1
+    return resumed
+
+@app.route('/download/<job_id>')
+def download_file(job_id):
+    filename = result_filename_for(secure_filename(job_id))
     result_path = os.path.join(app.config['RESULT_FOLDER'], filename)
     if os.path.exists(result_path):
-        return send_file(result_path, as_attachment=True, 
-                        download_name=f'contact_results_{filename}')
+        return send_file(result_path, as_attachment=True, download_name=filename)
     return jsonify({'error': 'ไฟล์ไม่พบ'}), 404
 
+@app.route('/download/<job_id>/trace')
+def download_trace(job_id):
+    filename = trace_filename_for(secure_filename(job_id))
+    trace_path = os.path.join(app.config['RESULT_FOLDER'], filename)
+    if os.path.exists(trace_path):
+        return send_file(trace_path, as_attachment=True, download_name=filename)
+    return jsonify({'error': 'ไม่มีไฟล์ trace (เปิดด้วย TRACE_JOBS=1)'}), 404
+
 if __name__ == '__main__':
-    # ตรวจสอบว่ามี ChromeDriver
-    try:
-        searcher.init_selenium_driver()
-        searcher.close_driver()
-        print("✅ Selenium ChromeDriver พร้อมใช้งาน")
-    except Exception as e:
-        print(f"⚠️  ข้อผิดพลาด ChromeDriver: {e}")
-        print("💡 กรุณาติดตั้ง ChromeDriver และ Chrome")
+    # debug reloader รันไฟล์นี้สองโปรเซส งานหนัก (เปิด Chrome, ทำงานค้างต่อ) ทำเฉพาะในโปรเซสที่รับ request จริง
+    serving = os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+    if app.config['SELENIUM_SEARCH'] and 'Selenium Google' in app.config['SEARCH_SOURCES']:
+        # ตรวจแค่ว่ามีโปรแกรม Chrome ในเครื่อง แล้วอุ่นเครื่อง pool ใน background
+        if not chrome_available():
+            print("💡 ไม่พบ Chrome ในเครื่อง การค้นหาด้วย Selenium จะไม่สำเร็จ กรุณาติดตั้ง Chrome")
+        elif serving:
+            driver_pool.start()
+            print(f"✅ กำลังเปิด Chrome {driver_pool.size} ตัวไว้ล่วงหน้าใน pool (background)")
+    
+    resumed_jobs = resume_unfinished_jobs() if serving else 0
+    if resumed_jobs:
+        print(f"🔁 ทำงานที่ค้างไว้ต่อ {resumed_jobs} งาน")
     
     print("🚀 เริ่มเว็บเซิร์ฟเวอร์...")
     print("🌐 เปิด http://localhost:5000")
@@ -0,0 +1,353 @@
+"""ค้นหาข้อมูลติดต่อจากหลายแหล่งพร้อมกันด้วย asyncio + aiohttp"""
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import metrics
+import tracing
+from backoff import RETRYABLE_STATUSES, parse_retry_after
+from circuit_breaker import breaker_key
+from field_plan import MergedResult, wanted_source
+from rate_limit import host_key
+
+logger = logging.getLogger(__name__)
+
+async def _count_new_connection(session, context, params):
+    metrics.http_connections.inc(client='aiohttp', kind='new')
+
+
+async def _count_reused_connection(session, context, params):
+    metrics.http_connections.inc(client='aiohttp', kind='reused')
+
+
+class AsyncSearchEngine:
+    """ยิงคำค้นไปทุกแหล่งพร้อมกัน และยกเลิก request ที่เหลือเมื่อได้ผลที่ครบแล้ว
+
+    engine มี event loop ของตัวเองทำงานใน background thread เพื่อให้
+    aiohttp session และ connection ถูกใช้ซ้ำข้ามบริษัท ส่วน Selenium
+    ซึ่งเป็น blocking API จะรันใน executor แยกที่มี thread เดียว
+    """
+
+    def __init__(self, searcher, required_fields=('email', 'phone'), include_selenium=True,
+                 direct_max_bytes=512 * 1024, direct_connect_timeout=3, max_page_bytes=2 * 1024 * 1024,
+                 enabled_sources=None):
+        self.searcher = searcher
+        self.required_fields = tuple(required_fields)
+        self.include_selenium = include_selenium
+        self.enabled_sources = None if enabled_sources is None else frozenset(enabled_sources)
+        self.direct_max_bytes = direct_max_bytes
+        self.direct_connect_timeout = direct_connect_timeout
+        self.max_page_bytes = max_page_bytes
+        # แหล่งที่ถามไม่ได้ (breaker พักอยู่ หรือ error) ในการค้นหาครั้งล่าสุด
+        self.unavailable_sources = ()
+        self._session = None
+        # สร้างเมื่อค้นหาด้วย Selenium ครั้งแรก
+        self._selenium_executor = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def sources(self):
+        """รายชื่อแหล่งค้นหาเรียงตามลำดับความสำคัญ (ใช้ตัดสินเมื่อผลเท่ากัน)"""
+        sources = []
+        if self.include_selenium:
+            sources.append(("Selenium Google", self._search_selenium))
+        sources.extend([
+            ("DuckDuckGo", self._search_duckduckgo),
+            ("Bing", self._search_bing),
+            ("Direct Website", self._search_website_direct),
+            ("Business Directories", self._search_business_directories),
+        ])
+        if self.enabled_sources is not None:
+            sources = [(name, func) for name, func in sources if name in self.enabled_sources]
+        return sources
+
+    def run(self, company_name):
+        """เรียก search จาก thread ปกติ แล้วรอผลลัพธ์"""
+        return self.run_coroutine(self.search(company_name))
+
+    def run_coroutine(self, coro):
+        """รัน coroutine ใดๆ บน event loop ของ engine (ใช้ session เดียวกัน) แล้วรอผล"""
+        tracer = tracing.current()
+        if tracer is not None:
+            # task บน loop ของ engine ไม่ได้ context ของ thread ที่เรียก จึงส่ง tracer ไปเอง
+            coro = tracing.run_traced(tracer, coro)
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def close(self):
+        """ปิด aiohttp session, event loop และ Selenium executor"""
+        if self._loop.is_closed():
+            return
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+            self._session = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        if self._selenium_executor is not None:
+            self._selenium_executor.shutdown(wait=False)
+
+    async def search(self, company_name):
+        """ค้นหาพร้อมกันทุกแหล่งที่อาจให้ field ที่ต้องการ คืนค่า (email, phone, website, source)
+
+        ผลบางส่วนของแต่ละแหล่งถูกรวมกัน (field ละแหล่ง ตามลำดับแหล่งเมื่อได้ค่าจากหลายแหล่ง)
+        คืนทันทีเมื่อรวมแล้วครบตาม required_fields และยกเลิกแหล่งที่ยังค้างอยู่ซึ่งไม่น่าจะ
+        เติม field ที่เหลือได้แล้ว แหล่งที่ถามไม่ได้เก็บไว้ใน unavailable_sources
+        """
+        cancel_event = threading.Event()
+        sources = self.sources()
+        source_stats = getattr(self.searcher, 'source_stats', None)
+        crawl_known_website = getattr(self.searcher, 'crawl_known_website', True)
+        if source_stats is not None and sources:
+            # ข้ามแหล่งที่แทบไม่เคยพบข้อมูล และใช้ลำดับตามสถิติตัดสินเมื่อผลเท่ากัน
+            by_name = dict(sources)
+            sources = [(name, by_name[name]) for name in source_stats.plan(list(by_name))]
+        merged = MergedResult()
+        sources = [(name, func) for name, func in sources
+                   if wanted_source(name, merged, self.required_fields, source_stats, crawl_known_website)]
+        breakers = getattr(self.searcher, 'breakers', None)
+        if breakers is not None:
+            # แหล่งที่ถูกบล็อกและยังอยู่ในช่วงพักไม่ต้องเริ่มเลย
+            allowed = []
+            for name, func in sources:
+                if breakers.allow(name):
+                    allowed.append((name, func))
+                else:
+                    metrics.search_results.inc(source=name, outcome='breaker_open')
+                    merged.unavailable.append(name)
+            sources = allowed
+        tasks = {
+            asyncio.ensure_future(self._timed(source_stats, method_name, search_func,
+                                              company_name, cancel_event)): (rank, method_name)
+            for rank, (method_name, search_func) in enumerate(sources)
+        }
+
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    rank, method_name = tasks[task]
+                    try:
+                        result, blocked = task.result()
+                    except Exception as e:
+                        logger.error(f"Error in {method_name} for {company_name}: {e}")
+                        merged.unavailable.append(method_name)
+                        continue
+                    if blocked:
+                        merged.unavailable.append(method_name)
+                    merged.add(method_name, result, rank)
+
+                if merged.complete(self.required_fields):
+                    break
+                for task in list(pending):
+                    if not wanted_source(tasks[task][1], merged, self.required_fields, source_stats,
+                                         crawl_known_website):
+                        task.cancel()
+                        pending.discard(task)
+        finally:
+            cancel_event.set()
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        self.unavailable_sources = tuple(merged.unavailable)
+        return (*merged.as_tuple(), merged.source_label())
+
+    async def _timed(self, source_stats, method_name, search_func, company_name, cancel_event):
+        """เรียก search_func และบันทึกผลกับเวลาลง source_stats และ metrics
+        (source_stats ไม่บันทึกถ้าถูกยกเลิกหรือถูกบล็อก) คืน (ผล, ถูกบล็อกหรือไม่)
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        with tracing.span(method_name), metrics.track_source(method_name) as call:
+            try:
+                result = await search_func(company_name, cancel_event)
+            except Exception:
+                if source_stats is not None:
+                    source_stats.record(method_name, (None, None, None), loop.time() - started)
+                raise
+            call.result = result
+        blocked = call.outcome == 'blocked'
+        if source_stats is not None and not blocked:
+            source_stats.record(method_name, result, loop.time() - started)
+        return result, blocked
+
+    async def _get_session(self):
+        if self._session is None:
+            import aiohttp
+
+            headers = dict(self.searcher.session.headers)
+            headers['Accept-Encoding'] = 'gzip, deflate'
+            # จำกัด connection ต่อ host และใช้ keep-alive ซ้ำข้ามหน้าในโดเมนเดียวกัน
+            connector = aiohttp.TCPConnector(limit_per_host=8, ttl_dns_cache=300)
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_end.append(_count_new_connection)
+            trace_config.on_connection_reuseconn.append(_count_reused_connection)
+            self._session = aiohttp.ClientSession(headers=headers, connector=connector,
+                                                  trace_configs=[trace_config])
+        return self._session
+
+    async def fetch(self, url, timeout, max_bytes=None, connect_timeout=None, source=None):
+        """ดึงหน้าเว็บ คืนค่า HTML เมื่อได้ status 200 ไม่เช่นนั้นคืน None
+
+        อ่าน body แบบ stream และหยุดเมื่อครบ max_bytes (ค่าเริ่มต้น max_page_bytes)
+        ลองใหม่ตาม retry_policy ของ searcher เมื่อได้ 429/5xx หรือ connection หลุดกลางทาง
+        ถ้าระบุ source จะแจ้ง breaker ของแหล่งนั้นเมื่อถูกบล็อก (หน้า captcha คืน None)
+        """
+        import aiohttp
+
+        max_bytes = max_bytes or self.max_page_bytes
+        session = await self._get_session()
+        rate_limiter = getattr(self.searcher, 'rate_limiter', None)
+        retry_policy = getattr(self.searcher, 'retry_policy', None)
+        breakers = getattr(self.searcher, 'breakers', None) if source is not None else None
+        breaker = breaker_key(source, url) if breakers is not None else None
+        client_timeout = aiohttp.ClientTimeout(total=timeout, sock_connect=connect_timeout)
+        host = host_key(url)
+        attempt = 0
+        while True:
+            if rate_limiter is not None:
+                await rate_limiter.wait_async(url)
+            retry_after = None
+            with tracing.span('fetch', 'http', url=url):
+                try:
+                    async with session.get(url, timeout=client_timeout) as response:
+                        metrics.observe_response(host, response.status)
+                        if response.status == 200:
+                            body = bytearray()
+                            while len(body) < max_bytes:
+                                chunk = await response.content.read(max_bytes - len(body))
+                                if not chunk:
+                                    break
+                                body.extend(chunk)
+                            text = body.decode(response.charset or 'utf-8', errors='replace')
+                            if breakers is not None and breakers.observe(breaker, 200, text):
+                                return None
+                            return text
+                        if response.status not in RETRYABLE_STATUSES:
+                            if breakers is not None:
+                                breakers.observe(breaker, response.status)
+                            return None
+                        reason = str(response.status)
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                except asyncio.TimeoutError as e:
+                    metrics.observe_response(host, 'timeout')
+                    logger.debug(f"Fetch timed out for {url}: {e}")
+                    return None
+                except (aiohttp.ServerDisconnectedError, aiohttp.ClientPayloadError) as e:
+                    # connection หลุดกลางทาง ลองใหม่ได้ (connect ไม่ติดหรือ resolve ไม่ได้ไม่ลองใหม่)
+                    metrics.observe_response(host, 'error')
+                    logger.debug(f"Fetch dropped for {url}: {e}")
+                    reason = 'disconnect'
+                except aiohttp.ClientError as e:
+                    metrics.observe_response(host, 'error')
+                    logger.debug(f"Fetch failed for {url}: {e}")
+                    return None
+                except UnicodeError as e:
+                    logger.debug(f"Fetch failed for {url}: {e}")
+                    return None
+
+            if retry_policy is None or not retry_policy.should_retry(attempt):
+                if breakers is not None and reason.isdigit():
+                    breakers.observe(breaker, int(reason))
+                return None
+            metrics.http_retries.inc(host=metrics.host_label(host), reason=reason)
+            with tracing.span('backoff', 'http', url=url):
+                await asyncio.sleep(retry_policy.delay(attempt, retry_after))
+            attempt += 1
+
+    async def _search_selenium(self, company_name, cancel_event):
+        loop = asyncio.get_running_loop()
+        if self._selenium_executor is None:
+            self._selenium_executor = ThreadPoolExecutor(max_workers=1)
+        # ส่ง context (tracer ของงาน) ต่อไปยัง thread ของ Selenium ด้วย
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self._selenium_executor, context.run, self.searcher.search_with_selenium, company_name, cancel_event
+        )
+
+    def _store_page(self, company_name, source, url, text):
+        store_page = getattr(self.searcher, 'store_page', None)
+        if store_page is not None:
+            store_page(company_name, source, url, text)
+
+    def _store_and_extract(self, company_name, source, url, text):
+        self._store_page(company_name, source, url, text)
+        return self.searcher.extract_contact_info(text)
+
+    async def _read_page(self, company_name, source, url, text):
+        """บันทึกหน้าแล้วแยก (email, phone, website) ใน executor ของ loop
+
+        การ parse HTML, regex, บีบอัด และเขียนดิสก์ใช้เวลาเป็นมิลลิวินาทีต่อหน้า ถ้ารันบน
+        event loop ตรง ๆ fetch ของแหล่งอื่นที่รออยู่พร้อมกันจะสะดุดตามไปด้วย
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            None, context.run, self._store_and_extract, company_name, source, url, text)
+
+    async def _search_duckduckgo(self, company_name, cancel_event):
+        url = self.searcher.duckduckgo_url(company_name)
+        text = await self.fetch(url, timeout=15, source="DuckDuckGo")
+        if text:
+            return await self._read_page(company_name, "DuckDuckGo", url, text)
+        return None, None, None
+
+    async def _search_bing(self, company_name, cancel_event):
+        url = self.searcher.bing_url(company_name)
+        text = await self.fetch(url, timeout=15, source="Bing")
+        if text:
+            return await self._read_page(company_name, "Bing", url, text)
+        return None, None, None
+
+    async def _search_website_direct(self, company_name, cancel_event):
+        urls = self.searcher.candidate_website_urls(company_name)
+        resolver = getattr(self.searcher, 'resolver', None)
+        if resolver is not None:
+            # ยิง HTTP เฉพาะโดเมนที่ resolve ได้ โดเมนที่ไม่มีจริงจบในระดับมิลลิวินาที
+            resolved = await resolver.resolve_many_async(urlsplit(url).hostname for url in urls)
+            urls = [url for url in urls if resolved.get(urlsplit(url).hostname)]
+        fetches = [
+            asyncio.ensure_future(self.fetch(url, timeout=10, max_bytes=self.direct_max_bytes,
+                                              connect_timeout=self.direct_connect_timeout))
+            for url in urls
+        ]
+        try:
+            # รอตามลำดับการเดา เพื่อให้ได้ผลเหมือนการลองทีละโดเมน
+            for url, fetch in zip(urls, fetches):
+                text = await fetch
+                if text:
+                    email, phone, website = await self._read_page(company_name, "Direct Website", url, text)
+                    if any([email, phone]):
+                        return email, phone, url
+        finally:
+            for fetch in fetches:
+                fetch.cancel()
+        return None, None, None
+
+    async def _search_business_directories(self, company_name, cancel_event):
+        urls = self.searcher.directory_urls(company_name)
+        breakers = getattr(self.searcher, 'breakers', None)
+        if breakers is not None:
+            # ไดเรกทอรีที่ถูกบล็อกและยังอยู่ในช่วงพักไม่ต้องยิง ไดเรกทอรีอื่นยังถามได้
+            allowed = [url for url in urls if breakers.allow(breaker_key("Business Directories", url))]
+            if len(allowed) < len(urls):
+                metrics.note_blocked()
+            urls = allowed
+        fetches = [asyncio.ensure_future(self.fetch(url, timeout=15, source="Business Directories"))
+                   for url in urls]
+        try:
+            for url, fetch in zip(urls, fetches):
+                text = await fetch
+                if text:
+                    result = await self._read_page(company_name, "Business Directories", url, text)
+                    if any(result):
+                        return result
+        finally:
+            for fetch in fetches:
+                fetch.cancel()
+        return None, None, None
@@ -0,0 +1,50 @@
+"""นโยบายลองใหม่ของ HTTP request: exponential backoff พร้อม jitter ใช้ทั้ง requests และ aiohttp"""
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+# status ที่ server บอกว่าให้ลองใหม่ภายหลังได้ (status อื่นเช่น 403/404 ลองซ้ำก็ได้ผลเดิม)
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+# method ที่ส่งซ้ำได้โดยไม่มีผลข้างเคียง
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+
+def parse_retry_after(value, now=None):
+    """แปลง header Retry-After (วินาที หรือวันที่แบบ HTTP) เป็นจำนวนวินาที คืน None ถ้าอ่านไม่ได้"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, moment.timestamp() - (time.time() if now is None else now))
+
+
+class RetryPolicy:
+    """ลองใหม่ไม่เกิน retries ครั้ง โดยรอ backoff * 2^attempt วินาที (ไม่เกิน max_backoff)
+    คูณด้วยตัวสุ่มในช่วง 1 ± jitter เพื่อไม่ให้ทุก worker ยิงซ้ำพร้อมกัน
+
+    ถ้า server ส่ง Retry-After มาจะรออย่างน้อยเท่านั้น (แต่ไม่เกิน max_backoff)
+    """
+
+    def __init__(self, retries=1, backoff=0.5, max_backoff=10.0, jitter=0.5, rng=None):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+
+    def should_retry(self, attempt, method='GET'):
+        """ลองครั้งที่ attempt + 1 ได้หรือไม่ (attempt เริ่มที่ 0 = ครั้งแรก)"""
+        return attempt < self.retries and method.upper() in IDEMPOTENT_METHODS
+
+    def delay(self, attempt, retry_after=None):
+        """เวลารอก่อนลองใหม่หลังครั้งที่ attempt ล้มเหลว"""
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        delay *= self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_backoff))
+        return delay
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""ค้นหาข้อมูลติดต่อของทั้งไฟล์จาก command line โดยไม่ต้องเปิดหน้าเว็บ (เช่นรันจาก cron)
+
+แบ่งแถวเป็น shard ตามชื่อบริษัท (ชื่อเดียวกันอยู่ shard เดียวกัน จึงยังค้นหาครั้งเดียว)
+แต่ละ shard รันใน pipeline เดียวกับหน้าเว็บ (process_companies_async) ในโปรเซสของตัวเอง
+แล้วรวมผลกลับตามลำดับแถวเดิม ถ้าถูกหยุดกลางทาง รันคำสั่งเดิมซ้ำจะทำต่อจาก journal
+ของแต่ละ shard ใน --work-dir
+
+รัน: python batch.py companies.xlsx --output results.xlsx [--processes 4] [--workers 4]
+     [--sources duckduckgo,bing,direct,directories] [--cache cache/contacts.sqlite3 | --no-cache]
+     [--no-resume] [--work-dir DIR] [--required-fields email,phone] [--verbose]
+"""
+import argparse
+import csv
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+import zlib
+
+from company_io import RESULT_COLUMNS, ResultWriter, iter_company_names, iter_result_rows
+from company_names import canonicalize_company_name
+from rate_limit import DEFAULT_HOST_RATES, format_host_rates, parse_host_rates
+from search_urls import SOURCE_ALIASES, parse_sources
+
+
+def shard_of(company_name, shards):
+    """shard ของบริษัท (ชื่อที่ canonicalize แล้วเหมือนกันได้ shard เดียวกันเสมอ)"""
+    return zlib.crc32(canonicalize_company_name(company_name).encode('utf-8')) % shards
+
+
+def split_into_shards(input_path, work_dir, shards):
+    """เขียนรายชื่อของแต่ละ shard เป็น CSV คืน [(path, จำนวนแถว)]
+
+    เนื้อหาของ shard ขึ้นกับไฟล์ต้นฉบับและจำนวน shard เท่านั้น รันซ้ำจึงได้ไฟล์เดิม
+    และใช้ journal เดิมได้
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    paths = [os.path.join(work_dir, f'shard{index}.csv') for index in range(shards)]
+    files = [open(path + '.tmp', 'w', newline='', encoding='utf-8') for path in paths]
+    counts = [0] * shards
+    try:
+        writers = [csv.writer(f) for f in files]
+        for writer in writers:
+            writer.writerow(['Company'])
+        for company_name in iter_company_names(input_path):
+            index = shard_of(company_name, shards)
+            writers[index].writerow([company_name])
+            counts[index] += 1
+    finally:
+        for f in files:
+            f.close()
+    for path in paths:
+        os.replace(path + '.tmp', path)
+    return list(zip(paths, counts))
+
+
+def configure_environment(args):
+    """ตั้งค่า app ผ่าน environment (ต้องทำก่อน import app ทั้งในโปรเซสนี้และโปรเซสลูก)"""
+    if args.no_cache:
+        os.environ['CACHE_PATH'] = ''
+    elif args.cache:
+        os.environ['CACHE_PATH'] = args.cache
+    if args.sources:
+        os.environ['SEARCH_SOURCES'] = args.sources
+        if 'Selenium Google' not in parse_sources(args.sources):
+            os.environ['SELENIUM_SEARCH'] = '0'
+    if args.required_fields is not None:
+        os.environ['REQUIRED_FIELDS'] = args.required_fields
+
+
+def share_process_limits(processes, environ=None):
+    """แบ่งโควตาต่อ host และจำนวน Chrome ให้ processes โปรเซสที่รันพร้อมกัน
+
+    แต่ละโปรเซสมี HostRateLimiter และ DriverPool ของตัวเอง ถ้าไม่แบ่ง อัตราที่ยิงไปยัง
+    แต่ละ host จะคูณด้วยจำนวนโปรเซส ต้องเรียกก่อน import app เช่นเดียวกับ configure_environment
+    """
+    environ = os.environ if environ is None else environ
+    if processes <= 1:
+        return
+    # ค่าเริ่มต้นเดียวกับใน app.py
+    rates = {**DEFAULT_HOST_RATES, **parse_host_rates(environ.get('HOST_RATES', ''))}
+    environ['HOST_RATES'] = format_host_rates(
+        {host: (rate / processes, max(1, burst // processes)) for host, (rate, burst) in rates.items()})
+    environ['DEFAULT_HOST_RATE'] = f"{float(environ.get('DEFAULT_HOST_RATE', 2)) / processes:g}"
+    environ['DEFAULT_HOST_BURST'] = str(max(1, int(environ.get('DEFAULT_HOST_BURST', 5)) // processes))
+    pool_size = int(environ.get('DRIVER_POOL_SIZE', 2))
+    environ['DRIVER_POOL_SIZE'] = str(max(1, pool_size // processes) if pool_size > 0 else 0)
+
+
+def run_shard(shard_path, work_dir, workers, verbose=False):
+    """ค้นหาทุกแถวของ shard หนึ่ง คืน progress ของงาน (พร้อม path ของไฟล์ผลลัพธ์)"""
+    import app as app_module
+
+    if not verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    app_module.app.config['RESULT_FOLDER'] = work_dir
+    app_module.app.config['JOURNAL_FOLDER'] = os.path.join(work_dir, 'journals')
+    shard_name = os.path.splitext(os.path.basename(shard_path))[0]
+    progress = app_module.process_companies_async(shard_path, max_workers=workers, job_id=shard_name)
+    if progress['results']:
+        progress['result_path'] = os.path.join(work_dir, progress['results']['filename'])
+    return progress
+
+
+def _run_shard_args(args):
+    return run_shard(*args)
+
+
+def merge_shards(input_path, result_paths, output_path):
+    """รวมผลของทุก shard ตามลำดับแถวในไฟล์ต้นฉบับ คืนยอดรวม"""
+    shards = len(result_paths)
+    readers = [iter_result_rows(path) if path else iter(()) for path in result_paths]
+    writer = ResultWriter(output_path, columns=RESULT_COLUMNS)
+    totals = {'rows': 0, 'emails': 0, 'phones': 0, 'websites': 0}
+    try:
+        for company_name in iter_company_names(input_path):
+            row = next(readers[shard_of(company_name, shards)])
+            row['Company'] = company_name
+            writer.append(row)
+            totals['rows'] += 1
+            totals['emails'] += bool(row.get('Email'))
+            totals['phones'] += bool(row.get('Phone'))
+            totals['websites'] += bool(row.get('Website'))
+    finally:
+        writer.close()
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='ไฟล์รายชื่อบริษัท (.xlsx, .xls, .csv, .parquet) ที่มีคอลัมน์ Company')
+    parser.add_argument('--output', help='ไฟล์ผลลัพธ์ .xlsx หรือ .csv (ค่าเริ่มต้น <input>_contacts.xlsx)')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1,
+                        help='จำนวนโปรเซส/shard (ค่าเริ่มต้น = จำนวน CPU)')
+    parser.add_argument('--workers', type=int, default=None, help='จำนวน worker thread ต่อโปรเซส (MAX_WORKERS)')
+    parser.add_argument('--sources', default='',
+                        help=f'แหล่งค้นหาคั่นด้วยจุลภาค จาก {", ".join(SOURCE_ALIASES)} (ค่าว่าง = ทุกแหล่ง)')
+    parser.add_argument('--cache', help='ไฟล์ cache ผลการค้นหา (CACHE_PATH)')
+    parser.add_argument('--no-cache', action='store_true', help='ไม่ใช้ cache')
+    parser.add_argument('--required-fields', default=None, help='field ที่ต้องครบจึงหยุดค้นหา เช่น email,phone')
+    parser.add_argument('--work-dir', help='โฟลเดอร์ shard และ journal (ค่าเริ่มต้น <output>.work)')
+    parser.add_argument('--no-resume', action='store_true', help='เริ่มใหม่ทั้งหมดแม้มีงานค้างใน --work-dir')
+    parser.add_argument('--keep-work-dir', action='store_true', help='ไม่ลบ --work-dir เมื่อเสร็จ')
+    parser.add_argument('--verbose', action='store_true', help='แสดง log ของการค้นหาทุกแถว')
+    args = parser.parse_args(argv)
+
+    try:
+        parse_sources(args.sources)
+    except ValueError as e:
+        parser.error(str(e))
+    processes = max(1, args.processes)
+    output_path = args.output or os.path.splitext(args.input)[0] + '_contacts.xlsx'
+    work_dir = args.work_dir or output_path + '.work'
+    if args.no_resume and os.path.isdir(work_dir):
+        shutil.rmtree(work_dir)
+    configure_environment(args)
+
+    start = time.perf_counter()
+    shards = split_into_shards(args.input, work_dir, processes)
+    jobs = [(path, work_dir, args.workers, args.verbose) for path, count in shards if count]
+    print(f"{sum(count for _, count in shards)} แถว แบ่งเป็น {len(jobs)} shard", file=sys.stderr)
+
+    if processes == 1 or len(jobs) <= 1:
+        results = [run_shard(*job) for job in jobs]
+    else:
+        share_process_limits(min(processes, len(jobs)))
+        with multiprocessing.get_context('spawn').Pool(min(processes, len(jobs))) as pool:
+            results = []
+            for progress in pool.imap_unordered(_run_shard_args, jobs):
+                results.append(progress)
+                print(f"{progress['job_id']}: {progress['message']}", file=sys.stderr)
+
+    failed = [progress for progress in results if progress['status'] != 'completed']
+    if failed:
+        for progress in failed:
+            print(f"{progress['job_id']} ล้มเหลว: {progress['message']}", file=sys.stderr)
+        print(f"รันคำสั่งเดิมอีกครั้งเพื่อทำต่อจาก {work_dir}", file=sys.stderr)
+        return 1
+
+    result_paths = {progress['job_id']: progress['result_path'] for progress in results}
+    ordered_paths = [result_paths.get(f'shard{index}') for index in range(processes)]
+    totals = merge_shards(args.input, ordered_paths, output_path)
+    if not args.keep_work_dir:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - start
+    print(f"เสร็จ {totals['rows']} แถวใน {elapsed:.1f} วินาที ({totals['rows'] / elapsed * 60:.0f} แถว/นาที) "
+          f"พบอีเมล {totals['emails']} เบอร์โทร {totals['phones']} เว็บไซต์ {totals['websites']} -> {output_path}",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""เปรียบเทียบความเร็ว extract_contact_info แบบเดิมกับแบบ compile ล่วงหน้า
+
+รัน: python bench_extractor.py [--size-mb 2] [--repeat 3]
+"""
+import argparse
+import random
+import re
+import string
+import time
+
+from contact_extractor import extract_contact_info, extract_contact_info_html
+
+
+def legacy_extract_contact_info(text_content):
+    """extract_contact_info เวอร์ชันก่อนปรับปรุง (เก็บไว้เป็นฐานเปรียบเทียบ)"""
+    email = None
+    phone = None
+    website = None
+
+    email_patterns = [
+        r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+        r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.(com|co\.th|net|org|th)',
+    ]
+
+    for pattern in email_patterns:
+        emails = re.findall(pattern, text_content, re.IGNORECASE)
+        if emails:
+            valid_emails = [e for e in emails if not any(spam in e.lower()
+                for spam in ['noreply', 'no-reply', 'donotreply', 'google', 'facebook'])]
+            if valid_emails:
+                email = valid_emails[0]
+                break
+
+    phone_patterns = [
+        r'0[2-9][0-9]{7,8}',
+        r'\+66[0-9]{8,9}',
+        r'66[0-9]{8,9}',
+        r'0[0-9]{1,2}[-\s]?[0-9]{3}[-\s]?[0-9]{4}',
+        r'0[0-9]{2}[-\s]?[0-9]{3}[-\s]?[0-9]{3,4}',
+    ]
+
+    for pattern in phone_patterns:
+        phones = re.findall(pattern, text_content.replace(' ', '').replace('-', ''))
+        if phones:
+            phone = phones[0]
+            break
+
+    website_patterns = [
+        r'https?://[^\s<>"]+(?:\.[^\s<>"]+)*',
+        r'www\.[^\s<>"]+(?:\.[^\s<>"]+)+',
+        r'[a-zA-Z0-9.-]+\.(?:com|co\.th|net|org|th)(?:/[^\s<>"]*)?'
+    ]
+
+    for pattern in website_patterns:
+        websites = re.findall(pattern, text_content, re.IGNORECASE)
+        if websites:
+            valid_sites = []
+            for site in websites:
+                site = site.rstrip('.,)')
+                if not any(exclude in site.lower() for exclude in
+                    ['google', 'facebook', 'twitter', 'youtube', 'instagram', 'linkedin']):
+                    valid_sites.append(site)
+
+            if valid_sites:
+                website = valid_sites[0]
+                if not website.startswith('http'):
+                    website = 'https://' + website
+                break
+
+    return email, phone, website
+
+
+def synthetic_search_page(size_bytes, seed=0, with_contact=True):
+    """หน้าผลการค้นหาจำลอง: script, style, ลิงก์ และข้อมูลติดต่ออยู่ท้ายหน้า"""
+    rng = random.Random(seed)
+    blocks = []
+    total = 0
+    while total < size_bytes:
+        word = ''.join(rng.choices(string.ascii_lowercase, k=8))
+        block = rng.choice([
+            f'<script>var {word}="{"".join(rng.choices(string.ascii_letters + string.digits, k=200))}";</script>',
+            f'<style>.{word}{{color:#{rng.randrange(16 ** 6):06x};margin:{rng.randrange(40)}px}}</style>',
+            f'<a href="https://www.google.com/url?q={word}">{word} บริษัท จำกัด</a>',
+            f'<div class="result"><span>{word} ติดต่อสอบถาม รายละเอียดเพิ่มเติม</span></div>',
+            f'<img src="data:image/png;base64,{"".join(rng.choices(string.ascii_letters + string.digits, k=300))}">',
+        ])
+        blocks.append(block)
+        total += len(block)
+    if with_contact:
+        blocks.append('<p>ติดต่อ sales@example.co.th โทร 02-123-4567 www.example.co.th</p>')
+    return ''.join(blocks)
+
+
+def adversarial_page(size_bytes):
+    """อินพุตที่ทำให้ pattern เดิม backtrack หนัก: ชื่อโดเมนยาวที่ไม่มี TLD"""
+    unit = 'a.b-c.'
+    return '<div>' + unit * (size_bytes // len(unit)) + '</div>'
+
+
+def adversarial_digits_page(size_bytes):
+    """ตัวเลขและช่องว่างยาวต่อเนื่องที่ไม่เป็นเบอร์โทร"""
+    unit = '1 1-'
+    return '<div>' + unit * (size_bytes // len(unit)) + '</div>'
+
+
+def time_call(func, text, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size-mb', type=float, default=2, help='ขนาดหน้าเว็บจำลอง (MB)')
+    parser.add_argument('--adversarial-kb', type=float, default=16,
+                        help='ขนาดอินพุต adversarial (KB) ต้องเล็กเพราะแบบเดิมช้าแบบกำลังสอง')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    cases = [
+        (f'synthetic {args.size_mb:g} MB', synthetic_search_page(int(args.size_mb * 1024 * 1024))),
+        (f'synthetic no contact {args.size_mb:g} MB',
+         synthetic_search_page(int(args.size_mb * 1024 * 1024), with_contact=False)),
+        (f'adversarial domain {args.adversarial_kb:g} KB', adversarial_page(int(args.adversarial_kb * 1024))),
+        (f'adversarial digits {args.size_mb:g} MB', adversarial_digits_page(int(args.size_mb * 1024 * 1024))),
+    ]
+
+    print(f"{'case':<36}{'legacy (s)':>12}{'compiled (s)':>14}{'speed-up':>10}  same result")
+    for name, text in cases:
+        legacy_time, legacy_result = time_call(legacy_extract_contact_info, text, args.repeat)
+        new_time, new_result = time_call(extract_contact_info, text, args.repeat)
+        speedup = legacy_time / new_time if new_time else float('inf')
+        print(f"{name:<36}{legacy_time:>12.4f}{new_time:>14.4f}{speedup:>9.1f}x  {legacy_result == new_result}")
+
+    # หน้าเว็บที่ตัด script/style ด้วย lxml ก่อน: เวลา และจำนวนผลที่มาจาก script (false positive)
+    page = synthetic_search_page(int(args.size_mb * 1024 * 1024), with_contact=False)
+    page += '<script>var support = "bot@tracker.com";</script>'
+    print()
+    print(f"{'case':<36}{'regex (s)':>12}{'html (s)':>14}  regex result / html result")
+    regex_time, regex_result = time_call(extract_contact_info, page, args.repeat)
+    html_time, html_result = time_call(extract_contact_info_html, page, args.repeat)
+    print(f"{'script-only contact':<36}{regex_time:>12.4f}{html_time:>14.4f}  {regex_result} / {html_result}")
+
+
+if __name__ == '__main__':
+    main()
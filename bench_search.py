@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""วัดความเร็วของการค้นหาทั้งระบบแบบ offline กับ server จำลองในเครื่อง
+
+server จำลองตอบหน้าผลค้นหาของทุกแหล่ง (Google, DuckDuckGo, Bing, ไดเรกทอรี และ
+เว็บไซต์บริษัทพร้อมหน้าติดต่อ) จากหน้าที่บันทึกไว้ (--pages โฟลเดอร์ละแหล่ง เช่น
+pages/bing/*.html) หรือหน้าที่สร้างขึ้นตามชื่อบริษัท และจำลองความหน่วง, 429 และ
+timeout ได้ ทุกแหล่งถูกชี้มาที่ server นี้ผ่าน SEARCH_URLS จึงรันซ้ำได้ผลเท่าเดิม
+
+รายงานจำนวนแถวต่อนาที, p50/p95 ของเวลาต่อแถว, สัดส่วน request ที่ใช้ connection ซ้ำ
+และหน่วยความจำสูงสุด (RSS) ของ comprehensive_search และ process_companies_async
+แต่ละ phase รันในโปรเซสใหม่เพื่อให้ค่าหน่วยความจำไม่ปนกัน phase startup วัดเวลา import app และ cold start
+(เปิด interpreter จนตอบ request แรก) เทียบกับงบเวลา และตรวจว่า backend หนัก
+(LAZY_MODULES) ยังไม่ถูกโหลด ถ้าเกินงบจะจบด้วย exit code 1
+
+รัน: python bench_search.py [--rows 200] [--workers 4] [--latency 0.05] [--rate-429 0.02]
+     [--rate-timeout 0] [--pages recorded] [--phase startup,search,pipeline]
+     [--import-budget 0.5] [--cold-start-budget 1.0] [--json out.json]
+"""
+import argparse
+import csv
+import json
+import math
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# โอกาสที่แต่ละแหล่งจะมีข้อมูลของบริษัทหนึ่ง (หน้าที่สร้างขึ้นเท่านั้น)
+DEFAULT_HIT_RATES = {
+    'google': 0.6,
+    'duckduckgo': 0.5,
+    'bing': 0.4,
+    'yellowpages': 0.3,
+    'thailandyp': 0.2,
+    'site': 0.3,
+}
+
+# โมดูลที่ import app ต้องไม่โหลด (โหลดเมื่อใช้แหล่งค้นหาหรืออ่าน/เขียนไฟล์ครั้งแรก)
+LAZY_MODULES = ('selenium', 'aiohttp', 'requests', 'openpyxl', 'pandas')
+
+_STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+status = app.app.test_client().get('/').status_code
+print(json.dumps({'import_seconds': imported - started, 'status': status,
+                  'loaded': [name for name in sys.argv[1:] if name in sys.modules]}))
+"""
+
+# ขนาดโดยประมาณของหน้าผลค้นหาจริง (ข้อความที่ไม่มีข้อมูลติดต่อ)
+FILLER_BYTES = 48 * 1024
+
+
+def percentile(values, p):
+    """ค่า percentile แบบ nearest-rank (None ถ้าไม่มีค่า)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def peak_rss_mb():
+    """RSS สูงสุดของโปรเซสนี้ (MB) หรือ None ถ้าวัดไม่ได้"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux รายงานเป็น KB ส่วน macOS เป็น byte
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # client ยกเลิก request ที่ไม่ต้องใช้แล้ว (ได้ผลครบจากแหล่งอื่น) เป็นเรื่องปกติ
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StandInServer:
+    """HTTP server จำลองของทุกแหล่งค้นหา ทำงานใน background thread
+
+    ทุก request ถูกหน่วง latency วินาที (±jitter) ส่วนหนึ่งตอบ 429 (rate_429) และ
+    ส่วนหนึ่งค้างไว้ timeout_seconds วินาทีโดยไม่ตอบ (rate_timeout) ผลของแต่ละ
+    URL กำหนดจาก hash ของ URL จึงเหมือนเดิมทุกครั้งที่รัน
+    """
+
+    def __init__(self, pages=None, latency=0.05, jitter=0.5, rate_429=0.0, rate_timeout=0.0,
+                 timeout_seconds=16.0, hit_rates=None, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.rate_timeout = rate_timeout
+        self.timeout_seconds = timeout_seconds
+        self.hit_rates = {**DEFAULT_HIT_RATES, **(hit_rates or {})}
+        self.seed = seed
+        self.recorded = self._load_pages(pages) if pages else {}
+        self.requests = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @staticmethod
+    def _load_pages(folder):
+        recorded = {}
+        for source in DEFAULT_HIT_RATES:
+            source_folder = os.path.join(folder, source)
+            if not os.path.isdir(source_folder):
+                continue
+            pages = []
+            for name in sorted(os.listdir(source_folder)):
+                if name.endswith(('.html', '.htm')):
+                    with open(os.path.join(source_folder, name), encoding='utf-8', errors='replace') as f:
+                        pages.append(f.read())
+            if pages:
+                recorded[source] = pages
+        return recorded
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def search_urls(self):
+        """ค่า SEARCH_URLS ที่ชี้ทุกแหล่งมาที่ server นี้"""
+        return {
+            'google': f'{self.url}/google?q={{query}}',
+            'duckduckgo': f'{self.url}/duckduckgo?q={{query}}',
+            'bing': f'{self.url}/bing?q={{query}}',
+            'yellowpages': f'{self.url}/yellowpages?q={{query}}',
+            'thailandyp': f'{self.url}/thailandyp?keyword={{query}}',
+            'website': f'{self.url}/site/{{domain}}/',
+        }
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = _QuietHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._thread.join()
+            self._httpd = None
+
+    def _count(self, source, status):
+        with self._lock:
+            key = f'{source}:{status}'
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def _handle(self, handler):
+        parts = urlsplit(handler.path)
+        segments = [unquote(segment) for segment in parts.path.split('/') if segment]
+        source = segments[0] if segments else ''
+
+        with self._lock:
+            roll = self._rng.random()
+            delay = self.latency * (1 + self._rng.uniform(-self.jitter, self.jitter))
+        if roll < self.rate_timeout:
+            self._count(source, 'timeout')
+            time.sleep(self.timeout_seconds)
+            handler.close_connection = True
+            return
+        time.sleep(max(delay, 0))
+        if roll < self.rate_timeout + self.rate_429:
+            self._count(source, 429)
+            return self._send(handler, 429, 'Too Many Requests')
+
+        if source == 'site' and len(segments) >= 2:
+            html = self._site_page(segments[1], segments[2:])
+        elif source in DEFAULT_HIT_RATES:
+            query = ' '.join(value for values in parse_qs(parts.query).values() for value in values)
+            html = self._search_page(source, query)
+        else:
+            html = None
+
+        if html is None:
+            self._count(source, 404)
+            return self._send(handler, 404, 'Not Found')
+        self._count(source, 200)
+        self._send(handler, 200, html)
+
+    @staticmethod
+    def _send(handler, status, body):
+        data = body.encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'text/html; charset=utf-8')
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _page_rng(self, *key):
+        return random.Random(zlib.crc32('|'.join(key).encode('utf-8')) ^ self.seed)
+
+    @staticmethod
+    def _filler(rng):
+        words = ('ผลการค้นหา', 'บริษัท', 'จำกัด', 'ข่าว', 'รีวิว', 'ราคา', 'results', 'company', 'news')
+        return ' '.join(rng.choice(words) for _ in range(FILLER_BYTES // 12))
+
+    def _company_contacts(self, slug):
+        rng = self._page_rng('company', slug)
+        return (f'info@c{slug}.co.th',
+                f'02-{rng.randrange(100, 1000)}-{rng.randrange(1000, 10000)}',
+                f'{self.url}/site/c{slug}/')
+
+    def _search_page(self, source, query):
+        rng = self._page_rng(source, query)
+        if source in self.recorded:
+            return rng.choice(self.recorded[source])
+
+        body = []
+        if rng.random() < self.hit_rates[source]:
+            # บริษัทเดียวกันได้ข้อมูลชุดเดียวกันจากทุกแหล่ง แต่บางแหล่งมีไม่ครบทุก field
+            email, phone, website = self._company_contacts(f'{zlib.crc32(query.encode("utf-8")):08x}')
+            body.append(f'<a href="{website}">{website}</a>')
+            if rng.random() < 0.7:
+                body.append(f'<p>อีเมล {email}</p>')
+            if rng.random() < 0.7:
+                body.append(f'<p>โทร {phone}</p>')
+        body.append(f'<p>{self._filler(rng)}</p>')
+        return f'<html><body>{"".join(body)}</body></html>'
+
+    def _site_page(self, domain, rest):
+        """หน้าแรกของเว็บไซต์บริษัท (ลิงก์ไปหน้าติดต่อ) และหน้าติดต่อ"""
+        if domain.startswith('c') and len(domain) == 9:
+            # เว็บไซต์ที่ได้จากผลค้นหา: มีอยู่จริงเสมอ
+            email, phone, _ = self._company_contacts(domain[1:])
+        elif self._page_rng('site', domain).random() < self.hit_rates['site']:
+            email, phone, _ = self._company_contacts(f'{zlib.crc32(domain.encode("utf-8")):08x}')
+        else:
+            return None
+        if rest and rest[0] == 'contact':
+            return f'<html><body><a href="mailto:{email}">{email}</a> <a href="tel:{phone}">{phone}</a></body></html>'
+        if rest:
+            return None
+        return '<html><body><a href="contact">ติดต่อเรา</a><p>ยินดีต้อนรับ</p></body></html>'
+
+
+def summarize(latencies, elapsed, found):
+    rows = len(latencies)
+    return {
+        'rows': rows,
+        'seconds': round(elapsed, 2),
+        'rows_per_min': round(rows / elapsed * 60, 1) if elapsed else None,
+        'p50': round(percentile(latencies, 50), 3) if latencies else None,
+        'p95': round(percentile(latencies, 95), 3) if latencies else None,
+        'found_rate': round(found / rows, 3) if rows else 0,
+    }
+
+
+def bench_search(companies, workers, make_searcher):
+    """เรียก comprehensive_search กับทุกบริษัทด้วย worker thread ละ searcher"""
+    local = threading.local()
+    searchers = []
+    lock = threading.Lock()
+
+    def search(company_name):
+        if not hasattr(local, 'searcher'):
+            local.searcher = make_searcher()
+            with lock:
+                searchers.append(local.searcher)
+        started = time.perf_counter()
+        email, phone, website, _ = local.searcher.comprehensive_search(company_name)
+        return time.perf_counter() - started, any([email, phone, website])
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(search, companies))
+    finally:
+        for searcher in searchers:
+            searcher.close()
+    elapsed = time.perf_counter() - start
+    return summarize([latency for latency, _ in results], elapsed, sum(found for _, found in results))
+
+
+class _TimingFeed:
+    """รับเหตุการณ์จาก process_companies_async แล้วจับเวลาตั้งแต่เริ่มค้นหาจนเขียนแถว"""
+
+    def __init__(self):
+        self.started = {}
+        self.latencies = []
+        self.found = 0
+        self._lock = threading.Lock()
+
+    def publish(self, event):
+        now = time.perf_counter()
+        with self._lock:
+            if event['state'] == 'searching':
+                self.started.setdefault(event['company'], now)
+                return
+            started = self.started.pop(event['company'], None)
+            if started is not None:
+                self.latencies.append(now - started)
+            self.found += event['state'] != 'not_found'
+
+
+def bench_pipeline(companies, workers, workdir):
+    """รัน process_companies_async กับไฟล์ CSV ของรายชื่อบริษัท"""
+    import app as app_module
+
+    app_module.app.config['JOURNAL_FOLDER'] = os.path.join(workdir, 'journals')
+    app_module.app.config['RESULT_FOLDER'] = workdir
+    path = os.path.join(workdir, 'companies.csv')
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Company'])
+        writer.writerows([name] for name in companies)
+
+    feed = _TimingFeed()
+    start = time.perf_counter()
+    progress = app_module.process_companies_async(path, max_workers=workers, feed=feed)
+    elapsed = time.perf_counter() - start
+    if progress['status'] != 'completed':
+        raise RuntimeError(progress['message'])
+    result = summarize(feed.latencies, elapsed, feed.found)
+    # latency นับเฉพาะแถวที่ค้นหาจริง แต่ rows/min นับทุกแถวในไฟล์ (รวมแถวซ้ำ)
+    result['rows'] = progress['results']['total_companies']
+    result['rows_per_min'] = round(result['rows'] / elapsed * 60, 1) if elapsed else None
+    return result
+
+
+def configure_environment(search_urls, host_rate):
+    """ตั้งค่า app ให้ใช้ server จำลองและไม่แตะ cache/สถิติ/ไฟล์ของเครื่อง (ต้องเรียกก่อน import app)"""
+    os.environ.update({
+        'SEARCH_URLS': ','.join(f'{name}={template}' for name, template in search_urls.items()),
+        'SELENIUM_SEARCH': '0',
+        'CACHE_PATH': '',
+        'SOURCE_STATS_PATH': '',
+        'DNS_CACHE_PATH': '',
+        'PAGE_STORE_PATH': '',
+        # ทุกแหล่งอยู่บน host เดียวกัน จึงใช้โควตาต่อ host ที่สูงพอไม่ให้เป็นคอขวด
+        'DEFAULT_HOST_RATE': str(host_rate),
+        'DEFAULT_HOST_BURST': str(max(1, int(host_rate))),
+        'RATE_LIMIT_JITTER': '0',
+    })
+
+
+def _run_phase(phase, companies, workers, search_urls, host_rate):
+    configure_environment(search_urls, host_rate)
+    import logging
+
+    started = time.perf_counter()
+    import app as app_module
+    import_seconds = time.perf_counter() - started
+    logging.getLogger().setLevel(logging.WARNING)
+    import_rss = peak_rss_mb()
+
+    if phase == 'search':
+        result = bench_search(companies, workers, app_module.ImprovedContactSearcher)
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            result = bench_pipeline(companies, workers, workdir)
+    import metrics
+
+    result.update(import_seconds=round(import_seconds, 2), import_rss_mb=import_rss, peak_rss_mb=peak_rss_mb(),
+                  connection_reuse=metrics.connection_reuse_rate())
+    return result
+
+
+def measure_startup(repeat=3):
+    """เวลา import app และ cold start ของโปรเซสใหม่ (ค่าต่ำสุดจาก repeat ครั้ง)
+    พร้อมรายชื่อโมดูลใน LAZY_MODULES ที่ถูกโหลดไปแล้วหลัง request แรก
+    """
+    env = dict(os.environ, CACHE_PATH='', SOURCE_STATS_PATH='', DNS_CACHE_PATH='', PAGE_STORE_PATH='')
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        completed = subprocess.run([sys.executable, '-c', _STARTUP_SCRIPT, *LAZY_MODULES], env=env,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)),
+                                   capture_output=True, text=True, check=True)
+        run = json.loads(completed.stdout.strip().splitlines()[-1])
+        run['cold_start_seconds'] = time.perf_counter() - started
+        runs.append(run)
+    return {
+        'import_seconds': round(min(run['import_seconds'] for run in runs), 3),
+        'cold_start_seconds': round(min(run['cold_start_seconds'] for run in runs), 3),
+        'status': runs[-1]['status'],
+        'loaded': runs[-1]['loaded'],
+    }
+
+
+def make_companies(rows, duplicates, seed=0):
+    """รายชื่อบริษัทจำลอง โดยมีแถวซ้ำ (ต่างกันแค่รูปแบบนิติบุคคล) ตามสัดส่วน duplicates"""
+    rng = random.Random(seed)
+    companies = []
+    for i in range(rows):
+        if companies and rng.random() < duplicates:
+            base = rng.choice(companies).replace('บริษัท ', '').replace(' จำกัด', '')
+            companies.append(f'{base} Co., Ltd.')
+        else:
+            companies.append(f'บริษัท ทดสอบ{i} จำกัด')
+    return companies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--input', help='ไฟล์รายชื่อบริษัท (คอลัมน์ Company) แทนชื่อที่สร้างขึ้น')
+    parser.add_argument('--duplicates', type=float, default=0.1, help='สัดส่วนแถวซ้ำของชื่อที่สร้างขึ้น')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--phase', default='startup,search,pipeline',
+                        help='phase คั่นด้วยจุลภาค จาก startup, search, pipeline')
+    parser.add_argument('--pages', help='โฟลเดอร์หน้าที่บันทึกไว้ แยกโฟลเดอร์ตามแหล่ง เช่น pages/bing/*.html')
+    parser.add_argument('--latency', type=float, default=0.05, help='ความหน่วงต่อ request (วินาที)')
+    parser.add_argument('--jitter', type=float, default=0.5, help='สัดส่วนที่ความหน่วงแกว่งได้')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='สัดส่วน request ที่ตอบ 429')
+    parser.add_argument('--rate-timeout', type=float, default=0.0, help='สัดส่วน request ที่ค้างจนหมดเวลา')
+    parser.add_argument('--timeout-seconds', type=float, default=16.0, help='เวลาที่ค้าง request ไว้')
+    parser.add_argument('--host-rate', type=float, default=1000.0, help='โควตา request/วินาที ต่อ host')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--import-budget', type=float, default=0.5, help='งบเวลา import app (วินาที)')
+    parser.add_argument('--cold-start-budget', type=float, default=1.0,
+                        help='งบเวลาตั้งแต่เปิด python จนตอบ request แรก (วินาที)')
+    parser.add_argument('--json', help='บันทึกผลเป็น JSON')
+    args = parser.parse_args()
+    phases = [name.strip() for name in args.phase.split(',') if name.strip()]
+    report = {}
+    over_budget = False
+
+    if 'startup' in phases:
+        phases.remove('startup')
+        startup = report['startup'] = measure_startup()
+        over_budget = (startup['import_seconds'] > args.import_budget
+                       or startup['cold_start_seconds'] > args.cold_start_budget or bool(startup['loaded']))
+        print(f"startup   import app {startup['import_seconds']}s (งบ {args.import_budget}s)  "
+              f"cold start {startup['cold_start_seconds']}s (งบ {args.cold_start_budget}s)"
+              + (f"  โหลดแล้ว: {', '.join(startup['loaded'])}" if startup['loaded'] else '')
+              + ('  ❌ เกินงบ' if over_budget else '  ✅'))
+
+    if args.input:
+        from company_io import iter_company_names
+        companies = list(iter_company_names(args.input))
+    else:
+        companies = make_companies(args.rows, args.duplicates, args.seed)
+
+    server = StandInServer(pages=args.pages, latency=args.latency, jitter=args.jitter,
+                           rate_429=args.rate_429, rate_timeout=args.rate_timeout,
+                           timeout_seconds=args.timeout_seconds, seed=args.seed).start()
+    print(f"server จำลอง: {server.url}  แถว: {len(companies)}  workers: {args.workers}")
+    try:
+        context = multiprocessing.get_context('spawn')
+        for phase in phases:
+            with context.Pool(1) as pool:
+                result = pool.apply(_run_phase, (phase, companies, args.workers,
+                                                 server.search_urls(), args.host_rate))
+            report[phase] = result
+            print(f"{phase:<9} {result['rows_per_min']:>9} แถว/นาที  p50 {result['p50']}s  "
+                  f"p95 {result['p95']}s  พบข้อมูล {result['found_rate']:.0%}  "
+                  f"ใช้ connection ซ้ำ {result['connection_reuse'] or 0:.0%}  "
+                  f"RSS สูงสุด {result['peak_rss_mb']} MB (หลัง import {result['import_rss_mb']} MB)")
+    finally:
+        server.stop()
+    report['server_requests'] = dict(sorted(server.requests.items()))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if over_budget else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
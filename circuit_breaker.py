@@ -0,0 +1,187 @@
+"""พักแหล่งค้นหาที่ถูกบล็อก (429/403 หรือหน้า captcha) ชั่วคราว แทนที่จะให้ทุกแถวรอแหล่งที่ตอบไม่ได้
+
+breaker หนึ่งตัวต่อแหล่ง (แหล่งที่ถามหลาย host เช่นไดเรกทอรี แยก breaker ตาม host ดู breaker_key)
+ใช้ร่วมกันทุก worker ในโปรเซส เมื่อถูกบล็อกติดกันครบ threshold ครั้ง
+breaker จะเปิด (ข้ามแหล่งนั้น) เป็นเวลา cooldown วินาที แล้วปล่อยให้หนึ่งแถวลองแหล่งนั้น (probe)
+ถ้า probe ผ่านจะกลับมาใช้ตามปกติ ถ้ายังถูกบล็อกจะพักต่อเป็นสองเท่า (ไม่เกิน max_cooldown)
+"""
+import logging
+import threading
+import time
+
+import metrics
+from rate_limit import host_key
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# ค่าของ gauge contact_breaker_state
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# status ที่แปลว่าแหล่งปฏิเสธเรา ไม่ใช่แค่หน้านั้นไม่มีอยู่
+BLOCK_STATUSES = frozenset({403, 429})
+
+# ข้อความในหน้าที่แปลว่าได้หน้า captcha หรือหน้าบล็อกแทนผลการค้นหา (เทียบแบบตัวพิมพ์เล็ก)
+BLOCK_MARKERS = (
+    ('unusual traffic from your computer network', 'captcha'),
+    ('/sorry/index', 'captcha'),
+    ('anomaly-modal', 'captcha'),
+    ('please verify you are a human', 'captcha'),
+    ('challenges.cloudflare.com', 'challenge'),
+)
+# widget captcha ที่ไดเรกทอรีฝังในฟอร์มติดต่อของหน้าปกติได้ นับเป็นการบล็อกเฉพาะหน้าของเครื่องมือค้นหา
+CAPTCHA_WIDGET_MARKERS = ('g-recaptcha', 'h-captcha')
+SEARCH_ENGINE_SOURCES = frozenset({'Selenium Google', 'DuckDuckGo', 'Bing'})
+# แหล่งที่ถามหลาย host: host หนึ่งถูกบล็อกไม่ควรทำให้ข้าม host อื่นของแหล่งเดียวกัน
+PER_HOST_SOURCES = frozenset({'Business Directories'})
+# หน้าบล็อกมีขนาดเล็ก ตรวจเฉพาะส่วนต้นของหน้า
+BLOCK_SCAN_CHARS = 64 * 1024
+
+
+def detect_block(status, text=None, url=None, search_engine=True):
+    """เหตุผลที่ response นี้เป็นการบล็อก (เช่น '429', 'captcha') คืน None ถ้าไม่ใช่
+
+    search_engine เป็นเท็จสำหรับหน้าที่ไม่ใช่ของเครื่องมือค้นหา ซึ่งไม่นับ CAPTCHA_WIDGET_MARKERS
+    """
+    if status in BLOCK_STATUSES:
+        return str(status)
+    if url and '/sorry/' in url:
+        return 'captcha'
+    if status == 200 and text:
+        head = text[:BLOCK_SCAN_CHARS].lower()
+        for marker, reason in BLOCK_MARKERS:
+            if marker in head:
+                return reason
+        if search_engine and any(marker in head for marker in CAPTCHA_WIDGET_MARKERS):
+            return 'captcha'
+    return None
+
+
+def breaker_key(source, url):
+    """ชื่อ breaker ของ request ไปยัง url ของแหล่ง source (เช่น Business Directories (thailandyp.com))"""
+    if source in PER_HOST_SOURCES:
+        return f'{source} ({host_key(url)})'
+    return source
+
+
+class _Breaker:
+    __slots__ = ('state', 'failures', 'reason', 'cooldown', 'retry_at', 'trips')
+
+    def __init__(self, cooldown):
+        self.state = CLOSED
+        self.failures = 0
+        self.reason = None
+        self.cooldown = cooldown
+        self.retry_at = 0.0
+        self.trips = 0
+
+
+class CircuitBreakers:
+    """breaker แยกตามชื่อแหล่ง (threshold 0 = ปิด ไม่ข้ามแหล่งใดเลย)"""
+
+    def __init__(self, threshold=3, cooldown=300.0, max_cooldown=3600.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._clock = clock
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _get(self, source):
+        breaker = self._breakers.get(source)
+        if breaker is None:
+            breaker = self._breakers[source] = _Breaker(self.cooldown)
+        return breaker
+
+    def _set_state(self, source, breaker, state):
+        breaker.state = state
+        metrics.breaker_transitions.inc(source=source, state=state)
+
+    def allow(self, source):
+        """เรียกแหล่งนี้ได้หรือไม่ เมื่อพักครบ cooldown แล้ว ผู้เรียกคนแรกได้เป็น probe
+        (ถ้า probe ไม่ได้ผลกลับมาเลย คนถัดไปได้ลองเมื่อครบ cooldown อีกรอบ)
+        """
+        if self.threshold <= 0:
+            return True
+        with self._lock:
+            breaker = self._breakers.get(source)
+            if breaker is None or breaker.state == CLOSED:
+                return True
+            now = self._clock()
+            if now < breaker.retry_at:
+                return False
+            breaker.retry_at = now + breaker.cooldown
+            if breaker.state == OPEN:
+                self._set_state(source, breaker, HALF_OPEN)
+        logger.info(f"Probing {source} after cooldown")
+        return True
+
+    def record_success(self, source):
+        with self._lock:
+            breaker = self._breakers.get(source)
+            if breaker is None:
+                return
+            breaker.failures = 0
+            if breaker.state == CLOSED:
+                return
+            breaker.cooldown = self.cooldown
+            breaker.reason = None
+            self._set_state(source, breaker, CLOSED)
+        logger.info(f"{source} answers again, circuit closed")
+
+    def record_block(self, source, reason):
+        """บันทึกว่าแหล่งนี้ถูกบล็อกหนึ่งครั้ง คืน True ถ้า breaker เพิ่งเปิด"""
+        if self.threshold <= 0:
+            return False
+        with self._lock:
+            breaker = self._get(source)
+            breaker.failures += 1
+            breaker.reason = reason
+            if breaker.state == HALF_OPEN:
+                breaker.cooldown = min(breaker.cooldown * 2, self.max_cooldown)
+            elif breaker.state == OPEN or breaker.failures < self.threshold:
+                return False
+            breaker.retry_at = self._clock() + breaker.cooldown
+            breaker.trips += 1
+            cooldown = breaker.cooldown
+            self._set_state(source, breaker, OPEN)
+        logger.warning(f"{source} is blocked ({reason}), skipping it for {cooldown:.0f}s")
+        return True
+
+    def observe(self, source, status, text=None, url=None):
+        """บันทึก response ของ breaker source (ชื่อแหล่ง หรือ breaker_key) คืนเหตุผลถ้าเป็นการบล็อก
+
+        status อื่นที่ไม่ใช่ 200 (เช่น 404, 5xx) ไม่นับทั้งสองทาง การบล็อกถูกแจ้งไปยังการค้นหา
+        ของแหล่งที่กำลังทำงานด้วย (metrics.note_blocked) เพื่อไม่ให้นับเป็นการไม่พบข้อมูล
+        """
+        reason = detect_block(status, text, url, search_engine=source in SEARCH_ENGINE_SOURCES)
+        if reason is not None:
+            metrics.note_blocked()
+            self.record_block(source, reason)
+        elif status == 200:
+            self.record_success(source)
+        return reason
+
+    def state(self, source):
+        with self._lock:
+            breaker = self._breakers.get(source)
+            return breaker.state if breaker is not None else CLOSED
+
+    def states(self):
+        """[(source, state)] ของทุกแหล่งที่เคยถูกบล็อก (สำหรับ gauge)"""
+        with self._lock:
+            return [(source, breaker.state) for source, breaker in self._breakers.items()]
+
+    def snapshot(self):
+        """สถานะของแหล่งที่ถูกพักอยู่ (ไม่รวมแหล่งปกติ) สำหรับแสดงใน progress"""
+        now = self._clock()
+        with self._lock:
+            return [
+                {'source': source, 'state': breaker.state, 'reason': breaker.reason,
+                 'retry_in': round(max(0.0, breaker.retry_at - now), 1), 'trips': breaker.trips}
+                for source, breaker in sorted(self._breakers.items())
+                if breaker.state != CLOSED
+            ]
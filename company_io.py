@@ -0,0 +1,163 @@
+"""อ่านรายชื่อบริษัทและเขียนไฟล์ผลลัพธ์แบบ streaming สำหรับไฟล์ขนาดใหญ่"""
+import csv
+import os
+
+SUPPORTED_EXTENSIONS = ('.xlsx', '.xls', '.csv', '.parquet')
+
+RESULT_COLUMNS = ['Company', 'Email', 'Phone', 'Website', 'Address', 'Source', 'Cached']
+
+
+class MissingCompanyColumn(ValueError):
+    """ไฟล์ไม่มีคอลัมน์ Company"""
+
+
+def _extension(filepath):
+    return os.path.splitext(filepath)[1].lower()
+
+
+def _clean_name(value):
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def iter_company_names(filepath):
+    """อ่านคอลัมน์ Company ทีละแถวโดยไม่โหลดทั้งไฟล์เข้าหน่วยความจำ
+
+    .xlsx ใช้ openpyxl แบบ read-only, .csv ใช้ csv.reader และ .parquet อ่านทีละ
+    batch ด้วย pyarrow ส่วน .xls (รูปแบบเก่า) ต้องอ่านทั้งไฟล์ผ่าน pandas
+    """
+    extension = _extension(filepath)
+    if extension == '.xlsx':
+        yield from _iter_xlsx(filepath)
+    elif extension == '.csv':
+        yield from _iter_csv(filepath)
+    elif extension == '.parquet':
+        yield from _iter_parquet(filepath)
+    elif extension == '.xls':
+        yield from _iter_xls(filepath)
+    else:
+        raise ValueError(f'ไม่รองรับไฟล์ {extension}')
+
+
+def _iter_xlsx(filepath):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, ())
+        if 'Company' not in header:
+            raise MissingCompanyColumn('Company')
+        column = header.index('Company')
+        for row in rows:
+            yield _clean_name(row[column] if column < len(row) else None)
+    finally:
+        workbook.close()
+
+
+def _iter_csv(filepath):
+    with open(filepath, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        if 'Company' not in header:
+            raise MissingCompanyColumn('Company')
+        column = header.index('Company')
+        for row in reader:
+            yield _clean_name(row[column] if column < len(row) else None)
+
+
+def _import_parquet():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError('ต้องติดตั้ง pyarrow เพื่ออ่านไฟล์ .parquet (pip install pyarrow)')
+    return pq
+
+
+def _iter_parquet(filepath):
+    pq = _import_parquet()
+    parquet_file = pq.ParquetFile(filepath)
+    if 'Company' not in parquet_file.schema_arrow.names:
+        raise MissingCompanyColumn('Company')
+    for batch in parquet_file.iter_batches(columns=['Company']):
+        for value in batch.column(0).to_pylist():
+            yield _clean_name(value)
+
+
+def _iter_xls(filepath):
+    import pandas as pd
+
+    df = pd.read_excel(filepath)
+    if 'Company' not in df.columns:
+        raise MissingCompanyColumn('Company')
+    for value in df['Company']:
+        yield '' if pd.isna(value) else _clean_name(value)
+
+
+def count_company_rows(filepath):
+    """จำนวนแถวข้อมูล (ไม่รวม header) สำหรับแสดงความคืบหน้า"""
+    extension = _extension(filepath)
+    if extension == '.xlsx':
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(filepath, read_only=True)
+        try:
+            max_row = workbook.active.max_row
+        finally:
+            workbook.close()
+        if max_row:
+            return max(max_row - 1, 0)
+    elif extension == '.parquet':
+        return _import_parquet().ParquetFile(filepath).metadata.num_rows
+    return sum(1 for _ in iter_company_names(filepath))
+
+
+def iter_result_rows(filepath):
+    """อ่านไฟล์ผลลัพธ์ (.xlsx หรือ .csv) ทีละแถวเป็น dict ตาม header"""
+    if _extension(filepath) == '.csv':
+        with open(filepath, newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                yield row
+        return
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, ())
+        for row in rows:
+            yield {column: '' if value is None else value for column, value in zip(header, row)}
+    finally:
+        workbook.close()
+
+
+class ResultWriter:
+    """เขียนผลลัพธ์ทีละแถว: .csv ด้วย csv.writer ส่วนนามสกุลอื่นเป็น .xlsx ด้วย
+    openpyxl แบบ write-only (.xlsx รับได้ไม่เกินประมาณหนึ่งล้านแถว)
+    """
+
+    def __init__(self, path, columns=RESULT_COLUMNS):
+        self.path = path
+        self.columns = columns
+        self.rows_written = 0
+        if _extension(path) == '.csv':
+            self._workbook = None
+            self._file = open(path, 'w', newline='', encoding='utf-8-sig')
+            self._write = csv.writer(self._file).writerow
+        else:
+            from openpyxl import Workbook
+
+            self._workbook = Workbook(write_only=True)
+            self._write = self._workbook.create_sheet().append
+        self._write(columns)
+
+    def append(self, row):
+        self._write([row.get(column, '') for column in self.columns])
+        self.rows_written += 1
+
+    def close(self):
+        if self._workbook is None:
+            self._file.close()
+        else:
+            self._workbook.save(self.path)
@@ -0,0 +1,53 @@
+"""จัดรูปแบบชื่อบริษัทให้เป็นมาตรฐานเดียวกัน ใช้เป็น key ของ cache และการรวมแถวซ้ำ"""
+import re
+import unicodedata
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_company_name(company_name):
+    """ชื่อบริษัทแบบ NFKC ตัวพิมพ์เล็ก และช่องว่างเดียว"""
+    name = unicodedata.normalize('NFKC', str(company_name))
+    return _WHITESPACE_RE.sub(' ', name).strip().casefold()
+
+
+def _compile_normalized(pattern):
+    """compile pattern หลัง NFKC เพื่อให้ตรงกับชื่อที่ normalize แล้ว (เช่น สระอำ)"""
+    return re.compile(unicodedata.normalize('NFKC', pattern))
+
+
+# คำนำหน้ารูปแบบนิติบุคคล (ตัดออกเฉพาะต้นชื่อ)
+_LEGAL_PREFIX_RE = _compile_normalized(
+    r'^(?:บริษัท|บจก\.?|บมจ\.?|ห้างหุ้นส่วนจำกัด|ห้างหุ้นส่วนสามัญ|หจก\.?)\s*'
+)
+
+# คำลงท้ายรูปแบบนิติบุคคล (ตัดซ้ำจนไม่เหลือ เช่น "co., ltd." แล้วตามด้วย "(มหาชน)")
+# คำภาษาอังกฤษต้องขึ้นต้นคำใหม่ เพื่อไม่ให้ตัด "co" ออกจาก "costco"
+_LEGAL_SUFFIX_RE = _compile_normalized(
+    r'[\s,.]*(?:'
+    r'จำกัด\s*\(\s*มหาชน\s*\)|\(\s*มหาชน\s*\)|จำกัด'
+    r'|(?<![^\s,.])(?:'
+    r'public\s+company\s+limited|public\s+co\.?,?\s*ltd\.?|pcl|plc'
+    r'|company\s+limited|co\.?,?\s*ltd\.?|limited|ltd\.?'
+    r'|incorporated|inc\.?|corporation|corp\.?|company|co\.?'
+    r'))[\s,.]*$'
+)
+
+_PUNCTUATION_RE = re.compile(r'[\s,.]+')
+
+
+def canonicalize_company_name(company_name):
+    """ชื่อบริษัทที่ตัดรูปแบบนิติบุคคลออก ใช้จับคู่ชื่อที่เขียนต่างกันเล็กน้อย
+
+    เช่น "บริษัท ซีพี ออลล์ จำกัด (มหาชน)" และ "ซีพี ออลล์ PCL" ได้ "ซีพี ออลล์"
+    เหมือนกัน ถ้าตัดแล้วไม่เหลืออะไรจะคืนชื่อที่ normalize แล้วแทน
+    """
+    normalized = normalize_company_name(company_name)
+    name = _LEGAL_PREFIX_RE.sub('', normalized)
+    while True:
+        stripped = _LEGAL_SUFFIX_RE.sub('', name)
+        if stripped == name:
+            break
+        name = stripped
+    name = _PUNCTUATION_RE.sub(' ', name).strip()
+    return name or normalized
@@ -0,0 +1,133 @@
+"""Cache ผลการค้นหาข้อมูลติดต่อแบบถาวรใน SQLite"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from company_names import canonicalize_company_name
+from field_plan import FIELDS, meets_completeness
+
+logger = logging.getLogger(__name__)
+
+DAY = 24 * 60 * 60
+
+
+class ContactCache:
+    """เก็บ (email, phone, website, source) ต่อชื่อบริษัทที่ตัดรูปแบบนิติบุคคลแล้ว
+
+    ผลที่ไม่พบข้อมูลหมดอายุเร็วกว่า (negative_ttl) เพื่อให้ค้นใหม่ได้เร็วขึ้น
+    แต่ละรายการจำ required_fields ของการค้นหาที่ได้ผลนั้นไว้ด้วย เพราะการค้นหาหยุดทันทีที่ครบ
+    field เหล่านั้น ผลจึงใช้ตอบงานที่ต้องการ field อื่นไม่ได้ (ดู get)
+    เมื่อจำนวนรายการเกิน max_entries จะลบรายการที่ไม่ได้ใช้นานที่สุดออก
+    แต่ละ thread มี connection ของตัวเอง และใช้ WAL เพื่อให้อ่านและเขียน
+    พร้อมกันได้
+    """
+
+    def __init__(self, path, ttl=30 * DAY, negative_ttl=3 * DAY, max_entries=100000, evict_every=100):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._schema_ready = False
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._lock:
+                if not self._schema_ready:
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS contacts ('
+                        ' key TEXT PRIMARY KEY,'
+                        ' email TEXT, phone TEXT, website TEXT, source TEXT,'
+                        ' created_at REAL NOT NULL,'
+                        ' expires_at REAL NOT NULL,'
+                        ' accessed_at REAL NOT NULL,'
+                        ' required TEXT)'
+                    )
+                    columns = {row[1] for row in conn.execute('PRAGMA table_info(contacts)')}
+                    if 'required' not in columns:
+                        # cache จากรุ่นก่อนหน้า: การค้นหาเดิมหยุดเมื่อพบข้อมูลอย่างใดอย่างหนึ่ง (ค่าว่าง)
+                        conn.execute('ALTER TABLE contacts ADD COLUMN required TEXT')
+                    conn.execute('CREATE INDEX IF NOT EXISTS contacts_accessed ON contacts (accessed_at)')
+                    self._schema_ready = True
+        return conn
+
+    def get(self, company_name, required_fields=()):
+        """คืนค่า (email, phone, website, source) ที่ยังไม่หมดอายุ หรือ None
+
+        รายการที่ไม่ครบตาม required_fields ใช้ได้เฉพาะเมื่อการค้นหาครั้งนั้นพยายามหา
+        required_fields ทุก field แล้ว (ไม่เช่นนั้นถือว่าไม่มีใน cache และค้นหาใหม่)
+        """
+        key = canonicalize_company_name(company_name)
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                'SELECT email, phone, website, source, required FROM contacts WHERE key = ? AND expires_at > ?',
+                (key, now),
+            ).fetchone()
+            if row is None:
+                return None
+            *row, required = row
+            searched = set(filter(None, (required or '').split(',')))
+            if not (set(required_fields) <= searched or meets_completeness(row[:len(FIELDS)], required_fields)):
+                return None
+            conn.execute('UPDATE contacts SET accessed_at = ? WHERE key = ?', (now, key))
+            return tuple(row)
+        except sqlite3.Error as e:
+            logger.error(f"Contact cache read error: {e}")
+            return None
+
+    def set(self, company_name, email, phone, website, source, required_fields=()):
+        """บันทึกผลการค้นหา (รวมถึงผลที่ไม่พบข้อมูล) พร้อม required_fields ของการค้นหานั้น"""
+        key = canonicalize_company_name(company_name)
+        now = time.time()
+        ttl = self.ttl if any([email, phone, website]) else self.negative_ttl
+        try:
+            conn = self._connect()
+            conn.execute(
+                'INSERT OR REPLACE INTO contacts'
+                ' (key, email, phone, website, source, created_at, expires_at, accessed_at, required)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, email, phone, website, source, now, now + ttl, now, ','.join(required_fields)),
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Contact cache write error: {e}")
+            return
+
+        with self._lock:
+            self._writes += 1
+            should_evict = self._writes % self.evict_every == 0
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        """ลบรายการที่หมดอายุ และรายการที่ใช้น้อยที่สุดเมื่อเกิน max_entries"""
+        try:
+            conn = self._connect()
+            conn.execute('DELETE FROM contacts WHERE expires_at <= ?', (time.time(),))
+            (count,) = conn.execute('SELECT COUNT(*) FROM contacts').fetchone()
+            if count > self.max_entries:
+                conn.execute(
+                    'DELETE FROM contacts WHERE key IN'
+                    ' (SELECT key FROM contacts ORDER BY accessed_at LIMIT ?)',
+                    (count - self.max_entries,),
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Contact cache eviction error: {e}")
+
+    def __len__(self):
+        (count,) = self._connect().execute('SELECT COUNT(*) FROM contacts').fetchone()
+        return count
@@ -0,0 +1,210 @@
+"""ดึงอีเมล เบอร์โทร และเว็บไซต์จาก HTML ด้วย regex ที่ compile ไว้ล่วงหน้า
+
+ทุก pattern ขึ้นต้นด้วยตัวอักษรเฉพาะ (เช่น '@', 'http', '.com') ทำให้ re
+ข้ามส่วนที่ไม่เกี่ยวข้องได้เร็ว และจำกัดความยาวไว้ จึงไม่เกิด backtracking
+แบบกำลังสองบน page_source ขนาดหลาย MB ผลลัพธ์ยังเลือกตามลำดับ pattern
+และตัวกรองเหมือนเดิม โดยหยุดทันทีเมื่อได้ผลจาก pattern ลำดับแรก
+
+extract_contact_info_html ตัด script/style/noscript/svg ออกด้วย lxml ก่อน และอ่าน
+ลิงก์ mailto:/tel: จาก <a> โดยตรง ใช้กับหน้าเว็บจริง ส่วน extract_contact_info
+ใช้กับข้อความทั่วไป
+"""
+import re
+from urllib.parse import unquote
+
+import lxml.html
+from lxml import etree
+
+# อีเมลที่ไม่ใช่ของบริษัท (ตรวจแบบ substring เหมือนเดิม)
+EMAIL_SPAM_WORDS = frozenset({'noreply', 'no-reply', 'donotreply', 'google', 'facebook'})
+
+# เว็บไซต์ที่ไม่เกี่ยวข้องกับบริษัท
+WEBSITE_EXCLUDE_WORDS = frozenset({'google', 'facebook', 'twitter', 'youtube', 'instagram', 'linkedin'})
+
+# local part ยาวได้ไม่เกิน 64 ตัว และ domain ไม่เกิน 253 ตัว ตาม RFC 5321
+EMAIL_RE = re.compile(
+    r'\b[A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9.-]{1,253}\.[A-Z|a-z]{2,}\b',
+    re.IGNORECASE,
+)
+_EMAIL_WINDOW = 64 + 1 + 253 + 64
+
+# เบอร์โทรไทย เรียงตามลำดับความสำคัญ ยอมให้มีช่องว่างหรือขีดคั่นระหว่างตัวเลข
+# แทนการลบช่องว่างและขีดออกจากทั้งหน้าก่อนค้นหา
+_DIGIT = r'[ -]*[0-9]'
+PHONE_PATTERNS = [
+    re.compile(rf'0[ -]*[2-9](?:{_DIGIT}){{7,8}}'),        # เบอร์ไทย 02-xxx-xxxx, 08x-xxx-xxxx
+    re.compile(rf'\+[ -]*6[ -]*6(?:{_DIGIT}){{8,9}}'),    # +66 format
+    re.compile(rf'6[ -]*6(?:{_DIGIT}){{8,9}}'),            # 66 format
+    re.compile(rf'0(?:{_DIGIT}){{8,9}}'),                  # 0x-xxx-xxxx ที่ขึ้นต้นด้วย 00/01
+]
+_PHONE_SEPARATOR_RE = re.compile(r'[ -]')
+
+# เว็บไซต์ เรียงตามลำดับความสำคัญ: URL เต็ม, www. และชื่อโดเมนที่มี TLD ที่รู้จัก
+_URL_RE = re.compile(r'https?://[^\s<>"]+', re.IGNORECASE)
+_WWW_RE = re.compile(r'www\.[^\s<>"]+', re.IGNORECASE)
+_TLD_RE = re.compile(r'\.(?:com|co\.th|net|org|th)', re.IGNORECASE)
+_DOMAIN_RE = re.compile(r'[a-zA-Z0-9.-]{1,253}\.(?:com|co\.th|net|org|th)(?:/[^\s<>"]*)?', re.IGNORECASE)
+_DOMAIN_START_RE = re.compile(r'(?<![a-zA-Z0-9.-])[a-zA-Z0-9.-]+\Z')
+_DOMAIN_CHARS_RE = re.compile(r'[a-zA-Z0-9.-]+')
+
+_EMAIL_SPAM_RE = re.compile('|'.join(map(re.escape, sorted(EMAIL_SPAM_WORDS))))
+_WEBSITE_EXCLUDE_RE = re.compile('|'.join(map(re.escape, sorted(WEBSITE_EXCLUDE_WORDS))))
+
+
+def extract_email(text_content):
+    """อีเมลแรกที่ไม่ใช่ spam"""
+    pos = 0
+    while True:
+        at = text_content.find('@', pos)
+        if at == -1:
+            return None
+
+        # ค้นเฉพาะช่วงรอบ '@' ถ้า match ชนขอบช่วงพอดีค่อยค้นใหม่แบบไม่จำกัด
+        window_end = min(len(text_content), at + _EMAIL_WINDOW)
+        start = max(pos, at - 64)
+        match = EMAIL_RE.search(text_content, start, window_end)
+        if match is not None and match.end() == window_end < len(text_content):
+            match = EMAIL_RE.search(text_content, start)
+
+        if match is None:
+            pos = at + 1
+            continue
+
+        email = match.group()
+        if not _EMAIL_SPAM_RE.search(email.lower()):
+            return email
+        pos = match.end()
+
+
+def extract_phone(text_content):
+    """เบอร์โทรแรกของ pattern ที่สำคัญที่สุดที่พบ (ไม่มีช่องว่างและขีด)
+
+    ทุก pattern ขึ้นต้นด้วยตัวอักษรตายตัว re จึงข้ามไปยังตำแหน่งที่เป็นไปได้
+    ได้ทันที และหน้าที่มีเบอร์แบบแรกจะจบตั้งแต่การค้นหาครั้งแรก
+    """
+    for pattern in PHONE_PATTERNS:
+        match = pattern.search(text_content)
+        if match:
+            return _PHONE_SEPARATOR_RE.sub('', match.group())
+    return None
+
+
+def _iter_urls(text_content):
+    for match in _URL_RE.finditer(text_content):
+        yield match.group()
+
+
+def _iter_www_sites(text_content):
+    for match in _WWW_RE.finditer(text_content):
+        site = match.group()
+        # www. ต้องตามด้วยชื่อที่มีจุดคั่นอย่างน้อยหนึ่งจุด เช่น www.example.com
+        if '.' in site[5:-1]:
+            yield site
+
+
+def _iter_domains(text_content):
+    """ชื่อโดเมนที่ลงท้ายด้วย TLD ที่รู้จัก
+
+    หา TLD ก่อน (ขึ้นต้นด้วย '.' จึงค้นได้เร็ว) แล้วย้อนกลับไปหาต้นชื่อโดเมน
+    ไม่เกิน 253 ตัว แทนการลอง match ใหม่ทุกตำแหน่งในสตริงยาวๆ
+    """
+    end = 0
+    for tld in _TLD_RE.finditer(text_content):
+        tld_start = tld.start()
+        window_start = max(end, tld_start - 253)
+        if tld_start <= window_start:
+            continue
+
+        domain_start = _DOMAIN_START_RE.search(text_content, window_start, tld_start)
+        if domain_start is not None:
+            match = _DOMAIN_RE.match(text_content, domain_start.start())
+        elif window_start == end and _DOMAIN_CHARS_RE.fullmatch(text_content, window_start, tld_start):
+            # ชื่อโดเมนต่อเนื่องมาจาก match ก่อนหน้า: เริ่มต่อจากจุดนั้นเหมือน findall
+            match = _DOMAIN_RE.match(text_content, window_start)
+        else:
+            continue
+
+        end = match.end()
+        yield match.group()
+
+
+def extract_website(text_content):
+    """เว็บไซต์แรกของ pattern ที่สำคัญที่สุดที่ไม่อยู่ในรายการยกเว้น"""
+    for iter_sites in (_iter_urls, _iter_www_sites, _iter_domains):
+        for site in iter_sites(text_content):
+            site = site.rstrip('.,)')
+            if _WEBSITE_EXCLUDE_RE.search(site.lower()):
+                continue
+            if not site.startswith('http'):
+                site = 'https://' + site
+            return site
+    return None
+
+
+def extract_contact_info(text_content):
+    """ดึงข้อมูลติดต่อจาก text คืนค่า (email, phone, website)"""
+    return extract_email(text_content), extract_phone(text_content), extract_website(text_content)
+
+
+# element ที่ไม่ใช่เนื้อหาของหน้า ตัดทิ้งทั้ง element (ไม่รวมข้อความที่ตามหลัง)
+BOILERPLATE_TAGS = ('script', 'style', 'noscript', 'svg', 'template')
+
+# attribute ที่ไม่มีข้อมูลติดต่อ แต่ยาว (รูป base64, CSS) ตัดทิ้งก่อนค้นด้วย regex
+BOILERPLATE_ATTRIBUTES = ('src', 'srcset', 'style', 'class', 'id')
+
+_HTML_PARSER = lxml.html.HTMLParser(encoding='utf-8', remove_comments=True, remove_pis=True)
+
+
+def parse_html(html):
+    """parse HTML ด้วย lxml แล้วตัด BOILERPLATE_TAGS และ BOILERPLATE_ATTRIBUTES ออก
+    คืน None ถ้า parse ไม่ได้
+    """
+    if not html:
+        return None
+    data = html.encode('utf-8', errors='replace') if isinstance(html, str) else html
+    try:
+        doc = lxml.html.document_fromstring(data, parser=_HTML_PARSER)
+    except (etree.ParserError, ValueError):
+        return None
+    etree.strip_elements(doc, *BOILERPLATE_TAGS, with_tail=False)
+    etree.strip_attributes(doc, *BOILERPLATE_ATTRIBUTES)
+    return doc
+
+
+def anchor_contacts(doc):
+    """(email, phone) จากลิงก์ mailto: และ tel: ตัวแรกที่ใช้ได้"""
+    email = None
+    phone = None
+    for href in doc.xpath('//a/@href[starts-with(normalize-space(.), "mailto:") or '
+                          'starts-with(normalize-space(.), "tel:")]'):
+        scheme, _, value = href.strip().partition(':')
+        value = unquote(value.split('?', 1)[0]).strip()
+        if email is None and scheme == 'mailto':
+            match = EMAIL_RE.search(value)
+            if match and not _EMAIL_SPAM_RE.search(match.group().lower()):
+                email = match.group()
+        elif phone is None and scheme == 'tel':
+            phone = extract_phone(value)
+        if email and phone:
+            break
+    return email, phone
+
+
+def extract_contact_info_html(html):
+    """ดึงข้อมูลติดต่อจากหน้า HTML คืนค่า (email, phone, website)
+
+    ใช้อีเมลและเบอร์จาก mailto:/tel: ก่อน แล้วค้นส่วนที่ยังขาดด้วย regex บน HTML
+    ที่ตัด script และ style ออกแล้ว ถ้า parse ไม่ได้จะใช้ extract_contact_info กับ
+    ข้อความเดิม
+    """
+    doc = parse_html(html)
+    if doc is None:
+        return extract_contact_info(html or '')
+
+    email, phone = anchor_contacts(doc)
+    text_content = lxml.html.tostring(doc, encoding='unicode')
+    return (
+        email or extract_email(text_content),
+        phone or extract_phone(text_content),
+        extract_website(text_content),
+    )
@@ -0,0 +1,158 @@
+"""เปิดหน้า ติดต่อเรา/เกี่ยวกับเรา ของเว็บไซต์บริษัทพร้อมกัน เพื่อเติมอีเมลและเบอร์โทรที่ยังขาด"""
+import asyncio
+import logging
+from collections import OrderedDict
+from urllib.parse import quote, urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+import contact_extractor
+from field_plan import meets_completeness
+from rate_limit import host_key
+
+logger = logging.getLogger(__name__)
+
+# path ที่มักเป็นหน้าติดต่อ เรียงตามโอกาสที่จะมีข้อมูล
+CONTACT_PATHS = (
+    '/contact', '/contact-us', '/contactus', '/th/contact', '/en/contact',
+    '/' + quote('ติดต่อเรา'), '/about', '/about-us',
+)
+
+# คำในลิงก์ (href หรือข้อความ) ที่บอกว่าเป็นหน้าติดต่อ และคะแนนความน่าจะเป็น
+LINK_KEYWORDS = (
+    ('contact', 3), ('ติดต่อ', 3), ('about', 1), ('เกี่ยวกับ', 1), ('company', 1),
+)
+
+
+def site_root(website):
+    """https://host/ ของเว็บไซต์ (เติม https:// ถ้าไม่มี scheme)"""
+    if '://' not in website:
+        website = 'https://' + website
+    parts = urlsplit(website)
+    return f'{parts.scheme}://{parts.netloc}/'
+
+
+def _link_score(href, text):
+    target = f'{href} {text}'.lower()
+    return sum(score for keyword, score in LINK_KEYWORDS if keyword in target)
+
+
+def contact_links(html, base_url):
+    """ลิงก์ในหน้าเดียวกันโดเมนที่น่าจะเป็นหน้าติดต่อ เรียงตามคะแนนมากไปน้อย"""
+    doc = contact_extractor.parse_html(html)
+    if doc is None:
+        return []
+    host = host_key(base_url)
+    scored = {}
+    for anchor in doc.iterfind('.//a[@href]'):
+        url = urljoin(base_url, anchor.get('href').strip()).split('#', 1)[0]
+        if not url.startswith(('http://', 'https://')) or host_key(url) != host:
+            continue
+        score = _link_score(url, anchor.text_content())
+        if score > scored.get(url, 0):
+            scored[url] = score
+    return sorted(scored, key=lambda url: -scored[url])
+
+
+def read_page(html, url, follow_links):
+    """(email, phone, ลิงก์หน้าติดต่อ) ของหน้าหนึ่ง (ลิงก์เป็น [] ถ้า follow_links เป็นเท็จ)"""
+    email, phone, _ = contact_extractor.extract_contact_info_html(html)
+    return email, phone, contact_links(html, url) if follow_links else []
+
+
+class ContactCrawler:
+    """crawler ขนาดเล็กสำหรับแถวเดียว: เปิดหน้าแรก + path ที่เดาไว้พร้อมกัน แล้วตาม
+    ลิงก์หน้าติดต่อที่เจอต่ออีก max_depth ชั้น ไม่เกิน max_pages หน้า และจบภายใน
+    deadline วินาที
+
+    fetch คือ coroutine (url, timeout) -> HTML หรือ None (ใช้ fetch ของ
+    AsyncSearchEngine เพื่อใช้ connection, rate limit และ size cap ร่วมกัน)
+    robots.txt ของแต่ละโดเมนถูกจำไว้ ถ้าดึงไม่ได้ถือว่าอนุญาต
+    """
+
+    def __init__(self, fetch, max_pages=6, max_depth=1, deadline=8.0, concurrency=4,
+                 user_agent='*', robots_cache_size=1024):
+        self.fetch = fetch
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.deadline = deadline
+        self.concurrency = concurrency
+        self.user_agent = user_agent
+        self.robots_cache_size = robots_cache_size
+        self._robots = OrderedDict()
+
+    async def _robots_for(self, root):
+        robots = self._robots.get(root)
+        if robots is None:
+            robots = RobotFileParser()
+            text = await self.fetch(urljoin(root, '/robots.txt'), timeout=5)
+            robots.parse((text or '').splitlines())
+            self._robots[root] = robots
+            if len(self._robots) > self.robots_cache_size:
+                self._robots.popitem(last=False)
+        else:
+            self._robots.move_to_end(root)
+        return robots
+
+    async def crawl(self, website, required_fields=('email', 'phone')):
+        """คืน (email, phone) ที่รวมจากหน้าติดต่อ (field ที่ไม่พบเป็น None)
+
+        ถ้าถึง deadline ก่อนจะคืนเท่าที่พบแล้ว
+        """
+        found = {'email': None, 'phone': None}
+        try:
+            await asyncio.wait_for(self._crawl(website, required_fields, found), self.deadline)
+        except asyncio.TimeoutError:
+            logger.info(f"Contact crawl deadline reached for {website}")
+        return found['email'], found['phone']
+
+    async def _crawl(self, website, required_fields, found):
+        loop = asyncio.get_running_loop()
+        root = site_root(website)
+        robots = await self._robots_for(root)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        seen = set()
+        budget = [self.max_pages]
+
+        async def visit(url):
+            async with semaphore:
+                return url, await self.fetch(url, timeout=10)
+
+        def take(urls):
+            picked = []
+            for url in urls:
+                if budget[0] <= 0:
+                    break
+                if url in seen or not robots.can_fetch(self.user_agent, url):
+                    continue
+                seen.add(url)
+                budget[0] -= 1
+                picked.append(url)
+            return picked
+
+        start_url = website if '://' in website else 'https://' + website
+        if start_url.rstrip('/') + '/' == root:
+            start_url = root
+        level = take([start_url, root, *(urljoin(root, path) for path in CONTACT_PATHS)])
+
+        for depth in range(self.max_depth + 1):
+            next_links = []
+            tasks = [asyncio.ensure_future(visit(url)) for url in level]
+            try:
+                for visit_done in asyncio.as_completed(tasks):
+                    url, html = await visit_done
+                    if not html:
+                        continue
+                    # parse HTML ใน executor เพื่อไม่ให้ fetch ที่รออยู่บน loop เดียวกันสะดุด
+                    email, phone, links = await loop.run_in_executor(
+                        None, read_page, html, url, depth < self.max_depth)
+                    found['email'] = found['email'] or email
+                    found['phone'] = found['phone'] or phone
+                    if meets_completeness((found['email'], found['phone'], website), required_fields):
+                        return
+                    next_links.extend(links)
+            finally:
+                for task in tasks:
+                    task.cancel()
+            level = take(next_links)
+            if not level:
+                return
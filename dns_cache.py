@@ -0,0 +1,131 @@
+"""ตรวจว่าโดเมนที่เดาไว้มีอยู่จริงด้วย DNS ก่อนยิง HTTP พร้อม negative cache ใน SQLite"""
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+# error ที่แปลว่าไม่มีชื่อนี้จริง (ไม่ใช่ DNS ล่มชั่วคราว) จึงจำไว้ได้
+_NEGATIVE_ERRORS = {socket.EAI_NONAME, getattr(socket, 'EAI_NODATA', socket.EAI_NONAME)}
+
+
+class NegativeDNSCache:
+    """ชื่อโดเมนที่ resolve ไม่ได้ เก็บไว้จนหมดอายุ ttl วินาที"""
+
+    def __init__(self, path, ttl=24 * 60 * 60):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._lock:
+                if not self._schema_ready:
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS missing_hosts ('
+                        ' host TEXT PRIMARY KEY, expires_at REAL NOT NULL)'
+                    )
+                    self._schema_ready = True
+        return conn
+
+    def missing(self, hosts):
+        """ชื่อใน hosts ที่ยังจำไว้ว่าไม่มีอยู่จริง"""
+        hosts = list(hosts)
+        if not hosts:
+            return set()
+        try:
+            rows = self._connect().execute(
+                f'SELECT host FROM missing_hosts WHERE expires_at > ? AND host IN ({",".join("?" * len(hosts))})',
+                (time.time(), *hosts),
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"DNS cache read error: {e}")
+            return set()
+        return {host for (host,) in rows}
+
+    def add(self, host):
+        try:
+            self._connect().execute(
+                'INSERT OR REPLACE INTO missing_hosts (host, expires_at) VALUES (?, ?)',
+                (host, time.time() + self.ttl),
+            )
+        except sqlite3.Error as e:
+            logger.error(f"DNS cache write error: {e}")
+
+
+class DomainResolver:
+    """resolve หลายชื่อพร้อมกัน คืน {host: True/False}
+
+    ชื่อที่ไม่มีอยู่จริงถูกจำใน negative_cache (ถ้ามี) ส่วนชื่อที่ resolve ไม่ทัน
+    timeout หรือ DNS ล่มชั่วคราว ถือว่าใช้ไม่ได้ในรอบนี้แต่ไม่จำไว้
+    """
+
+    def __init__(self, negative_cache=None, timeout=2.0, max_workers=16, resolve=None):
+        self.negative_cache = negative_cache
+        self.timeout = timeout
+        self._resolve_host = resolve or self._getaddrinfo
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dns')
+
+    @staticmethod
+    def _getaddrinfo(host):
+        socket.getaddrinfo(host, 443, type=socket.SOCK_STREAM)
+
+    def _check(self, host):
+        try:
+            self._resolve_host(host)
+            return True
+        except socket.gaierror as e:
+            if e.errno in _NEGATIVE_ERRORS and self.negative_cache is not None:
+                self.negative_cache.add(host)
+            logger.debug(f"DNS lookup failed for {host}: {e}")
+        except (OSError, UnicodeError) as e:
+            logger.debug(f"DNS lookup failed for {host}: {e}")
+        return False
+
+    def _known_missing(self, hosts):
+        if self.negative_cache is None:
+            return set()
+        return self.negative_cache.missing(hosts)
+
+    def resolve_many(self, hosts):
+        """resolve ทุกชื่อพร้อมกัน รอไม่เกิน timeout วินาทีรวม"""
+        hosts = list(dict.fromkeys(hosts))
+        missing = self._known_missing(hosts)
+        futures = {host: self._executor.submit(self._check, host) for host in hosts if host not in missing}
+        wait(futures.values(), timeout=self.timeout)
+        return {host: host in futures and futures[host].done() and futures[host].result() for host in hosts}
+
+    async def resolve_many_async(self, hosts):
+        """เหมือน resolve_many แต่ใช้ใน coroutine"""
+        hosts = list(dict.fromkeys(hosts))
+        loop = asyncio.get_running_loop()
+        missing = await loop.run_in_executor(self._executor, self._known_missing, hosts)
+        checks = {host: loop.run_in_executor(self._executor, self._check, host)
+                  for host in hosts if host not in missing}
+        if checks:
+            await asyncio.wait(checks.values(), timeout=self.timeout)
+        results = {}
+        for host in hosts:
+            check = checks.get(host)
+            results[host] = check is not None and check.done() and check.result()
+            if check is not None and not check.done():
+                check.cancel()
+        return results
+
+    def close(self):
+        self._executor.shutdown(wait=False)
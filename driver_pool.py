@@ -0,0 +1,213 @@
+"""Pool ของ headless Chrome ที่เปิดค้างไว้และใช้ซ้ำข้ามบริษัทและข้ามงาน"""
+import logging
+import os
+import queue
+import shutil
+import threading
+from contextlib import contextmanager
+
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+
+
+# ชื่อโปรแกรมใน PATH และตำแหน่งติดตั้งปกติของ Chrome/Chromium
+CHROME_BINARIES = ('google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome')
+CHROME_INSTALL_PATHS = (
+    '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome',
+    r'C:\Program Files\Google\Chrome\Application\chrome.exe',
+    r'C:\Program Files (x86)\Google\Chrome\Application\chrome.exe',
+)
+
+
+def chrome_available():
+    """ตรวจแบบเร็วว่าเครื่องนี้มี Chrome/Chromium (ดูแค่ไฟล์โปรแกรม ไม่ import selenium และไม่เปิดเบราว์เซอร์)"""
+    return (any(shutil.which(name) for name in CHROME_BINARIES)
+            or any(os.path.exists(path) for path in CHROME_INSTALL_PATHS))
+
+
+def create_chrome_driver():
+    """เปิด headless Chrome พร้อมตั้งค่าลดการตรวจจับ automation"""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_options = Options()
+    chrome_options.add_argument('--headless')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    chrome_options.add_argument(f'--user-agent={USER_AGENT}')
+
+    driver = webdriver.Chrome(options=chrome_options)
+    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    return driver
+
+
+class PooledDriver:
+    """WebDriver ที่ยืมจาก pool นับจำนวนหน้าที่โหลดเพื่อใช้ตัดสินการ recycle"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+
+    def get(self, url):
+        self.pages += 1
+        return self.driver.get(url)
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+
+class DriverPool:
+    """เก็บ Chrome ที่อุ่นเครื่องไว้ล่วงหน้า ยืมได้ทีละ thread
+
+    ก่อนส่ง driver ให้ผู้ยืมจะตรวจว่ายังตอบสนองอยู่ (ถ้า crash จะเปิดใหม่ให้
+    อัตโนมัติ) และเมื่อคืนจะ recycle driver ที่โหลดเกิน max_pages หน้า หรือ
+    ใช้ JS heap เกิน max_memory_mb โดยเปิดตัวใหม่แทนใน background
+    """
+
+    def __init__(self, size=2, max_pages=100, max_memory_mb=512, driver_factory=create_chrome_driver):
+        self.size = size
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.driver_factory = driver_factory
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._count = 0
+        self._closed = False
+        self.restarts = 0
+
+    def start(self, wait=False):
+        """เปิด driver ให้ครบ size ล่วงหน้า (ค่าเริ่มต้นทำใน background)"""
+        threads = []
+        for _ in range(self.size):
+            if not self._reserve_slot():
+                break
+            thread = threading.Thread(target=self._launch_into_pool, daemon=True)
+            thread.start()
+            threads.append(thread)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    @contextmanager
+    def driver(self, timeout=60):
+        """ยืม driver จาก pool ใช้กับ with แล้วคืนอัตโนมัติ"""
+        pooled = self.acquire(timeout=timeout)
+        try:
+            yield pooled
+        finally:
+            self.release(pooled)
+
+    def acquire(self, timeout=60):
+        """ยืม driver ที่ยังใช้งานได้ ถ้าไม่มีว่างและ pool ยังไม่เต็มจะเปิดใหม่"""
+        with tracing.span('driver_acquire', 'selenium'):
+            return self._acquire(timeout)
+
+    def _acquire(self, timeout):
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                if self._reserve_slot():
+                    try:
+                        with tracing.span('chrome_start', 'selenium'):
+                            return PooledDriver(self.driver_factory())
+                    except Exception:
+                        self._release_slot()
+                        raise
+                pooled = self._idle.get(timeout=timeout)
+
+            if pooled is None:
+                # สัญญาณจาก background launch ที่ล้มเหลว: ลองจองช่องใหม่อีกครั้ง
+                continue
+            if self._is_alive(pooled):
+                return pooled
+
+            # driver ตายระหว่างรออยู่ใน pool: ปิดทิ้งแล้ววนไปยืมตัวใหม่
+            logger.warning("Pooled Chrome driver is not responding, restarting it")
+            self._discard(pooled)
+            self.restarts += 1
+            metrics.selenium_restarts.inc(reason='unresponsive')
+
+    def release(self, pooled):
+        """คืน driver เข้า pool หรือ recycle ถ้าใช้งานมากเกินไป"""
+        if self._closed:
+            self._discard(pooled)
+            return
+
+        reason = self._recycle_reason(pooled)
+        if reason is None:
+            self._idle.put(pooled)
+            return
+
+        logger.info(f"Recycling Chrome driver: {reason}")
+        self._discard(pooled)
+        self.restarts += 1
+        metrics.selenium_restarts.inc(reason='recycled')
+        if self._reserve_slot():
+            threading.Thread(target=self._launch_into_pool, daemon=True).start()
+
+    def close(self):
+        """ปิด driver ทุกตัวใน pool"""
+        self._closed = True
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(pooled)
+
+    def _recycle_reason(self, pooled):
+        if pooled.pages >= self.max_pages:
+            return f"loaded {pooled.pages} pages"
+        try:
+            heap_bytes = pooled.driver.execute_script(
+                "return window.performance.memory ? performance.memory.usedJSHeapSize : 0"
+            ) or 0
+        except Exception:
+            return "driver crashed"
+        if heap_bytes > self.max_memory_mb * 1024 * 1024:
+            return f"JS heap {heap_bytes // (1024 * 1024)} MB"
+        return None
+
+    def _is_alive(self, pooled):
+        try:
+            pooled.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def _reserve_slot(self):
+        with self._lock:
+            if self._closed or self._count >= self.size:
+                return False
+            self._count += 1
+            return True
+
+    def _release_slot(self):
+        with self._lock:
+            self._count -= 1
+
+    def _launch_into_pool(self):
+        try:
+            self._idle.put(PooledDriver(self.driver_factory()))
+        except Exception as e:
+            logger.error(f"Error launching pooled Chrome driver: {e}")
+            self._release_slot()
+            self._idle.put(None)
+
+    def _discard(self, pooled):
+        if pooled is None:
+            return
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
+        self._release_slot()
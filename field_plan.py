@@ -0,0 +1,91 @@
+"""รวมผลบางส่วนจากหลายแหล่งเป็นผลเดียวพร้อมที่มาของแต่ละ field และเลือกเฉพาะแหล่งที่
+อาจเติม field ที่ยังขาดของแถวนั้นได้
+"""
+
+FIELDS = ('email', 'phone', 'website')
+
+# แหล่งที่เดาโดเมนของบริษัทเอง เมื่อรู้เว็บไซต์แล้วการเปิดหน้าติดต่อของเว็บไซต์นั้นได้ผลกว่า
+WEBSITE_PROBES = frozenset({'Direct Website'})
+
+
+def meets_completeness(result, required_fields):
+    """ตรวจว่าผลลัพธ์ (email, phone, website) มีครบทุก field ที่ต้องการหรือไม่
+
+    ถ้า required_fields ว่าง จะถือว่าครบเมื่อพบข้อมูลอย่างใดอย่างหนึ่ง
+    """
+    values = dict(zip(FIELDS, result))
+    if not required_fields:
+        return any(values.values())
+    return all(values.get(field) for field in required_fields)
+
+
+class MergedResult:
+    """ผลของแถวหนึ่งที่รวมจากหลายแหล่ง: แต่ละ field เก็บค่าพร้อมแหล่งที่มา
+
+    ถ้าระบุ rank (ลำดับความสำคัญของแหล่ง น้อยกว่าดีกว่า) ค่าจากแหล่งที่ลำดับดีกว่าจะแทน
+    ค่าที่มาจากแหล่งลำดับรองได้ ไม่เช่นนั้นค่าแรกที่พบเป็นค่าที่ใช้
+
+    unavailable คือแหล่งที่ควรถามแต่ถามไม่ได้ (breaker พักอยู่ หรือ error) ผลที่ไม่ครบจึงอาจ
+    ไม่ใช่ผลจริงของบริษัทนั้น
+    """
+
+    def __init__(self):
+        self.values = dict.fromkeys(FIELDS)
+        self.sources = {}
+        self.unavailable = []
+        self._ranks = {}
+
+    def add(self, source, result, rank=None):
+        """เติม field จาก result (email, phone, website) คืนรายชื่อ field ที่ได้ค่าจากแหล่งนี้"""
+        filled = []
+        for field, value in zip(FIELDS, result):
+            if not value:
+                continue
+            current_rank = self._ranks.get(field)
+            if self.values[field] and (rank is None or current_rank is None or rank >= current_rank):
+                continue
+            self.values[field] = value
+            self.sources[field] = source
+            self._ranks[field] = rank
+            filled.append(field)
+        return filled
+
+    def as_tuple(self):
+        return tuple(self.values[field] for field in FIELDS)
+
+    def complete(self, required_fields):
+        return meets_completeness(self.as_tuple(), required_fields)
+
+    def missing(self, required_fields):
+        """field ที่ยังต้องหา (required_fields ว่าง = ต้องการอย่างน้อยหนึ่ง field)"""
+        if not required_fields:
+            return [] if any(self.values.values()) else list(FIELDS)
+        return [field for field in required_fields if not self.values.get(field)]
+
+    def source_label(self, empty='ไม่พบข้อมูล'):
+        """ชื่อแหล่งสำหรับคอลัมน์ Source: แหล่งเดียวเป็นชื่อแหล่ง หลายแหล่งระบุ field ของแต่ละแหล่ง
+        เช่น "Bing (email) + DuckDuckGo (phone, website)"
+        """
+        by_source = {}
+        for field in FIELDS:
+            if field in self.sources:
+                by_source.setdefault(self.sources[field], []).append(field)
+        if not by_source:
+            return empty
+        if len(by_source) == 1:
+            return next(iter(by_source))
+        return ' + '.join(f"{source} ({', '.join(fields)})" for source, fields in by_source.items())
+
+
+def wanted_source(source, merged, required_fields, source_stats=None, crawl_known_website=True):
+    """ควรเรียก (หรือรอ) แหล่ง source สำหรับแถวนี้ต่อหรือไม่
+
+    ไม่เรียกเมื่อไม่มี field ที่ยังขาด, เมื่อแหล่งเดาโดเมนแต่รู้เว็บไซต์แล้ว (ถ้าจะเปิดหน้าติดต่อ
+    ของเว็บไซต์นั้นต่อ) หรือเมื่อสถิติบอกว่าแหล่งนี้แทบไม่เคยให้ field ที่ยังขาด
+    """
+    missing = merged.missing(required_fields)
+    if not missing:
+        return False
+    if crawl_known_website and source in WEBSITE_PROBES and merged.values['website']:
+        return False
+    return source_stats is None or source_stats.covers(source, missing)
@@ -0,0 +1,67 @@
+"""requests.Session ของ worker หนึ่งตัว: connection pool ต่อ host ที่ใหญ่พอให้ keep-alive
+ไปยังเครื่องมือค้นหาอยู่รอดข้ามบริษัท และนับว่าแต่ละ request ใช้ connection ใหม่หรือใช้ซ้ำ
+
+session ของ requests ไม่ปลอดภัยเมื่อใช้ร่วมกันหลาย thread จึงสร้างหนึ่ง session ต่อ searcher
+(searcher หนึ่งตัวต่อ worker thread) โมดูลนี้ import requests จึงถูกโหลดเมื่อใช้ session ครั้งแรกเท่านั้น
+"""
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ProtocolError
+
+import metrics
+
+
+class _CountingPoolMixin:
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        # connection ที่ยังมี socket คือ keep-alive ที่ใช้ซ้ำได้ ส่วนที่ไม่มี (ใหม่ หรือหลุดไปแล้ว)
+        # ต้อง connect และ TLS handshake ใหม่
+        metrics.http_connections.inc(client='requests', kind='reused' if conn.sock is not None else 'new')
+        return conn
+
+
+class CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter ที่นับการใช้ connection ซ้ำ (ไม่ลองใหม่เอง ผู้เรียกลองใหม่ตาม RetryPolicy)"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool,
+        }
+
+
+def create_session(pool_hosts=64, pool_per_host=2):
+    """session ที่เก็บ connection ของ host ล่าสุดไว้ไม่เกิน pool_hosts host host ละ pool_per_host connection
+
+    แต่ละแถวเรียกหลาย host (โดเมนที่เดา ไดเรกทอรี เครื่องมือค้นหา) ถ้า pool_hosts น้อยกว่านั้น
+    pool ของเครื่องมือค้นหาจะถูกไล่ออกทุกแถว และต้อง TLS handshake ใหม่ทุกครั้ง
+    """
+    session = requests.Session()
+    adapter = PooledAdapter(pool_connections=pool_hosts, pool_maxsize=pool_per_host, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def retryable_error(exc):
+    """error ที่ลองใหม่ได้: connection หลุดกลางทาง หรือ body ขาดกลางคัน
+
+    connect ไม่ติดหรือ resolve ไม่ได้ (เช่นโดเมนที่เดาซึ่งไม่มีอยู่จริง) และ timeout ไม่ลองใหม่
+    เพราะลองซ้ำก็ได้ผลเดิมและกินเวลาของแถวนั้นเพิ่มอีกเท่าตัว
+    """
+    if isinstance(exc, requests.exceptions.ChunkedEncodingError):
+        return True
+    if isinstance(exc, requests.ConnectionError) and not isinstance(exc, requests.Timeout):
+        reason = exc.args[0] if exc.args else None
+        return isinstance(getattr(reason, 'reason', reason), ProtocolError)
+    return False
@@ -14,6 +14,7 @@ def install_requirements():
         "requests==2.31.0",
         "beautifulsoup4==4.12.2",
         "lxml==4.9.3",
+        "aiohttp==3.9.1",
         "selenium==4.15.0",
         "webdriver-manager==4.0.1"
     ]
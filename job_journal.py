@@ -0,0 +1,163 @@
+"""บันทึกผลทีละแถวลงไฟล์ JSONL เพื่อให้งานที่ค้างอยู่ทำต่อได้หลังโปรเซสล่ม"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# journal ที่เปิดอยู่ในโปรเซสนี้ กันไม่ให้สองงานเขียน journal เดียวกันพร้อมกัน
+_open_paths = set()
+_open_lock = threading.Lock()
+
+
+class JournalBusy(Exception):
+    """มีงานอื่นที่ใช้รหัสงานเดียวกันกำลังเขียน journal นี้อยู่"""
+
+
+def file_job_id(filepath, chunk_size=1024 * 1024):
+    """hash (SHA-256) ของเนื้อหาไฟล์ ใช้ตรวจว่าไฟล์ต้นฉบับยังเหมือนเดิมเมื่อทำงานต่อ
+    และเป็นรหัสงานเมื่อไม่ได้ระบุ job_id
+    """
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+class JobJournal:
+    """journal ของงานหนึ่งงาน: บรรทัดแรกเป็น header ของงาน บรรทัดถัดไปเป็นผลทีละแถว
+    ตามลำดับแถวในไฟล์ต้นฉบับ
+
+    ทุกแถว flush ลงไฟล์ทันที ถ้าโปรเซสล่มระหว่างเขียน บรรทัดสุดท้ายที่ไม่สมบูรณ์
+    จะถูกตัดทิ้งตอนเปิด journal ใหม่ แล้วทำต่อจากแถวถัดจากแถวที่สมบูรณ์
+    """
+
+    def __init__(self, path, job_id, filepath, file_hash):
+        self.path = path
+        self.job_id = job_id
+        self.filepath = filepath
+        self.file_hash = file_hash
+        self.completed_rows = 0
+        self._file = None
+
+    @classmethod
+    def open(cls, folder, filepath, job_id=None):
+        """เปิด journal ของงาน job_id (สร้างใหม่ถ้ายังไม่มี) พร้อมนับแถวที่เสร็จแล้ว
+
+        journal แยกตามรหัสงาน (ค่าเริ่มต้นคือ hash ของไฟล์) ไฟล์เนื้อหาเดียวกันที่อัปโหลด
+        ซ้ำระหว่างงานแรกยังทำอยู่จึงได้ journal ของตัวเอง ถ้า journal เดิมของรหัสนี้
+        เป็นของไฟล์ที่เนื้อหาต่างไปแล้ว จะเริ่มใหม่แทนการทำต่อ
+        """
+        os.makedirs(folder, exist_ok=True)
+        file_hash = file_job_id(filepath)
+        job_id = job_id or file_hash
+        journal = cls(os.path.join(folder, f'{job_id}.jsonl'), job_id, filepath, file_hash)
+        with _open_lock:
+            if journal.path in _open_paths:
+                raise JournalBusy('ไฟล์นี้กำลังประมวลผลอยู่ในงานอื่น')
+            _open_paths.add(journal.path)
+        try:
+            journal._recover()
+        except Exception:
+            journal.close()
+            raise
+        return journal
+
+    def _recover(self):
+        if not os.path.exists(self.path):
+            self._file = open(self.path, 'w', encoding='utf-8')
+            self._write_header()
+            return
+
+        good_end = 0
+        lines = 0
+        stale = False
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if lines == 0 and not self._same_file(line):
+                    stale = True
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    json.loads(line)
+                except ValueError:
+                    break
+                good_end += len(line)
+                lines += 1
+
+        if stale:
+            logger.warning(f"Discarding journal {self.path}: it was written for a different file")
+        elif good_end < os.path.getsize(self.path):
+            logger.warning(f"Truncating incomplete journal line in {self.path}")
+        if good_end < os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(good_end)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if lines == 0:
+            self._write_header()
+        self.completed_rows = max(lines - 1, 0)
+
+    def _same_file(self, header_line):
+        """header นี้เป็นของไฟล์ต้นฉบับเดียวกันหรือไม่ (header ที่อ่านไม่ได้ถือว่าใช่ แล้วให้ตัดทิ้งตามปกติ)"""
+        try:
+            header = json.loads(header_line)
+            return header.get('file_hash', header['job_id']) == self.file_hash
+        except (ValueError, KeyError, AttributeError):
+            return True
+
+    def _write_header(self):
+        self._write_line({'job_id': self.job_id, 'filepath': self.filepath, 'file_hash': self.file_hash})
+
+    def _write_line(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def append(self, row):
+        """บันทึกผลของแถวถัดไป"""
+        self._write_line(row)
+        self.completed_rows += 1
+
+    def iter_rows(self):
+        """ผลทุกแถวที่บันทึกไว้ ตามลำดับแถวเดิม"""
+        self._file.flush()
+        with open(self.path, encoding='utf-8') as f:
+            next(f, None)
+            for line in f:
+                yield json.loads(line)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        with _open_lock:
+            _open_paths.discard(self.path)
+
+    def remove(self):
+        """ลบ journal หลังสร้างไฟล์ผลลัพธ์สำเร็จแล้ว"""
+        self.close()
+        os.remove(self.path)
+
+
+def unfinished_jobs(folder):
+    """(job_id, filepath) ของ journal ที่ยังค้างอยู่และไฟล์ต้นฉบับยังเหมือนเดิม
+
+    job_id คือรหัสงานที่บันทึกใน header (journal รุ่นเก่าที่ไม่มี file_hash ใช้ hash เป็นรหัสงาน)
+    """
+    jobs = []
+    for path in sorted(glob.glob(os.path.join(folder, '*.jsonl')), key=os.path.getmtime):
+        try:
+            with open(path, encoding='utf-8') as f:
+                header = json.loads(f.readline())
+            filepath = header['filepath']
+            if os.path.exists(filepath) and file_job_id(filepath) == header.get('file_hash', header['job_id']):
+                jobs.append((header['job_id'], filepath))
+            else:
+                logger.warning(f"Skipping journal {path}: source file is missing or changed")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Skipping unreadable journal {path}: {e}")
+    return jobs
@@ -0,0 +1,178 @@
+"""จัดการงานค้นหาหลายงานพร้อมกัน: แต่ละงานมีรหัส สถานะ และความคืบหน้าของตัวเอง"""
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """คิวงานเต็ม ต้องรอให้งานอื่นเสร็จก่อน"""
+
+
+def new_progress_data(job_id=''):
+    return {
+        'job_id': job_id,
+        'status': 'queued',
+        'current': 0,
+        'total': 0,
+        'current_company': '',
+        'found_data': False,
+        'found': {'emails': 0, 'phones': 0, 'websites': 0},
+        'breakers': [],
+        'completed': False,
+        'results': None,
+        'message': 'รอคิว...'
+    }
+
+
+class ProgressFeed:
+    """ลำดับเหตุการณ์ของงาน (เช่นผลของแต่ละแถว) สำหรับส่งต่อแบบ Server-Sent Events
+
+    เก็บเหตุการณ์ล่าสุดไว้ไม่เกิน maxlen รายการ ผู้ชมที่ตามไม่ทันจะข้ามไปยัง
+    เหตุการณ์ที่ยังเหลืออยู่ ส่วนยอดรวมดูได้จาก progress อยู่แล้ว
+    """
+
+    def __init__(self, maxlen=1000):
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=maxlen)
+        self._seq = 0
+        self.closed = False
+
+    def publish(self, event):
+        with self._cond:
+            self._seq += 1
+            self._events.append((self._seq, event))
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def wait(self, after, timeout=None):
+        """รอเหตุการณ์ที่ใหม่กว่า after คืน (รายการ (seq, event), feed ปิดแล้วหรือยัง)"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after or self.closed, timeout)
+            return [(seq, event) for seq, event in self._events if seq > after], self.closed
+
+
+class Job:
+    """งานค้นหาของไฟล์หนึ่งไฟล์ progress เป็น dict ที่ worker ของงานนี้อัปเดตเอง"""
+
+    def __init__(self, filepath, job_id=None):
+        self.job_id = job_id or uuid.uuid4().hex[:12]
+        self.filepath = filepath
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.progress = new_progress_data(self.job_id)
+        self.feed = ProgressFeed()
+
+    @property
+    def finished(self):
+        return self.progress['completed']
+
+    def rows_per_second(self, now=None):
+        """จำนวนแถวที่ทำเสร็จต่อวินาทีตั้งแต่งานเริ่มรัน ไม่นับแถวที่ทำไว้ก่อนรีสตาร์ท
+        (None ถ้ายังไม่เริ่ม)
+        """
+        if self.started_at is None:
+            return None
+        elapsed = (self.finished_at or now or time.time()) - self.started_at
+        rows = self.progress['current'] - self.progress.get('resumed_rows', 0)
+        return rows / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self):
+        """สำเนาของ progress สำหรับส่งออกทาง API"""
+        snapshot = dict(self.progress)
+        snapshot['found'] = dict(snapshot['found'])
+        return snapshot
+
+
+class JobManager:
+    """รับงานเข้าคิวที่มีขนาดจำกัด และรันพร้อมกันไม่เกิน max_running งาน
+
+    run_job(job) ถูกเรียกใน worker thread ของ manager งานที่เสร็จแล้วเก็บไว้
+    ไม่เกิน max_history งานล่าสุด เพื่อให้ยังดูผลและดาวน์โหลดได้
+    """
+
+    def __init__(self, run_job, max_running=2, max_queued=10, max_history=100):
+        self.run_job = run_job
+        self.max_running = max_running
+        self.max_history = max_history
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._workers = []
+
+    def _ensure_workers(self):
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.max_running):
+                worker = threading.Thread(target=self._worker, name=f'job-worker-{i}')
+                worker.daemon = True
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, filepath, job_id=None):
+        """เพิ่มงานเข้าคิว คืน Job หรือ raise JobQueueFull ถ้าคิวเต็ม"""
+        self._ensure_workers()
+        job = Job(filepath, job_id)
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise JobQueueFull(f'มีงานรอคิวอยู่แล้ว {self._queue.maxsize} งาน')
+            self._jobs[job.job_id] = job
+            self._prune()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def latest(self):
+        """งานล่าสุดที่ส่งเข้ามา (สำหรับ /progress แบบเดิม)"""
+        with self._lock:
+            return next(reversed(self._jobs.values()), None)
+
+    def jobs(self):
+        """งานทั้งหมดที่ยังจำไว้ เรียงตามลำดับที่ส่งเข้ามา"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def queued(self):
+        return self._queue.qsize()
+
+    def running(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.progress['status'] == 'running')
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - self.max_history, 0)]:
+            del self._jobs[job_id]
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            job.started_at = time.time()
+            job.progress['status'] = 'running'
+            job.progress['message'] = 'เริ่มการประมวลผล...'
+            try:
+                self.run_job(job)
+            except Exception as e:
+                logger.error(f"Job {job.job_id} failed: {e}")
+                job.progress['message'] = f'ข้อผิดพลาด: {str(e)}'
+            finally:
+                job.finished_at = time.time()
+                job.progress['completed'] = True
+                if job.progress['status'] == 'running':
+                    job.progress['status'] = 'completed' if job.progress['results'] else 'failed'
+                job.feed.close()
+                self._queue.task_done()
@@ -0,0 +1,279 @@
+"""ตัวนับ, gauge และ histogram ของการค้นหา ส่งออกในรูปแบบข้อความของ Prometheus ที่ /metrics
+
+ไม่ต้องติดตั้ง prometheus_client: metric ทุกตัวอยู่ใน REGISTRY ของโปรเซสนี้ และ
+render() คืนข้อความตาม text exposition format 0.0.4
+"""
+import asyncio
+import bisect
+import contextvars
+import math
+import threading
+import time
+from collections import Counter as _Tally
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """(ชื่อ sample, ชื่อ label, ค่า label, ค่า) ทุกชุด label"""
+        with self._lock:
+            return [(self.name, self.labelnames, key, value) for key, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for name, labelnames, labelvalues, value in self.samples():
+            lines.append(f'{name}{_format_labels(labelnames, labelvalues)} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """gauge ที่กำหนดค่าเอง หรืออ่านค่าจาก callback ตอน render
+
+    callback คืนรายการ (dict ของ label, ค่า)
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        if self.callback is None:
+            return super().samples()
+        return sorted((self.name, self.labelnames, self._key(labels), value) for labels, value in self.callback())
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * len(self.buckets), 0.0)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels):
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels)) or ((), 0.0)
+            return sum(counts)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    samples.append((f'{self.name}_bucket', self.labelnames + ('le',),
+                                    key + (_format_value(bound),), cumulative))
+                samples.append((f'{self.name}_sum', self.labelnames, key, total))
+                samples.append((f'{self.name}_count', self.labelnames, key, cumulative))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def unregister(self, name):
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+search_seconds = REGISTRY.register(Histogram(
+    'contact_search_source_seconds', 'Time spent by one search source for one company', ['source']))
+search_results = REGISTRY.register(Counter(
+    'contact_search_source_total',
+    'Search source calls by outcome (hit, miss, blocked, error, timeout, cancelled, breaker_open)',
+    ['source', 'outcome']))
+http_responses = REGISTRY.register(Counter(
+    'contact_http_responses_total',
+    'HTTP responses by host and status (timeout/error when no response); company websites share host="company_site"',
+    ['host', 'status']))
+http_connections = REGISTRY.register(Counter(
+    'contact_http_connections_total', 'Connections taken for a request: new (TCP/TLS handshake) or reused keep-alive',
+    ['client', 'kind']))
+http_retries = REGISTRY.register(Counter(
+    'contact_http_retries_total', 'Requests retried after a retryable status or a dropped connection',
+    ['host', 'reason']))
+rate_limit_wait = REGISTRY.register(Histogram(
+    'contact_rate_limit_wait_seconds', 'Time a request waited for its host quota', ['host'],
+    buckets=(0, 0.1, 0.5, 1, 2, 5, 10, 30)))
+selenium_page_loads = REGISTRY.register(Counter(
+    'contact_selenium_page_loads_total', 'Pages loaded through Selenium'))
+selenium_restarts = REGISTRY.register(Counter(
+    'contact_selenium_driver_restarts_total', 'Pooled Chrome drivers replaced', ['reason']))
+breaker_transitions = REGISTRY.register(Counter(
+    'contact_breaker_transitions_total', 'Circuit breaker state changes of a search source (open, half_open, closed)',
+    ['source', 'state']))
+rows = REGISTRY.register(Counter(
+    'contact_rows_total', 'Result rows written by state (found, not_found, skipped)', ['state']))
+
+# การค้นหาของแหล่งที่กำลังทำงานใน thread/task นี้ ให้ fetch นับ timeout และ error ให้แหล่งนั้น
+_current_call = contextvars.ContextVar('contact_search_call', default=None)
+
+
+class _SourceCall:
+    __slots__ = ('result', 'failures', 'outcome')
+
+    def __init__(self):
+        self.result = None
+        self.failures = _Tally()
+        self.outcome = None
+
+
+@contextmanager
+def track_source(source):
+    """วัดเวลาและผลของการค้นหาจากแหล่ง source หนึ่งครั้ง ให้กำหนด call.result ก่อนออกจาก with
+
+    fetch ที่หมดเวลา ผิดพลาด หรือถูกบล็อกภายใน with (รวม task ที่สร้างภายใน) นับเป็นผลของแหล่งนี้
+    แหล่งที่ไม่พบข้อมูลและมี fetch หมดเวลาจึงนับเป็น timeout ไม่ใช่ miss เมื่อออกจาก with
+    call.outcome คือผลที่นับ
+    """
+    call = _SourceCall()
+    token = _current_call.set(call)
+    started = time.monotonic()
+    outcome = None
+    try:
+        yield call
+    except asyncio.CancelledError:
+        outcome = 'cancelled'
+        raise
+    except Exception:
+        outcome = 'error'
+        raise
+    finally:
+        _current_call.reset(token)
+        if outcome is None:
+            if call.result and any(call.result):
+                outcome = 'hit'
+            elif call.failures['blocked']:
+                outcome = 'blocked'
+            elif call.failures['timeout']:
+                outcome = 'timeout'
+            elif call.failures['error']:
+                outcome = 'error'
+            else:
+                outcome = 'miss'
+        call.outcome = outcome
+        search_results.inc(source=source, outcome=outcome)
+        if outcome != 'cancelled':
+            search_seconds.observe(time.monotonic() - started, source=source)
+
+
+def note_blocked():
+    """แจ้งว่าการค้นหาของแหล่งที่กำลังทำงานถูกบล็อก หรือต้องข้าม host ที่ breaker พักอยู่"""
+    call = _current_call.get()
+    if call is not None:
+        call.failures['blocked'] += 1
+
+
+def connection_reuse_rate():
+    """สัดส่วน request ที่ได้ connection เดิม (keep-alive) รวมทุก client คืน None ถ้ายังไม่มี request"""
+    counts = _Tally()
+    for _, _, (_, kind), value in http_connections.samples():
+        counts[kind] += value
+    total = counts['new'] + counts['reused']
+    return round(counts['reused'] / total, 4) if total else None
+
+
+# ค่า label host ของเว็บไซต์บริษัททุกเว็บ ให้จำนวน series คงที่ไม่โตตามจำนวนบริษัทที่ค้นหา
+COMPANY_SITE = 'company_site'
+# host ของแหล่งค้นหาและไดเรกทอรีที่ใช้เป็นค่า label ได้ตรง ๆ (เพิ่มด้วย label_hosts)
+_labelled_hosts = set()
+
+
+def label_hosts(hosts):
+    """ให้ host เหล่านี้ (และ subdomain ของมัน) ใช้เป็นค่า label host ได้ host อื่นนับเป็น COMPANY_SITE"""
+    _labelled_hosts.update(host for host in hosts if host)
+
+
+def host_label(host):
+    """ค่า label host ของ metric HTTP: host ที่ลงทะเบียนไว้ หรือ COMPANY_SITE"""
+    parts = host.split('.')
+    for i in range(len(parts)):
+        suffix = '.'.join(parts[i:])
+        if suffix in _labelled_hosts:
+            return suffix
+    return COMPANY_SITE
+
+
+def observe_response(host, status):
+    """นับ response ของ host (status เป็นตัวเลข หรือ 'timeout'/'error' เมื่อไม่ได้ response)"""
+    http_responses.inc(host=host_label(host), status=status)
+    if status in ('timeout', 'error'):
+        call = _current_call.get()
+        if call is not None:
+            call.failures[status] += 1
@@ -0,0 +1,149 @@
+"""เก็บหน้าเว็บดิบที่ดึงมาแล้ว (บีบอัด และไม่เก็บซ้ำตาม hash ของเนื้อหา) ไว้ดึงข้อมูลใหม่แบบ offline"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from company_names import canonicalize_company_name
+
+logger = logging.getLogger(__name__)
+
+
+class PageStore:
+    """หน้าเว็บหนึ่งหน้าเก็บเป็นไฟล์ zlib ชื่อตาม SHA-256 ของเนื้อหา ส่วน index
+    (บริษัท แหล่ง URL -> hash) อยู่ใน SQLite
+
+    หน้าที่เนื้อหาเหมือนกันใช้ไฟล์เดียวกัน เมื่อขนาดรวมของไฟล์เกิน max_bytes
+    จะลบไฟล์ที่เก็บไว้นานที่สุดพร้อม index ที่อ้างถึงจนต่ำกว่าขนาดที่กำหนด
+    """
+
+    def __init__(self, root, max_bytes=1024 * 1024 * 1024, evict_every=100, level=6):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self.level = level
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._schema_ready = False
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(self.root, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.root, 'index.sqlite3'), timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._lock:
+                if not self._schema_ready:
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS blobs ('
+                        ' hash TEXT PRIMARY KEY,'
+                        ' size INTEGER NOT NULL,'
+                        ' stored_size INTEGER NOT NULL,'
+                        ' stored_at REAL NOT NULL)'
+                    )
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS pages ('
+                        ' company_key TEXT NOT NULL,'
+                        ' company TEXT NOT NULL,'
+                        ' source TEXT NOT NULL,'
+                        ' url TEXT NOT NULL,'
+                        ' hash TEXT NOT NULL,'
+                        ' fetched_at REAL NOT NULL,'
+                        ' PRIMARY KEY (company_key, source, url))'
+                    )
+                    conn.execute('CREATE INDEX IF NOT EXISTS pages_hash ON pages (hash)')
+                    conn.execute('CREATE INDEX IF NOT EXISTS blobs_stored ON blobs (stored_at)')
+                    self._schema_ready = True
+        return conn
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:] + '.z')
+
+    def put(self, company_name, source, url, html):
+        """บันทึกหน้าเว็บ คืน hash ของเนื้อหา (None ถ้าบันทึกไม่สำเร็จ)"""
+        if not html:
+            return None
+        data = html.encode('utf-8', errors='replace') if isinstance(html, str) else html
+        digest = hashlib.sha256(data).hexdigest()
+        now = time.time()
+        try:
+            conn = self._connect()
+            known = conn.execute('SELECT 1 FROM blobs WHERE hash = ?', (digest,)).fetchone()
+            if known is None:
+                path = self._blob_path(digest)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                compressed = zlib.compress(data, self.level)
+                tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(compressed)
+                os.replace(tmp_path, path)
+                conn.execute(
+                    'INSERT OR IGNORE INTO blobs (hash, size, stored_size, stored_at) VALUES (?, ?, ?, ?)',
+                    (digest, len(data), len(compressed), now),
+                )
+            conn.execute(
+                'INSERT OR REPLACE INTO pages (company_key, company, source, url, hash, fetched_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                (canonicalize_company_name(company_name), company_name, source, url, digest, now),
+            )
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Page store write error for {url}: {e}")
+            return None
+
+        with self._lock:
+            self._writes += 1
+            should_evict = self._writes % self.evict_every == 0
+        if should_evict:
+            self.evict()
+        return digest
+
+    def get(self, digest):
+        """เนื้อหาของหน้าตาม hash (str)"""
+        with open(self._blob_path(digest), 'rb') as f:
+            return zlib.decompress(f.read()).decode('utf-8', errors='replace')
+
+    def companies(self):
+        """(company_key, ชื่อบริษัท) ทุกบริษัทที่มีหน้าเก็บไว้ เรียงตามเวลาที่เก็บครั้งแรก"""
+        return self._connect().execute(
+            'SELECT company_key, MIN(company) FROM pages GROUP BY company_key ORDER BY MIN(fetched_at)'
+        ).fetchall()
+
+    def pages(self, company_key):
+        """(source, url, hash) ของบริษัทหนึ่ง เรียงตามเวลาที่ดึง"""
+        return self._connect().execute(
+            'SELECT source, url, hash FROM pages WHERE company_key = ? ORDER BY fetched_at, rowid',
+            (company_key,),
+        ).fetchall()
+
+    def total_bytes(self):
+        (total,) = self._connect().execute('SELECT COALESCE(SUM(stored_size), 0) FROM blobs').fetchone()
+        return total
+
+    def evict(self):
+        """ลบไฟล์ที่เก็บไว้นานที่สุดจนขนาดรวมไม่เกิน max_bytes"""
+        try:
+            conn = self._connect()
+            excess = self.total_bytes() - self.max_bytes
+            if excess <= 0:
+                return
+            victims = []
+            for digest, stored_size in conn.execute('SELECT hash, stored_size FROM blobs ORDER BY stored_at'):
+                victims.append(digest)
+                excess -= stored_size
+                if excess <= 0:
+                    break
+            for digest in victims:
+                conn.execute('DELETE FROM pages WHERE hash = ?', (digest,))
+                conn.execute('DELETE FROM blobs WHERE hash = ?', (digest,))
+                try:
+                    os.remove(self._blob_path(digest))
+                except FileNotFoundError:
+                    pass
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Page store eviction error: {e}")
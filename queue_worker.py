@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""worker ที่ยืมแถวจากคิวแถว (ROW_QUEUE_PATH) ไปค้นหาแล้วเขียนผลกลับ
+
+หน้าเว็บที่ตั้ง ROW_QUEUE_PATH แค่ส่งแถวเข้าคิว ความเร็วจึงเพิ่มได้ด้วยการเปิด worker
+เพิ่ม (บนเครื่องเดียวกันหรือเครื่องอื่นที่เห็นไฟล์คิวเดียวกัน) ถ้า worker ตาย แถวที่ยืมไว้
+จะกลับเข้าคิวเมื่อสัญญายืมหมด (ROW_LEASE_SECONDS) ให้ worker อื่นทำต่อ
+--processes แบ่งโควตาต่อ host (HOST_RATES) และ DRIVER_POOL_SIZE ให้แต่ละโปรเซสเท่า ๆ กัน
+
+รัน: ROW_QUEUE_PATH=cache/rows.sqlite3 python queue_worker.py [--processes 2] [--threads 4]
+     [--idle-exit SECONDS] [--verbose]
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from backoff import RetryPolicy
+from batch import share_process_limits
+
+logger = logging.getLogger(__name__)
+
+
+class QueueWorker:
+    """ยืมแถวจาก queue มาค้นหาด้วย search_row(company) ใน thread pool ขนาด threads
+
+    ยืมล่วงหน้าไว้ไม่เกิน threads * 2 แถว และต่อสัญญาของแถวที่ยังค้างอยู่ทุก
+    lease_seconds / 3 วินาที แถวที่ search_row raise จะคืนเข้าคิว (ลองใหม่ไม่เกิน
+    max_attempts ครั้งของคิว) ถ้าไฟล์คิวถูก lock นานเกิน timeout ของ SQLite จะรอแบบ
+    backoff แล้วลองใหม่แทนที่จะหยุด
+    """
+
+    def __init__(self, queue, search_row, threads=4, worker_id=None, poll_interval=1.0):
+        self.queue = queue
+        self.search_row = search_row
+        self.threads = threads
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self.poll_interval = poll_interval
+        self.completed = 0
+        self.lock_backoff = RetryPolicy(backoff=poll_interval, max_backoff=30)
+        self._lock_errors = 0
+
+    def run(self, stop=None, idle_exit=None):
+        """ทำงานจนกว่า stop (threading.Event) ถูกตั้ง หรือคิวว่างนาน idle_exit วินาที
+        แถวที่ยืมไว้แล้วจะทำให้เสร็จก่อนคืนค่า คืนจำนวนแถวที่ทำเสร็จ
+        """
+        stop = stop or threading.Event()
+        in_flight = {}
+        renew_every = self.queue.lease_seconds / 3
+        last_renewal = idle_since = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='queue-worker') as executor:
+            while not stop.is_set():
+                free = self.threads * 2 - len(in_flight)
+                if free > 0:
+                    ok, claimed = self._queue_call(self.queue.claim, self.worker_id, free)
+                    if not ok:
+                        stop.wait(self.lock_backoff.delay(self._lock_errors - 1))
+                        idle_since = time.monotonic()
+                        claimed = []
+                    for job_id, row_index, company_name in claimed:
+                        future = executor.submit(self.search_row, company_name)
+                        in_flight[future] = (job_id, row_index)
+                now = time.monotonic()
+                if in_flight:
+                    idle_since = now
+                elif idle_exit is not None and now - idle_since >= idle_exit:
+                    break
+                else:
+                    stop.wait(self.poll_interval)
+                    continue
+
+                done, _ = wait(in_flight, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._finish(future, *in_flight.pop(future))
+                if in_flight and time.monotonic() - last_renewal >= renew_every:
+                    ok, _ = self._queue_call(self.queue.extend, self.worker_id, list(in_flight.values()))
+                    if ok:
+                        last_renewal = time.monotonic()
+
+            for future in list(in_flight):
+                future.exception()
+                self._finish(future, *in_flight.pop(future))
+        return self.completed
+
+    def _queue_call(self, method, *args):
+        """เรียก method ของคิว คืน (สำเร็จหรือไม่, ผลลัพธ์) ไม่สำเร็จเมื่อไฟล์คิว lock อยู่นานเกิน
+        timeout หรือเขียนไม่ได้ชั่วคราว
+        """
+        try:
+            result = method(*args)
+        except sqlite3.OperationalError as e:
+            self._lock_errors += 1
+            logger.warning(f"Row queue unavailable ({e}), retrying")
+            return False, None
+        self._lock_errors = 0
+        return True, result
+
+    def _finish(self, future, job_id, row_index):
+        try:
+            row = future.result()
+        except Exception as e:
+            logger.error(f"Row {row_index} of job {job_id} failed: {e}")
+            self._queue_call(self.queue.fail, job_id, row_index, self.worker_id)
+            return
+        # ถ้าเขียนผลไม่ได้ แถวจะกลับเข้าคิวเมื่อสัญญายืมหมดและถูกค้นหาใหม่
+        ok, _ = self._queue_call(self.queue.complete, job_id, row_index, row)
+        if ok:
+            self.completed += 1
+
+
+def run_worker(threads, idle_exit=None, verbose=False):
+    """รัน worker หนึ่งโปรเซสด้วยการตั้งค่าของ app (ROW_QUEUE_PATH, CACHE_PATH, ...)"""
+    import app as app_module
+
+    if not verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    if app_module.row_queue is None:
+        raise SystemExit('ต้องตั้ง ROW_QUEUE_PATH ให้ตรงกับหน้าเว็บ')
+
+    worker_local = threading.local()
+    searchers = []
+    searchers_lock = threading.Lock()
+
+    def get_searcher():
+        if not hasattr(worker_local, 'searcher'):
+            worker_local.searcher = app_module.ImprovedContactSearcher(driver_pool=app_module.driver_pool)
+            with searchers_lock:
+                searchers.append(worker_local.searcher)
+        return worker_local.searcher
+
+    def search_row(company_name):
+        return app_module.search_company_row(company_name, get_searcher, app_module.contact_cache)
+
+    stop = threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        # SIGTERM/SIGINT: หยุดยืมแถวใหม่ แล้วทำแถวที่ยืมไว้ให้เสร็จ
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: stop.set())
+
+    worker = QueueWorker(app_module.row_queue, search_row, threads=threads,
+                         poll_interval=app_module.app.config['ROW_QUEUE_POLL_SECONDS'])
+    logger.info(f"Worker {worker.worker_id} started with {threads} threads")
+    try:
+        return worker.run(stop, idle_exit)
+    finally:
+        for searcher in searchers:
+            searcher.close()
+        app_module.driver_pool.close()
+        if app_module.app.config['ADAPTIVE_SOURCES'] and app_module.app.config['SOURCE_STATS_PATH']:
+            try:
+                app_module.global_source_stats.save(app_module.app.config['SOURCE_STATS_PATH'])
+            except OSError as e:
+                logger.error(f"Could not save source stats: {e}")
+
+
+def _run_worker_args(args):
+    return run_worker(*args)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queue', help='ไฟล์คิวแถว (ROW_QUEUE_PATH)')
+    parser.add_argument('--processes', type=int, default=1, help='จำนวนโปรเซส worker')
+    parser.add_argument('--threads', type=int, default=None, help='จำนวน thread ต่อโปรเซส (MAX_WORKERS)')
+    parser.add_argument('--idle-exit', type=float, default=None,
+                        help='ออกเมื่อคิวว่างนานกี่วินาที (ค่าเริ่มต้น ทำงานไปเรื่อยๆ)')
+    parser.add_argument('--verbose', action='store_true', help='แสดง log ของการค้นหาทุกแถว')
+    args = parser.parse_args(argv)
+
+    if args.queue:
+        os.environ['ROW_QUEUE_PATH'] = args.queue
+    if not os.environ.get('ROW_QUEUE_PATH'):
+        parser.error('ต้องระบุ --queue หรือตั้ง ROW_QUEUE_PATH')
+    threads = args.threads or int(os.environ.get('MAX_WORKERS', 4))
+    job = (threads, args.idle_exit, args.verbose)
+
+    if args.processes <= 1:
+        completed = run_worker(*job)
+    else:
+        share_process_limits(args.processes)
+        with multiprocessing.get_context('spawn').Pool(args.processes) as pool:
+            completed = sum(pool.map(_run_worker_args, [job] * args.processes))
+    print(f"ค้นหาเสร็จ {completed} แถว", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""จำกัดอัตราการยิง request แยกตาม host ด้วย token bucket ใช้ร่วมกันทุก worker"""
+import asyncio
+import random
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import metrics
+import tracing
+
+# อัตราเริ่มต้น (request ต่อวินาที, burst) ของ host ที่ค้นหาบ่อย
+DEFAULT_HOST_RATES = {
+    'google.com': (0.3, 2),
+    'bing.com': (1.0, 3),
+    'duckduckgo.com': (1.0, 3),
+    'yellowpages.co.th': (0.5, 2),
+    'thailandyp.com': (0.5, 2),
+}
+metrics.label_hosts(DEFAULT_HOST_RATES)
+
+
+def host_key(url):
+    """host ของ URL ที่ตัด www. และ port ออก เช่น https://www.bing.com/search -> bing.com"""
+    host = (urlsplit(url).hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    return host
+
+
+def parse_host_rates(spec):
+    """แปลงข้อความ "google.com=0.3:2,bing.com=1" เป็น {host: (rate, burst)}
+
+    burst ละไว้ได้ (ค่าเริ่มต้น 1)
+    """
+    rates = {}
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, value = item.partition('=')
+        rate, _, burst = value.partition(':')
+        rates[host.strip().lower()] = (float(rate), int(burst or 1))
+    return rates
+
+
+def format_host_rates(rates):
+    """แปลง {host: (rate, burst)} กลับเป็นข้อความแบบที่ parse_host_rates อ่านได้"""
+    return ','.join(f'{host}={rate:g}:{burst}' for host, (rate, burst) in rates.items())
+
+
+class TokenBucket:
+    """token bucket แบบจองคิว: ทุกคนได้ token ทันทีถ้ายังมี ไม่เช่นนั้นได้เวลาที่ต้องรอ
+
+    การจองล่วงหน้า (ยอดติดลบ) ทำให้ thread และ coroutine ที่รอพร้อมกัน
+    ได้คิวต่อกันตามลำดับ โดยไม่ต้องวนตรวจซ้ำ
+    """
+
+    def __init__(self, rate, burst=1, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """จอง token หนึ่งตัว คืนจำนวนวินาทีที่ต้องรอก่อนใช้ได้ (0 ถ้าใช้ได้ทันที)"""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class HostRateLimiter:
+    """token bucket หนึ่งถังต่อ host worker จะรอเฉพาะเมื่อ host นั้นใช้โควตาหมดแล้ว
+
+    jitter (วินาที) สุ่มเพิ่มเฉพาะตอนที่ต้องรอ เพื่อไม่ให้ worker ที่รอพร้อมกัน
+    ยิงออกไปพร้อมกันเป๊ะ host ที่ไม่อยู่ใน rates ใช้ default_rate
+
+    ถังของ host ที่ไม่อยู่ใน rates (เว็บไซต์บริษัท) เก็บไว้แค่ max_hosts ถังที่ใช้ล่าสุด
+    ถังที่ถูกทิ้งคือ host ที่ไม่ได้ยิงมานานแล้ว ซึ่งโควตาเต็มถังอยู่แล้ว
+    """
+
+    def __init__(self, rates=None, default_rate=2.0, default_burst=5, jitter=0.5, max_hosts=1024):
+        self.rates = dict(DEFAULT_HOST_RATES if rates is None else rates)
+        metrics.label_hosts(self.rates)
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.jitter = jitter
+        self.waited = 0.0
+        self.max_hosts = max_hosts
+        self._buckets = {}
+        self._site_buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _bucket(self, host):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is not None:
+                return bucket
+            bucket = self._site_buckets.get(host)
+            if bucket is not None:
+                self._site_buckets.move_to_end(host)
+                return bucket
+            rate = self._rate_for(host)
+            if rate is not None:
+                bucket = self._buckets[host] = TokenBucket(*rate)
+                return bucket
+            bucket = self._site_buckets[host] = TokenBucket(self.default_rate, self.default_burst)
+            if len(self._site_buckets) > self.max_hosts:
+                self._site_buckets.popitem(last=False)
+            return bucket
+
+    def _rate_for(self, host):
+        # ใช้อัตราของโดเมนแม่ด้วย เช่น duckduckgo.com ครอบคลุม html.duckduckgo.com
+        parts = host.split('.')
+        for i in range(len(parts) - 1):
+            rate = self.rates.get('.'.join(parts[i:]))
+            if rate is not None:
+                return rate
+        return None
+
+    def delay(self, url):
+        """จองโควตาของ host ของ url คืนจำนวนวินาทีที่ต้องรอ"""
+        host = host_key(url)
+        delay = self._bucket(host).reserve()
+        if delay > 0 and self.jitter:
+            delay += random.uniform(0, self.jitter)
+        if delay > 0:
+            with self._lock:
+                self.waited += delay
+        metrics.rate_limit_wait.observe(delay, host=metrics.host_label(host))
+        return delay
+
+    def wait(self, url):
+        """รอ (แบบ blocking) จนกว่าจะยิง request ไปยัง url ได้"""
+        delay = self.delay(url)
+        if delay > 0:
+            with tracing.span('rate_limit_wait', 'wait', host=host_key(url)):
+                time.sleep(delay)
+
+    async def wait_async(self, url):
+        """เหมือน wait แต่ใช้ใน coroutine"""
+        delay = self.delay(url)
+        if delay > 0:
+            with tracing.span('rate_limit_wait', 'wait', host=host_key(url)):
+                await asyncio.sleep(delay)
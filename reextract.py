@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""ดึงข้อมูลติดต่อใหม่จากหน้าเว็บใน page store โดยไม่ต้องค้นหาผ่านเครือข่าย
+
+ใช้เมื่อปรับ extractor แล้วต้องการผลใหม่ของทุกบริษัทที่เคยค้นหาไว้
+รัน: python reextract.py --store pages --output reextracted.xlsx [--processes 4]
+     [--extractor contact_extractor:extract_contact_info_html]
+"""
+import argparse
+import importlib
+import os
+import time
+from multiprocessing import Pool
+
+from company_io import ResultWriter
+from field_plan import FIELDS, MergedResult
+from page_store import PageStore
+from search_urls import SOURCE_ALIASES
+
+RESULT_COLUMNS = ['Company', 'Email', 'Phone', 'Website', 'Source', 'Url']
+
+# ลำดับความสำคัญของแหล่งเมื่อหลายหน้าให้ field เดียวกัน (ลำดับเดียวกับ AsyncSearchEngine.sources)
+SOURCE_RANKS = {source: rank for rank, source in enumerate(SOURCE_ALIASES.values())}
+
+_store = None
+_extract = None
+_required_fields = ()
+
+
+def load_extractor(spec):
+    """โหลดฟังก์ชันจากข้อความ "module:function" """
+    module_name, _, function_name = spec.partition(':')
+    return getattr(importlib.import_module(module_name), function_name or 'extract_contact_info_html')
+
+
+def _init_worker(store_root, extractor_spec, required_fields):
+    global _store, _extract, _required_fields
+    _store = PageStore(store_root)
+    _extract = load_extractor(extractor_spec)
+    _required_fields = required_fields
+
+
+def reextract_company(item):
+    """ผลใหม่ของบริษัทหนึ่ง: รวมแต่ละ field จากทุกหน้าแบบเดียวกับการค้นหา (MergedResult)
+
+    field ที่หลายหน้าให้ค่าใช้ค่าจากแหล่งที่ลำดับดีกว่า Source บอกแหล่งของแต่ละ field
+    และ Url คือหน้าที่ให้ค่าที่ใช้ หยุดเมื่อรวมแล้วครบตาม required_fields
+    """
+    company_key, company_name = item
+    merged = MergedResult()
+    urls = {}
+    for source, url, digest in _store.pages(company_key):
+        try:
+            html = _store.get(digest)
+        except FileNotFoundError:
+            continue
+        email, phone, website = _extract(html)
+        if source == 'Direct Website':
+            # เหมือน _search_website_direct: หน้าที่เดาโดเมนถูกนับเมื่อได้ email หรือเบอร์โทร และเว็บไซต์คือหน้านั้น
+            if not (email or phone):
+                continue
+            website = url
+        for field in merged.add(source, (email, phone, website), SOURCE_RANKS.get(source, len(SOURCE_RANKS))):
+            urls[field] = url
+        if merged.complete(_required_fields):
+            break
+
+    email, phone, website = merged.as_tuple()
+    used_urls = list(dict.fromkeys(urls[field] for field in FIELDS if field in urls))
+    return {'Company': company_name, 'Email': email, 'Phone': phone, 'Website': website,
+            'Source': merged.source_label(), 'Url': ' + '.join(used_urls) or None}
+
+
+def reextract(store_root, output_path, extractor_spec='contact_extractor:extract_contact_info_html',
+              processes=None, required_fields=('email', 'phone')):
+    """ดึงข้อมูลใหม่ของทุกบริษัทใน store แล้วเขียนไฟล์ผลลัพธ์ คืนจำนวนบริษัท"""
+    companies = PageStore(store_root).companies()
+    writer = ResultWriter(output_path, columns=RESULT_COLUMNS)
+    init_args = (store_root, extractor_spec, tuple(required_fields))
+    if processes == 1:
+        _init_worker(*init_args)
+        for row in map(reextract_company, companies):
+            writer.append(row)
+    else:
+        with Pool(processes, initializer=_init_worker, initargs=init_args) as pool:
+            for row in pool.imap(reextract_company, companies, chunksize=16):
+                writer.append(row)
+    writer.close()
+    return writer.rows_written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--store', default=os.environ.get('PAGE_STORE_PATH', 'pages'), help='โฟลเดอร์ page store')
+    parser.add_argument('--output', default=f'reextracted_{int(time.time())}.xlsx')
+    parser.add_argument('--extractor', default='contact_extractor:extract_contact_info_html',
+                        help='ฟังก์ชันที่รับ HTML และคืน (email, phone, website)')
+    parser.add_argument('--processes', type=int, default=None, help='จำนวนโปรเซส (ค่าเริ่มต้น = จำนวน CPU)')
+    parser.add_argument('--required-fields', default='email,phone',
+                        help='field ที่ต้องครบจึงหยุดดูหน้าถัดไปของบริษัทนั้น')
+    args = parser.parse_args()
+
+    required_fields = tuple(field.strip() for field in args.required_fields.split(',') if field.strip())
+    start = time.perf_counter()
+    count = reextract(args.store, args.output, args.extractor, args.processes, required_fields)
+    print(f"ดึงข้อมูลใหม่ {count} บริษัท ใน {time.perf_counter() - start:.1f} วินาที -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""คิวแถวที่ต้องค้นหาใน SQLite ใช้ร่วมกันระหว่างหน้าเว็บ (ส่งแถวเข้าคิว) และ worker
+หลายโปรเซส (queue_worker.py) ที่ยืมแถวไปค้นหาแบบมีสัญญายืม (lease)
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from company_names import canonicalize_company_name
+
+# ผลของแถวที่ค้นหาล้มเหลวครบ max_attempts ครั้ง
+FAILED_RESULT = {'Email': '', 'Phone': '', 'Website': '', 'Address': '', 'Source': 'ค้นหาไม่สำเร็จ', 'Cached': ''}
+
+
+class RowQueue:
+    """แต่ละแถวมีสถานะ pending -> leased -> done
+
+    worker ยืมแถว (claim) ได้นาน lease_seconds และต้องต่อสัญญา (extend) ระหว่างค้นหา
+    ถ้า worker ตายไป แถวที่สัญญาหมดจะกลับเป็น pending ให้ worker อื่นยืมต่อ แถวที่
+    ถูกยืมครบ max_attempts ครั้งแล้วยังไม่เสร็จจะปิดด้วย FAILED_RESULT
+
+    แถวที่เป็นบริษัทเดียวกับแถวก่อนหน้าในงานเดียวกัน (จำไว้ไม่เกิน dedupe_memory ชื่อ)
+    มีสถานะ waiting และได้ผลเดียวกันทันทีเมื่อแถวแรกเสร็จ
+    """
+
+    def __init__(self, path, lease_seconds=120, max_attempts=3, dedupe_memory=50000):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.dedupe_memory = dedupe_memory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._lock:
+                if not self._schema_ready:
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS jobs ('
+                        ' job_id TEXT PRIMARY KEY,'
+                        ' filepath TEXT NOT NULL,'
+                        ' total INTEGER NOT NULL,'
+                        ' created_at REAL NOT NULL)'
+                    )
+                    conn.execute(
+                        'CREATE TABLE IF NOT EXISTS rows ('
+                        ' job_id TEXT NOT NULL,'
+                        ' row_index INTEGER NOT NULL,'
+                        ' company TEXT NOT NULL,'
+                        ' key TEXT NOT NULL,'
+                        ' first INTEGER NOT NULL,'
+                        ' state TEXT NOT NULL,'
+                        ' worker TEXT,'
+                        ' lease_until REAL,'
+                        ' attempts INTEGER NOT NULL DEFAULT 0,'
+                        ' result TEXT,'
+                        ' PRIMARY KEY (job_id, row_index))'
+                    )
+                    conn.execute('CREATE INDEX IF NOT EXISTS rows_state ON rows (state, lease_until)')
+                    conn.execute('CREATE INDEX IF NOT EXISTS rows_key ON rows (job_id, key, state)')
+                    self._schema_ready = True
+        return conn
+
+    def _transaction(self):
+        """BEGIN IMMEDIATE เพื่อให้ claim ของหลายโปรเซสไม่ยืมแถวเดียวกัน"""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        return conn
+
+    def enqueue(self, job_id, filepath, company_names, chunk_size=1000):
+        """ส่งทุกแถวของงานเข้าคิว คืน False ถ้างานนี้อยู่ในคิวแล้ว
+
+        company_names (เช่นชื่อที่อ่านจากไฟล์ xlsx) ถูกอ่านนอก transaction และเขียนลงคิว
+        ทีละ chunk_size แถว worker จึงยืมแถวของงานอื่นได้ตลอด แถวของงานนี้ยังไม่ถูกยืม
+        จนกว่าจะเพิ่มงานลงตาราง jobs ซึ่งทำเป็นขั้นสุดท้าย ถ้าส่งไม่จบ แถวที่ค้างอยู่
+        จะถูกลบเมื่อส่งงานนี้ใหม่
+        """
+        conn = self._transaction()
+        try:
+            if conn.execute('SELECT 1 FROM jobs WHERE job_id = ?', (job_id,)).fetchone():
+                conn.execute('ROLLBACK')
+                return False
+            conn.execute('DELETE FROM rows WHERE job_id = ?', (job_id,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+        seen = OrderedDict()
+        batch = []
+        total = 0
+        for row_index, company_name in enumerate(company_names):
+            key = canonicalize_company_name(company_name)
+            first = key not in seen
+            if first:
+                seen[key] = True
+                if len(seen) > self.dedupe_memory:
+                    seen.popitem(last=False)
+            else:
+                seen.move_to_end(key)
+            batch.append((job_id, row_index, company_name, key, int(first), 'pending' if first else 'waiting'))
+            total += 1
+            if len(batch) >= chunk_size:
+                self._insert_rows(batch)
+                batch = []
+        self._insert_rows(batch, job=(job_id, filepath, total, time.time()))
+        return True
+
+    def _insert_rows(self, batch, job=None):
+        """เขียนแถวชุดหนึ่งใน transaction สั้นๆ ของตัวเอง (และเพิ่มงานลง jobs ถ้าระบุ job)"""
+        conn = self._transaction()
+        try:
+            conn.executemany(
+                'INSERT INTO rows (job_id, row_index, company, key, first, state) VALUES (?, ?, ?, ?, ?, ?)', batch)
+            if job is not None:
+                conn.execute('INSERT INTO jobs (job_id, filepath, total, created_at) VALUES (?, ?, ?, ?)', job)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def claim(self, worker, limit=1):
+        """ยืมแถวที่รอค้นหาไม่เกิน limit แถว คืน [(job_id, row_index, company)]"""
+        now = time.time()
+        conn = self._transaction()
+        try:
+            # สัญญาที่หมดแล้ว: กลับเข้าคิว หรือปิดเป็นล้มเหลวถ้าลองครบแล้ว
+            expired = conn.execute(
+                "SELECT job_id, row_index FROM rows WHERE state = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, self.max_attempts),
+            ).fetchall()
+            for job_id, row_index in expired:
+                self._finish(conn, job_id, row_index, FAILED_RESULT)
+            conn.execute("UPDATE rows SET state = 'pending', worker = NULL "
+                         "WHERE state = 'leased' AND lease_until < ?", (now,))
+
+            # แถวของงานที่ยังส่งเข้าคิวไม่จบ (ยังไม่มีใน jobs) ยังไม่ให้ยืม
+            claimed = conn.execute(
+                "SELECT job_id, row_index, company FROM rows WHERE state = 'pending' "
+                "AND job_id IN (SELECT job_id FROM jobs) ORDER BY rowid LIMIT ?",
+                (limit,),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE rows SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 "
+                "WHERE job_id = ? AND row_index = ?",
+                [(worker, now + self.lease_seconds, job_id, row_index) for job_id, row_index, _ in claimed],
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return claimed
+
+    def extend(self, worker, rows):
+        """ต่อสัญญาของแถวที่ worker ยังค้นหาอยู่ rows คือ [(job_id, row_index)]"""
+        lease_until = time.time() + self.lease_seconds
+        self._connect().executemany(
+            "UPDATE rows SET lease_until = ? WHERE job_id = ? AND row_index = ? AND worker = ? AND state = 'leased'",
+            [(lease_until, job_id, row_index, worker) for job_id, row_index in rows],
+        )
+
+    def complete(self, job_id, row_index, result):
+        """บันทึกผลของแถว (dict ของคอลัมน์ผลลัพธ์) พร้อมแถวซ้ำที่รอผลนี้อยู่"""
+        conn = self._transaction()
+        try:
+            self._finish(conn, job_id, row_index, result)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def fail(self, job_id, row_index, worker):
+        """คืนแถวที่ค้นหาไม่สำเร็จเข้าคิว (หรือปิดเป็นล้มเหลวถ้าลองครบ max_attempts แล้ว)"""
+        conn = self._transaction()
+        try:
+            row = conn.execute('SELECT attempts FROM rows WHERE job_id = ? AND row_index = ? AND worker = ? '
+                               "AND state = 'leased'", (job_id, row_index, worker)).fetchone()
+            if row is not None and row[0] >= self.max_attempts:
+                self._finish(conn, job_id, row_index, FAILED_RESULT)
+            elif row is not None:
+                conn.execute("UPDATE rows SET state = 'pending', worker = NULL WHERE job_id = ? AND row_index = ?",
+                             (job_id, row_index))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def _finish(conn, job_id, row_index, result):
+        data = json.dumps({column: value for column, value in result.items() if column not in ('Company', 'First')},
+                          ensure_ascii=False)
+        updated = conn.execute(
+            "UPDATE rows SET state = 'done', result = ?, lease_until = NULL "
+            "WHERE job_id = ? AND row_index = ? AND state != 'done' RETURNING key, first",
+            (data, job_id, row_index),
+        ).fetchone()
+        if updated is not None and updated[1]:
+            conn.execute("UPDATE rows SET state = 'done', result = ? WHERE job_id = ? AND key = ? AND state = 'waiting'",
+                         (data, job_id, updated[0]))
+
+    def counts(self, job_id):
+        """จำนวนแถวของงานแยกตามสถานะ"""
+        rows = self._connect().execute('SELECT state, COUNT(*) FROM rows WHERE job_id = ? GROUP BY state',
+                                       (job_id,)).fetchall()
+        return dict(rows)
+
+    def total(self, job_id):
+        row = self._connect().execute('SELECT total FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def results(self, job_id, start=0, limit=None):
+        """แถวที่เสร็จแล้วตั้งแต่ row_index = start เรียงตามลำดับแถว คืน [(row_index, row)]
+
+        row เป็น dict ของคอลัมน์ผลลัพธ์ รวม Company และ First (เป็นแถวแรกของบริษัทนี้หรือไม่)
+        """
+        rows = self._connect().execute(
+            "SELECT row_index, company, first, result FROM rows "
+            "WHERE job_id = ? AND row_index >= ? AND state = 'done' ORDER BY row_index LIMIT ?",
+            (job_id, start, -1 if limit is None else limit),
+        )
+        return [(row_index, dict(json.loads(result), Company=company, First=bool(first)))
+                for row_index, company, first, result in rows]
+
+    def iter_results(self, job_id, page_size=1000):
+        """แถวที่เสร็จแล้วทั้งหมดของงานเรียงตามลำดับแถว อ่านทีละ page_size แถว (ใช้หน่วยความจำคงที่)"""
+        start = 0
+        while True:
+            page = self.results(job_id, start=start, limit=page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            start = page[-1][0] + 1
+
+    def unfinished_jobs(self):
+        """(job_id, filepath) ของงานที่ยังไม่ได้เขียนไฟล์ผลลัพธ์ (งานถูกลบด้วย remove หลังเขียนแล้ว)
+
+        รวมงานที่ worker ค้นหาครบทุกแถวแล้วระหว่างที่หน้าเว็บไม่ได้ทำงานด้วย
+        """
+        return self._connect().execute('SELECT job_id, filepath FROM jobs ORDER BY created_at').fetchall()
+
+    def remove(self, job_id):
+        """ลบงานและทุกแถวของงานออกจากคิว"""
+        conn = self._transaction()
+        try:
+            conn.execute('DELETE FROM rows WHERE job_id = ?', (job_id,))
+            conn.execute('DELETE FROM jobs WHERE job_id = ?', (job_id,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
@@ -0,0 +1,52 @@
+"""ชื่อและ URL ของแหล่งค้นหาแต่ละแหล่ง (เปลี่ยนไปยัง server อื่นได้ เช่น server จำลองของ bench_search.py)"""
+
+# ชื่อย่อของแหล่งค้นหา (ใช้ใน SEARCH_SOURCES และ batch.py --sources) -> ชื่อที่แสดงในผลลัพธ์
+SOURCE_ALIASES = {
+    'google': 'Selenium Google',
+    'duckduckgo': 'DuckDuckGo',
+    'bing': 'Bing',
+    'direct': 'Direct Website',
+    'directories': 'Business Directories',
+}
+# {query} คือคำค้น (ช่องว่างเป็น +) ส่วน {domain} คือโดเมนที่เดาจากชื่อบริษัท
+DEFAULT_SEARCH_URLS = {
+    'google': 'https://www.google.com/search?q={query}',
+    'duckduckgo': 'https://duckduckgo.com/html/?q={query}',
+    'bing': 'https://www.bing.com/search?q={query}',
+    'yellowpages': 'https://www.yellowpages.co.th/search?q={query}',
+    'thailandyp': 'https://www.thailandyp.com/search.php?keyword={query}',
+    'website': 'https://{domain}',
+}
+
+
+def parse_search_urls(spec):
+    """แปลงข้อความ "bing=http://127.0.0.1:8000/bing?q={query},..." เป็น dict
+
+    ชื่อแหล่งต้องอยู่ใน DEFAULT_SEARCH_URLS
+    """
+    urls = {}
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, template = item.partition('=')
+        name = name.strip().lower()
+        if name not in DEFAULT_SEARCH_URLS or not template:
+            raise ValueError(f"Invalid search URL setting: {item!r}")
+        urls[name] = template.strip()
+    return urls
+
+
+def parse_sources(spec):
+    """แปลง "duckduckgo,bing" เป็น tuple ของชื่อแหล่ง (ค่าว่าง = ทุกแหล่ง)"""
+    aliases = [alias.strip().lower() for alias in spec.split(',') if alias.strip()]
+    unknown = [alias for alias in aliases if alias not in SOURCE_ALIASES]
+    if unknown:
+        raise ValueError(f"Unknown search sources: {', '.join(unknown)} "
+                         f"(choose from {', '.join(SOURCE_ALIASES)})")
+    return tuple(SOURCE_ALIASES[alias] for alias in aliases or SOURCE_ALIASES)
+
+
+def search_url(templates, name, query='', domain=''):
+    """URL ของแหล่ง name สำหรับคำค้น query"""
+    return templates[name].format(query=query.replace(' ', '+'), domain=domain)
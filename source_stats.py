@@ -0,0 +1,253 @@
+"""สถิติของแต่ละแหล่งค้นหา (อัตราที่พบข้อมูล ความครบ และเวลา) และการจัดลำดับแหล่งแบบ bandit"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: ไม่ล็อกไฟล์ระหว่างรวมสถิติ
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('email', 'phone', 'website')
+
+
+class _SourceCounters:
+    __slots__ = ('attempts', 'hits', 'fields', 'latency', 'updated')
+
+    def __init__(self, attempts=0, hits=0, fields=None, latency=0.0, updated=None):
+        self.attempts = attempts
+        self.hits = hits
+        self.fields = Counter(fields or {})
+        self.latency = latency
+        # เวลา (time.time) ที่ลดน้ำหนักตัวเลขครั้งล่าสุด None = ยังไม่เคย
+        self.updated = updated
+
+    def add(self, other):
+        self.attempts += other.attempts
+        self.hits += other.hits
+        self.fields.update(other.fields)
+        self.latency += other.latency
+
+    def scale(self, factor):
+        self.attempts *= factor
+        self.hits *= factor
+        self.latency *= factor
+        for field in self.fields:
+            self.fields[field] *= factor
+
+    def as_dict(self):
+        return {'attempts': self.attempts, 'hits': self.hits,
+                'fields': dict(self.fields), 'latency': self.latency, 'updated': self.updated}
+
+
+@contextmanager
+def _file_lock(path):
+    """ล็อกไฟล์สถิติข้ามโปรเซส ระหว่างอ่านค่าบนดิสก์ รวม และเขียนกลับ"""
+    if fcntl is None:
+        yield
+        return
+    with open(path + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_counters(path):
+    """{แหล่ง: _SourceCounters} จากไฟล์ (ไม่มีไฟล์หรืออ่านไม่ได้คืน {})"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not load source stats from {path}: {e}")
+        return {}
+    return {name: _SourceCounters(**values) for name, values in data.items()}
+
+
+class SourceStats:
+    """นับผลของแต่ละแหล่ง และเลือกลำดับแหล่งของแต่ละแถวด้วย Thompson sampling
+
+    คะแนนของแหล่ง = อัตราที่พบข้อมูล (สุ่มจาก Beta(hits + 1, misses + 1)) หารด้วย
+    เวลาเฉลี่ย แหล่งที่ถูกและมีโอกาสพบสูงจึงได้ไปก่อน ส่วนแหล่งที่ลองแล้ว
+    อย่างน้อย min_attempts ครั้งแต่พบน้อยกว่า skip_below จะถูกข้าม ยกเว้น
+    สุ่มได้ explore เพื่อให้สถิติยังอัปเดตได้
+
+    ถ้ามี parent (สถิติรวมข้ามงาน) จะบันทึกผลลงทั้งสองที่และใช้ตัวเลขของ parent
+    ในการตัดสินใจ ส่วนตัวเองเก็บสถิติและการตัดสินใจของงานนี้ไว้แสดงใน summary
+
+    ตัวเลขลดน้ำหนักลงครึ่งหนึ่งทุก half_life วินาที และถูกย่อให้เหลือไม่เกิน window ครั้ง
+    (None = ไม่ลด) ผลล่าสุดจึงมีน้ำหนักมากกว่า แหล่งที่เคยถูกข้ามเพราะพบน้อยจะกลับมาถูกลอง
+    เมื่อน้ำหนักของผลเก่าลดลงจนต่ำกว่า min_attempts และแหล่งที่กลับมาพบข้อมูลได้
+    จะได้อัตราใหม่ภายในไม่กี่สิบครั้ง
+
+    save รวมเฉพาะผลที่บันทึกหลัง load/save ครั้งก่อนเข้ากับค่าในไฟล์ หลายโปรเซส
+    (shard ของ batch.py หรือ queue_worker.py --processes) จึงใช้ไฟล์เดียวกันได้โดยไม่ทับกัน
+    """
+
+    def __init__(self, parent=None, min_attempts=30, skip_below=0.02, explore=0.05,
+                 default_latency=5.0, rng=None, half_life=None, window=None, clock=time.time):
+        self.parent = parent
+        self.min_attempts = min_attempts
+        self.skip_below = skip_below
+        self.explore = explore
+        self.default_latency = default_latency
+        self.half_life = half_life
+        self.window = window
+        self._clock = clock
+        self.first_choice = Counter()
+        self.skipped = Counter()
+        self._sources = {}
+        # ผลที่บันทึกหลัง load/save ครั้งก่อน (ยังไม่อยู่ในไฟล์)
+        self._unsaved = {}
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+
+    def record(self, source, result, latency):
+        """บันทึกผลของแหล่งหนึ่งครั้ง result คือ (email, phone, website)"""
+        outcome = _SourceCounters(1, int(any(result)), {field: 1 for field, value in zip(FIELDS, result) if value},
+                                  latency)
+        with self._lock:
+            counters = self._counters(source, create=True)
+            counters.add(outcome)
+            self._age(counters, counters.updated)
+            self._unsaved.setdefault(source, _SourceCounters()).add(outcome)
+        if self.parent is not None:
+            self.parent.record(source, result, latency)
+
+    def _age(self, counters, now):
+        """ลดน้ำหนักตัวเลขตามเวลาที่ผ่านไปตั้งแต่ครั้งก่อน แล้วย่อให้ไม่เกิน window ครั้ง"""
+        if self.half_life and counters.updated is not None and now > counters.updated:
+            counters.scale(0.5 ** ((now - counters.updated) / self.half_life))
+        counters.updated = now
+        if self.window and counters.attempts > self.window:
+            counters.scale(self.window / counters.attempts)
+
+    def _counters(self, source, create=False):
+        """ตัวนับของแหล่ง (ลดน้ำหนักถึงปัจจุบันแล้ว) ต้องถือ _lock อยู่"""
+        counters = self._sources.get(source)
+        if counters is None:
+            counters = _SourceCounters()
+            if create:
+                self._sources[source] = counters
+        self._age(counters, self._clock())
+        return counters
+
+    def _decision_stats(self):
+        return self.parent if self.parent is not None else self
+
+    def _score(self, source):
+        stats = self._decision_stats()
+        with stats._lock:
+            counters = stats._counters(source)
+            attempts, hits, latency = counters.attempts, counters.hits, counters.latency
+        with self._lock:
+            sampled_rate = self._rng.betavariate(hits + 1, attempts - hits + 1)
+            explore = self._rng.random() < self.explore
+        mean_latency = latency / attempts if attempts else self.default_latency
+        skip = (attempts >= self.min_attempts and hits / attempts < self.skip_below and not explore)
+        return sampled_rate / max(mean_latency, 0.05), skip
+
+    def covers(self, source, fields):
+        """แหล่งนี้เคยให้ field ใดใน fields ในอัตราอย่างน้อย skip_below หรือไม่
+        (แหล่งที่ลองยังไม่ถึง min_attempts ครั้งถือว่าให้ได้)
+        """
+        stats = self._decision_stats()
+        with stats._lock:
+            counters = stats._counters(source)
+            attempts = counters.attempts
+            found = [counters.fields[field] for field in fields]
+        if attempts < self.min_attempts:
+            return True
+        return any(count / attempts >= self.skip_below for count in found)
+
+    def plan(self, sources):
+        """ลำดับแหล่งสำหรับแถวหนึ่งจากรายชื่อ sources (แหล่งที่ถูกข้ามจะไม่อยู่ในผล)
+
+        ต้องเหลืออย่างน้อยหนึ่งแหล่งเสมอ
+        """
+        scored = []
+        for rank, source in enumerate(sources):
+            score, skip = self._score(source)
+            scored.append((score, -rank, source, skip))
+        scored.sort(reverse=True)
+
+        ordered = [source for _, _, source, skip in scored if not skip] or [scored[0][2]]
+        with self._lock:
+            self.first_choice[ordered[0]] += 1
+            for _, _, source, skip in scored:
+                if source not in ordered:
+                    self.skipped[source] += 1
+        return ordered
+
+    def summary(self):
+        """สถิติของแต่ละแหล่งสำหรับแสดงใน summary ของงาน เรียงตามจำนวนครั้งที่ได้ไปก่อน"""
+        with self._lock:
+            names = set(self._sources) | set(self.first_choice) | set(self.skipped)
+            rows = []
+            for name in names:
+                counters = self._counters(name)
+                attempts = counters.attempts
+                rows.append({
+                    'source': name,
+                    'attempts': round(attempts, 1),
+                    'hit_rate': round(counters.hits / attempts, 3) if attempts else 0,
+                    'coverage': {field: round(counters.fields[field] / attempts, 3) if attempts else 0
+                                 for field in FIELDS},
+                    'avg_latency': round(counters.latency / attempts, 2) if attempts else None,
+                    'first_choice': self.first_choice[name],
+                    'skipped': self.skipped[name],
+                })
+        rows.sort(key=lambda row: (-row['first_choice'], -row['attempts'], row['source']))
+        return rows
+
+    def save(self, path):
+        """รวมผลที่ยังไม่ได้บันทึกเข้ากับสถิติในไฟล์ JSON (ที่โปรเซสอื่นอาจบันทึกไว้) แล้วเขียนกลับ
+
+        หลังบันทึก สถิติในหน่วยความจำจะเป็นค่ารวมล่าสุดจากไฟล์
+        """
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._lock:
+            unsaved, self._unsaved = self._unsaved, {}
+        try:
+            with _file_lock(path):
+                merged = _read_counters(path)
+                now = self._clock()
+                for name, counters in unsaved.items():
+                    merged.setdefault(name, _SourceCounters()).add(counters)
+                for counters in merged.values():
+                    self._age(counters, now)
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({name: counters.as_dict() for name, counters in merged.items()}, f,
+                              ensure_ascii=False)
+                os.replace(tmp_path, path)
+        except BaseException:
+            with self._lock:
+                for name, counters in unsaved.items():
+                    self._unsaved.setdefault(name, _SourceCounters()).add(counters)
+            raise
+        with self._lock:
+            for name, counters in self._unsaved.items():
+                merged.setdefault(name, _SourceCounters()).add(counters)
+            self._sources = merged
+
+    def load(self, path):
+        """อ่านสถิติที่บันทึกไว้ (ไม่มีไฟล์หรืออ่านไม่ได้ก็เริ่มจากศูนย์)"""
+        counters = _read_counters(path)
+        now = self._clock()
+        with self._lock:
+            for name, values in counters.items():
+                self._age(values, now)
+                self._sources[name] = values
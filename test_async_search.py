@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+import asyncio
+import socket
+import threading
+import time
+
+from app import ImprovedContactSearcher
+from async_search import AsyncSearchEngine
+from field_plan import meets_completeness
+from dns_cache import DomainResolver
+
+
+def resolve_all(host):
+    return None
+
+
+def test_meets_completeness():
+    """กฎความครบถ้วนของผลลัพธ์"""
+    assert meets_completeness(("a@b.com", "021234567", None), ("email", "phone"))
+    assert not meets_completeness(("a@b.com", None, "https://b.com"), ("email", "phone"))
+    assert meets_completeness((None, None, "https://b.com"), ())
+    assert not meets_completeness((None, None, None), ())
+
+
+def test_search_returns_first_complete_result_and_cancels_others():
+    """คืนผลทันทีเมื่อมีแหล่งที่ให้ข้อมูลครบ และยกเลิก request ที่ยังค้างอยู่"""
+    searcher = ImprovedContactSearcher(use_async=True, resolver=DomainResolver(resolve=resolve_all))
+    engine = AsyncSearchEngine(searcher, required_fields=("email", "phone"), include_selenium=False)
+    cancelled = []
+    
+    async def fake_fetch(url, timeout, **kwargs):
+        try:
+            if "duckduckgo" in url:
+                await asyncio.sleep(0.05)
+                return "ติดต่อ info@example.co.th โทร 02-123-4567"
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(url)
+            raise
+        return None
+    
+    engine.fetch = fake_fetch
+    try:
+        start = time.time()
+        email, phone, website, source = engine.run("example")
+        elapsed = time.time() - start
+    finally:
+        engine.close()
+    
+    assert (email, phone, source) == ("info@example.co.th", "021234567", "DuckDuckGo")
+    assert elapsed < 1
+    time.sleep(0.05)
+    assert any("bing.com" in url for url in cancelled)
+
+
+def test_search_picks_most_complete_partial_result():
+    """ถ้าไม่มีแหล่งใดครบ ให้รวมผลบางส่วนของทุกแหล่งเข้าด้วยกัน"""
+    searcher = ImprovedContactSearcher(use_async=True, resolver=DomainResolver(resolve=resolve_all))
+    engine = AsyncSearchEngine(searcher, required_fields=("email", "phone"), include_selenium=False)
+    
+    async def fake_fetch(url, timeout, **kwargs):
+        if "duckduckgo" in url:
+            return "https://example.co.th"
+        if "bing.com" in url:
+            return "sales@example.co.th https://example.co.th"
+        return None
+    
+    engine.fetch = fake_fetch
+    try:
+        email, phone, website, source = engine.run("example")
+    finally:
+        engine.close()
+    
+    assert (email, phone, website) == ("sales@example.co.th", None, "https://example.co.th")
+    assert "Bing" in source
+
+
+
+def test_direct_website_only_fetches_resolvable_domains():
+    """โดเมนที่เดาแต่ resolve ไม่ได้ต้องไม่ถูกยิง HTTP และอ่าน body แบบจำกัดขนาด"""
+    def resolve(host):
+        if host != "example.co.th":
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+    
+    searcher = ImprovedContactSearcher(use_async=True, resolver=DomainResolver(resolve=resolve))
+    engine = AsyncSearchEngine(searcher, include_selenium=False, direct_max_bytes=1024)
+    fetched = []
+    
+    async def fake_fetch(url, timeout, **kwargs):
+        fetched.append((url, kwargs.get("max_bytes")))
+        if url == "https://example.co.th":
+            return "info@example.co.th 02-123-4567"
+        return None
+    
+    engine.fetch = fake_fetch
+    try:
+        result = asyncio.run_coroutine_threadsafe(
+            engine._search_website_direct("example", None), engine._loop).result()
+    finally:
+        engine.close()
+    
+    assert result == ("info@example.co.th", "021234567", "https://example.co.th")
+    assert fetched == [("https://example.co.th", 1024)]
+
+
+def test_pages_are_parsed_and_stored_off_the_event_loop():
+    """แยกข้อมูลและบันทึกหน้าใน executor ไม่ใช่บน thread ของ event loop"""
+    searcher = ImprovedContactSearcher(use_async=True, resolver=DomainResolver(resolve=resolve_all))
+    engine = AsyncSearchEngine(searcher, include_selenium=False)
+    threads = []
+    
+    def store_page(company_name, source, url, html):
+        threads.append(("store", threading.current_thread()))
+    
+    def extract_contact_info(text):
+        threads.append(("extract", threading.current_thread()))
+        return "info@example.co.th", None, None
+    
+    async def fake_fetch(url, timeout, **kwargs):
+        return "info@example.co.th"
+    
+    searcher.store_page = store_page
+    searcher.extract_contact_info = extract_contact_info
+    engine.fetch = fake_fetch
+    try:
+        result = asyncio.run_coroutine_threadsafe(
+            engine._search_bing("example", None), engine._loop).result()
+    finally:
+        engine.close()
+    
+    assert result == ("info@example.co.th", None, None)
+    assert [step for step, _ in threads] == ["store", "extract"]
+    assert all(thread is not engine._thread for _, thread in threads)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+import csv
+
+import pandas as pd
+import pytest
+
+import app
+import batch
+from bench_search import StandInServer
+from company_io import ResultWriter, iter_result_rows
+from rate_limit import parse_host_rates
+
+
+@pytest.fixture
+def work(tmp_path, monkeypatch):
+    # batch.main ตั้งค่าผ่าน environment: คืนค่าเดิมหลังจบ test
+    for name in ("CACHE_PATH", "SEARCH_SOURCES", "SELENIUM_SEARCH", "REQUIRED_FIELDS",
+                 "HOST_RATES", "DEFAULT_HOST_RATE", "DEFAULT_HOST_BURST", "DRIVER_POOL_SIZE"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setitem(app.app.config, "SOURCE_STATS_PATH", "")
+    monkeypatch.setattr(app, "contact_cache", None)
+    return tmp_path
+
+
+def write_companies(path, companies):
+    pd.DataFrame({"Company": companies}).to_excel(path, index=False)
+    return str(path)
+
+
+def test_result_writer_csv_round_trip(tmp_path):
+    path = str(tmp_path / "out.csv")
+    writer = ResultWriter(path)
+    writer.append({"Company": "บริษัท ก", "Phone": "021234567"})
+    writer.close()
+    assert list(iter_result_rows(path)) == [
+        {"Company": "บริษัท ก", "Email": "", "Phone": "021234567", "Website": "", "Address": "",
+         "Source": "", "Cached": ""}]
+
+
+def test_shards_keep_duplicates_together_and_merge_in_order(work, monkeypatch):
+    searched = []
+    
+    def fake_search(self, company_name):
+        searched.append(company_name)
+        return f"info@{len(company_name)}.co.th", None, None, "Fake"
+    
+    monkeypatch.setattr(app.ImprovedContactSearcher, "comprehensive_search", fake_search)
+    companies = [f"company{i}" for i in range(12)] + ["Company3 Co., Ltd.", "บริษัท company5 จำกัด", ""]
+    input_path = write_companies(work / "input.xlsx", companies)
+    
+    shards = batch.split_into_shards(input_path, str(work / "w"), 3)
+    assert sum(count for _, count in shards) == len(companies)
+    assert batch.shard_of("Company3 Co., Ltd.", 3) == batch.shard_of("company3", 3)
+    
+    results = [batch.run_shard(path, str(work / "w"), 2) for path, count in shards]
+    assert all(progress["status"] == "completed" for progress in results)
+    assert len(searched) == 12
+    
+    output = str(work / "out.csv")
+    totals = batch.merge_shards(input_path, [p["result_path"] for p in results], output)
+    rows = list(iter_result_rows(output))
+    assert [row["Company"] for row in rows] == companies
+    assert rows[12]["Email"] == rows[3]["Email"] == "info@8.co.th"
+    assert rows[-1]["Source"] == "ไม่มีข้อมูล"
+    assert totals == {"rows": 15, "emails": 14, "phones": 0, "websites": 0}
+
+
+def test_cli_resumes_failed_shard(work, monkeypatch):
+    """shard ที่ล้มเหลวทำให้ exit code ไม่เป็นศูนย์ และรันซ้ำจะทำต่อจาก journal"""
+    calls = []
+    
+    def flaky_search(self, company_name):
+        calls.append(company_name)
+        if company_name == "c3" and calls.count("c3") == 1:
+            raise RuntimeError("network down")
+        return None, "021234567", None, "Fake"
+    
+    monkeypatch.setattr(app.ImprovedContactSearcher, "comprehensive_search", flaky_search)
+    input_path = write_companies(work / "input.xlsx", [f"c{i}" for i in range(6)])
+    output = str(work / "out.xlsx")
+    args = [input_path, "--output", output, "--processes", "1", "--workers", "1", "--sources", "bing"]
+    
+    assert batch.main(args) == 1
+    assert (work / "out.xlsx.work").is_dir()
+    assert batch.main(args) == 0
+    assert calls.count("c0") == 1
+    assert [row["Phone"] for row in iter_result_rows(output)] == ["021234567"] * 6
+    assert not (work / "out.xlsx.work").exists()
+
+
+def test_share_process_limits_divides_per_host_quota():
+    environ = {"HOST_RATES": "bing.com=2:4"}
+    batch.share_process_limits(2, environ)
+    rates = parse_host_rates(environ["HOST_RATES"])
+    assert rates["bing.com"] == (1.0, 2)
+    assert rates["google.com"] == (0.15, 1)
+    assert (environ["DEFAULT_HOST_RATE"], environ["DEFAULT_HOST_BURST"], environ["DRIVER_POOL_SIZE"]) == ("1", "2", "1")
+    
+    unchanged = {}
+    batch.share_process_limits(1, unchanged)
+    assert unchanged == {}
+
+
+def test_cli_rejects_unknown_source(work):
+    with pytest.raises(SystemExit):
+        batch.main([str(work / "input.xlsx"), "--sources", "altavista"])
+
+
+def test_cli_runs_shards_in_processes(work, monkeypatch):
+    """รันจริงหลายโปรเซสกับ server จำลอง (ไม่ใช้ Selenium และไม่ออกเครือข่าย)"""
+    server = StandInServer(latency=0, hit_rates={"duckduckgo": 1.0}).start()
+    try:
+        monkeypatch.setenv("SEARCH_URLS", ",".join(f"{k}={v}" for k, v in server.search_urls().items()))
+        monkeypatch.setenv("SOURCE_STATS_PATH", "")
+        monkeypatch.setenv("DNS_CACHE_PATH", "")
+        monkeypatch.setenv("DEFAULT_HOST_RATE", "1000")
+        monkeypatch.setenv("DEFAULT_HOST_BURST", "1000")
+        monkeypatch.setenv("CRAWL_CONTACT_PAGES", "0")
+        input_path = work / "input.csv"
+        with open(input_path, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows([["Company"]] + [[f"บริษัท ทดสอบ{i} จำกัด"] for i in range(10)])
+        
+        output = str(work / "out.xlsx")
+        assert batch.main([str(input_path), "--output", output, "--processes", "2", "--workers", "2",
+                           "--sources", "duckduckgo", "--no-cache"]) == 0
+    finally:
+        server.stop()
+    rows = list(iter_result_rows(output))
+    assert [row["Company"] for row in rows] == [f"บริษัท ทดสอบ{i} จำกัด" for i in range(10)]
+    assert all(row["Source"] == "DuckDuckGo" for row in rows)
+    assert set(server.requests) == {"duckduckgo:200"}
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+import pytest
+import requests
+
+from app import ImprovedContactSearcher
+from bench_search import StandInServer, bench_search, measure_startup, percentile
+from dns_cache import DomainResolver
+from rate_limit import HostRateLimiter
+from search_urls import DEFAULT_SEARCH_URLS, parse_search_urls
+from source_stats import SourceStats
+
+
+@pytest.fixture
+def server():
+    server = StandInServer(latency=0, hit_rates={name: 1.0 for name in ("duckduckgo", "bing")}).start()
+    yield server
+    server.stop()
+
+
+def resolve_all(host):
+    return None
+
+
+def make_searcher(server, **kwargs):
+    # resolver ของ test เอง: ไม่แตะ negative cache (cache/dns.sqlite3) ของเครื่องที่รัน test
+    return ImprovedContactSearcher(
+        search_urls=server.search_urls(),
+        use_selenium=False,
+        rate_limiter=HostRateLimiter({}, default_rate=1000, default_burst=1000, jitter=0),
+        source_stats=SourceStats(),
+        resolver=DomainResolver(resolve=resolve_all),
+        **kwargs,
+    )
+
+
+def test_parse_search_urls():
+    assert parse_search_urls("bing=http://127.0.0.1:8000/bing?q={query}, ") == {
+        "bing": "http://127.0.0.1:8000/bing?q={query}"}
+    with pytest.raises(ValueError):
+        parse_search_urls("altavista=http://example.com")
+
+
+def test_searcher_urls_are_redirected(server):
+    """ทุกแหล่ง (รวมโดเมนที่เดา) ชี้ไปที่ server จำลอง ส่วนค่าเริ่มต้นยังเป็น URL จริง"""
+    searcher = make_searcher(server)
+    urls = ([searcher.duckduckgo_url("abc"), searcher.bing_url("abc")]
+            + searcher.candidate_website_urls("abc") + searcher.directory_urls("abc"))
+    assert all(url.startswith(server.url) for url in urls)
+    default = ImprovedContactSearcher(resolver=DomainResolver(resolve=resolve_all))
+    assert default.bing_url("a b") == DEFAULT_SEARCH_URLS["bing"].format(
+        query="a+b+contact+email+phone+thailand")
+
+
+@pytest.mark.parametrize("use_async", [True, False])
+def test_comprehensive_search_against_stand_in(server, use_async):
+    searcher = make_searcher(server, use_async=use_async)
+    try:
+        email, phone, website, source = searcher.comprehensive_search("บริษัท ทดสอบ จำกัด")
+    finally:
+        searcher.close()
+    assert email.endswith(".co.th") and phone.startswith("02")
+    assert website.startswith(server.url)
+    assert any(key.startswith(("duckduckgo:", "bing:")) for key in server.requests)
+
+
+def test_stand_in_simulates_429():
+    server = StandInServer(latency=0, rate_429=1.0).start()
+    try:
+        response = requests.get(server.search_urls()["bing"].format(query="a"), timeout=5)
+    finally:
+        server.stop()
+    assert response.status_code == 429
+    assert server.requests == {"bing:429": 1}
+
+
+def test_bench_search_reports_throughput(server):
+    result = bench_search([f"บริษัท ทดสอบ{i} จำกัด" for i in range(8)], 2, lambda: make_searcher(server))
+    assert result["rows"] == 8
+    assert result["found_rate"] == 1
+    assert result["rows_per_min"] > 0
+    assert result["p50"] <= result["p95"]
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    assert percentile([3, 1, 2, 4], 50) == 2
+    assert percentile(list(range(1, 101)), 95) == 95
+
+
+def test_import_keeps_heavy_backends_lazy():
+    startup = measure_startup(repeat=1)
+    assert startup["status"] == 200
+    assert startup["loaded"] == []
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+import pytest
+
+import app
+import metrics
+from app import ImprovedContactSearcher
+from bench_search import StandInServer
+from backoff import RetryPolicy
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreakers, breaker_key, detect_block
+from dns_cache import DomainResolver
+from contact_cache import ContactCache
+from rate_limit import HostRateLimiter
+from source_stats import SourceStats
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_detect_block():
+    assert detect_block(429) == "429"
+    assert detect_block(403) == "403"
+    assert detect_block(404) is None
+    assert detect_block(200, "<div id='anomaly-modal'>") == "captcha"
+    assert detect_block(200, "Our systems have detected Unusual traffic from your computer network.") == "captcha"
+    assert detect_block(200, "<html>ok</html>", url="https://www.google.com/sorry/index?continue=x") == "captcha"
+    assert detect_block(200, "ติดต่อ info@example.co.th") is None
+    # ไดเรกทอรีฝัง recaptcha ในฟอร์มติดต่อของหน้าปกติได้
+    assert detect_block(200, "<form><div class='g-recaptcha'></div></form>", search_engine=False) is None
+    assert detect_block(200, "<div class='h-captcha'>") == "captcha"
+    assert detect_block(200, "Please verify you are a human", search_engine=False) == "captcha"
+
+
+def test_directory_breakers_are_per_host():
+    url = "https://www.yellowpages.co.th/search?q=acme"
+    assert breaker_key("Business Directories", url) == "Business Directories (yellowpages.co.th)"
+    assert breaker_key("Bing", "https://www.bing.com/search?q=acme") == "Bing"
+
+    breakers = CircuitBreakers(threshold=1)
+    assert breakers.observe(breaker_key("Business Directories", url), 200, "<div class='g-recaptcha'>") is None
+    assert breakers.state("Business Directories (yellowpages.co.th)") == CLOSED
+
+
+def test_breaker_opens_probes_and_backs_off():
+    clock = FakeClock()
+    breakers = CircuitBreakers(threshold=2, cooldown=10, max_cooldown=15, clock=clock)
+
+    breakers.observe("Bing", 429)
+    breakers.observe("Bing", 200, "results")
+    breakers.observe("Bing", 429)
+    assert breakers.state("Bing") == CLOSED
+    assert breakers.observe("Bing", 429) == "429"
+    assert breakers.state("Bing") == OPEN
+    assert not breakers.allow("Bing") and breakers.allow("DuckDuckGo")
+    assert breakers.snapshot() == [{"source": "Bing", "state": OPEN, "reason": "429", "retry_in": 10.0, "trips": 1}]
+
+    clock.now = 10
+    assert breakers.allow("Bing")
+    assert breakers.state("Bing") == HALF_OPEN
+    assert not breakers.allow("Bing")
+    breakers.observe("Bing", 200, "<div class='g-recaptcha'>")
+    assert breakers.state("Bing") == OPEN
+    assert breakers.snapshot()[0]["retry_in"] == 15.0
+
+    clock.now = 25
+    assert breakers.allow("Bing")
+    breakers.observe("Bing", 200, "results")
+    assert breakers.state("Bing") == CLOSED and breakers.snapshot() == []
+    assert metrics.breaker_transitions.value(source="Bing", state=OPEN) >= 2
+
+
+def test_disabled_breaker_never_skips():
+    breakers = CircuitBreakers(threshold=0)
+    for _ in range(5):
+        breakers.observe("Bing", 429)
+    assert breakers.allow("Bing") and breakers.state("Bing") == CLOSED
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_blocked_source_is_skipped_for_following_rows(use_async):
+    server = StandInServer(latency=0, rate_429=1.0).start()
+    breakers = CircuitBreakers(threshold=2, cooldown=60)
+    stats = SourceStats()
+    searcher = ImprovedContactSearcher(
+        use_async=use_async,
+        search_urls=server.search_urls(),
+        use_selenium=False,
+        sources=("Bing",),
+        rate_limiter=HostRateLimiter({}, default_rate=1000, default_burst=1000, jitter=0),
+        retry_policy=RetryPolicy(retries=0),
+        breakers=breakers,
+        source_stats=stats,
+    )
+    skipped_before = metrics.search_results.value(source="Bing", outcome="breaker_open")
+    try:
+        for i in range(5):
+            searcher.comprehensive_search(f"company{i}")
+    finally:
+        searcher.close()
+        server.stop()
+    assert server.requests == {"bing:429": 2}
+    assert breakers.state("Bing") == OPEN
+    assert metrics.search_results.value(source="Bing", outcome="breaker_open") - skipped_before == 3
+    # แถวที่ถูกบล็อกไม่ได้บอกว่า Bing ไม่มีข้อมูล จึงไม่นับเป็น miss
+    assert [row["attempts"] for row in stats.summary()] == [0]
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_rows_searched_while_a_source_is_paused_are_not_cached(use_async, tmp_path):
+    breakers = CircuitBreakers(threshold=1, cooldown=60)
+    for source in ("DuckDuckGo", "Bing", "Business Directories"):
+        breakers.observe(source, 429)
+    searcher = ImprovedContactSearcher(
+        use_async=use_async,
+        use_selenium=False,
+        sources=("DuckDuckGo", "Bing", "Business Directories"),
+        required_fields=("email", "phone"),
+        breakers=breakers,
+    )
+    cache = ContactCache(str(tmp_path / "cache.sqlite3"))
+    try:
+        row = app.search_company_row("ACME Widgets", lambda: searcher, cache)
+    finally:
+        searcher.close()
+
+    assert row["Source"] == "ไม่พบข้อมูล"
+    assert set(searcher.unavailable_sources) == {"DuckDuckGo", "Bing", "Business Directories"}
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_blocked_directory_only_skips_its_own_host(use_async):
+    breakers = CircuitBreakers(threshold=1, cooldown=60)
+    breakers.observe("Business Directories (yellowpages.co.th)", 429)
+    searcher = ImprovedContactSearcher(
+        use_async=use_async,
+        use_selenium=False,
+        sources=("Business Directories",),
+        required_fields=("phone",),
+        resolver=DomainResolver(resolve=lambda host: None),
+        breakers=breakers,
+    )
+    fetched = []
+
+    def fetch_text(url, timeout, max_bytes=None, source=None):
+        fetched.append(url)
+        return "โทร 02-123-4567"
+
+    async def fetch(url, timeout, **kwargs):
+        return fetch_text(url, timeout)
+
+    searcher.fetch_text = fetch_text
+    searcher.async_engine.fetch = fetch
+    try:
+        _, phone, _, source = searcher.comprehensive_search("ACME Widgets")
+        assert phone == "021234567" and source == "Business Directories"
+        assert [url for url in fetched if "yellowpages" in url] == []
+        assert searcher.unavailable_sources == ()
+
+        breakers.observe("Business Directories (thailandyp.com)", 429)
+        fetched.clear()
+        assert searcher.comprehensive_search("ACME Widgets")[:3] == (None, None, None)
+        assert fetched == []
+        assert searcher.unavailable_sources == ("Business Directories",)
+    finally:
+        searcher.close()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from company_io import MissingCompanyColumn, ResultWriter, count_company_rows, iter_company_names
+
+
+def test_reads_xlsx_and_csv_lazily(tmp_path):
+    """อ่านคอลัมน์ Company จาก .xlsx และ .csv ทีละแถว"""
+    companies = ["บริษัท เอ จำกัด", None, " Beta Co., Ltd. "]
+    xlsx_path = tmp_path / "input.xlsx"
+    csv_path = tmp_path / "input.csv"
+    pd.DataFrame({"No": [1, 2, 3], "Company": companies}).to_excel(xlsx_path, index=False)
+    pd.DataFrame({"No": [1, 2, 3], "Company": companies}).to_csv(csv_path, index=False)
+    
+    expected = ["บริษัท เอ จำกัด", "", "Beta Co., Ltd."]
+    for path in (xlsx_path, csv_path):
+        assert list(iter_company_names(str(path))) == expected
+        assert count_company_rows(str(path)) == 3
+
+
+def test_reads_parquet(tmp_path):
+    """อ่านไฟล์ .parquet ทีละ batch"""
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "input.parquet"
+    pd.DataFrame({"Company": ["A", "B"]}).to_parquet(path)
+    assert list(iter_company_names(str(path))) == ["A", "B"]
+    assert count_company_rows(str(path)) == 2
+
+
+def test_missing_company_column(tmp_path):
+    """ไฟล์ที่ไม่มีคอลัมน์ Company แจ้ง MissingCompanyColumn"""
+    path = tmp_path / "input.csv"
+    path.write_text("Name\nA\n", encoding="utf-8")
+    with pytest.raises(MissingCompanyColumn):
+        list(iter_company_names(str(path)))
+
+
+def test_result_writer_appends_rows(tmp_path):
+    """ResultWriter เขียนแถวต่อท้ายทีละแถวแล้วบันทึกเมื่อ close"""
+    path = tmp_path / "result.xlsx"
+    writer = ResultWriter(str(path))
+    for i in range(3):
+        writer.append({"Company": f"c{i}", "Email": f"info@c{i}.com"})
+    writer.close()
+    
+    rows = list(load_workbook(path, read_only=True).active.iter_rows(values_only=True))
+    assert rows[0][:2] == ("Company", "Email")
+    assert [row[:2] for row in rows[1:]] == [(f"c{i}", f"info@c{i}.com") for i in range(3)]
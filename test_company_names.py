@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+from company_names import canonicalize_company_name, normalize_company_name
+
+
+def test_normalize_collapses_spacing_and_case():
+    """normalize ลดช่องว่างซ้ำและเปลี่ยนเป็นตัวพิมพ์เล็ก"""
+    assert normalize_company_name("  ACME   Trading ") == "acme trading"
+
+
+def test_thai_and_english_legal_forms_are_removed():
+    """ชื่อเดียวกันที่เขียนรูปแบบนิติบุคคลต่างกันได้ชื่อมาตรฐานเดียวกัน"""
+    variants = [
+        "บริษัท ซีพี ออลล์ จำกัด (มหาชน)",
+        "ซีพี ออลล์ PCL",
+        "ซีพี ออลล์ Public Company Limited",
+        "บมจ. ซีพี ออลล์",
+    ]
+    assert {canonicalize_company_name(name) for name in variants} == {"ซีพี ออลล์"}
+    
+    assert canonicalize_company_name("Siam Cement Co., Ltd.") == "siam cement"
+    assert canonicalize_company_name("SIAM CEMENT COMPANY LIMITED") == "siam cement"
+
+
+def test_words_ending_like_legal_forms_are_kept():
+    """ไม่ตัดตัวอักษรที่เป็นส่วนหนึ่งของชื่อ และไม่คืนค่าว่าง"""
+    assert canonicalize_company_name("Costco") == "costco"
+    assert canonicalize_company_name("เคอีเอ็กซ์ (ประเทศไทย) จำกัด") == "เคอีเอ็กซ์ (ประเทศไทย)"
+    assert canonicalize_company_name("Company Limited") == "company limited"
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+import threading
+
+from contact_cache import ContactCache
+
+
+def test_cache_roundtrip_uses_normalized_name(tmp_path):
+    """ชื่อที่ต่างกันแค่ช่องว่างหรือตัวพิมพ์ใช้ cache รายการเดียวกัน"""
+    cache = ContactCache(str(tmp_path / "cache.sqlite3"))
+    cache.set("ACME  Trading", "info@acme.co.th", "021234567", None, "Bing")
+    assert cache.get(" acme trading ") == ("info@acme.co.th", "021234567", None, "Bing")
+    assert cache.get("other") is None
+
+
+def test_not_found_results_use_negative_ttl(tmp_path):
+    """ผลที่ไม่พบข้อมูลหมดอายุตาม negative_ttl"""
+    cache = ContactCache(str(tmp_path / "cache.sqlite3"), ttl=3600, negative_ttl=-1)
+    cache.set("found", "info@found.com", None, None, "Bing")
+    cache.set("missing", None, None, None, "ไม่พบข้อมูล")
+    assert cache.get("found") is not None
+    assert cache.get("missing") is None
+
+
+def test_eviction_keeps_recently_used_entries(tmp_path):
+    """เมื่อเกิน max_entries จะลบรายการที่ไม่ได้ใช้นานที่สุด"""
+    cache = ContactCache(str(tmp_path / "cache.sqlite3"), max_entries=3, evict_every=1)
+    for i in range(3):
+        cache.set(f"company{i}", f"info@c{i}.com", None, None, "Bing")
+    cache.get("company0")
+    cache.set("company3", "info@c3.com", None, None, "Bing")
+    
+    assert len(cache) == 3
+    assert cache.get("company0") is not None
+    assert cache.get("company1") is None
+
+
+def test_concurrent_readers_and_writers(tmp_path):
+    """หลาย thread อ่านและเขียนพร้อมกันได้โดยไม่ error"""
+    cache = ContactCache(str(tmp_path / "cache.sqlite3"), max_entries=50, evict_every=10)
+    errors = []
+    
+    def worker(n):
+        try:
+            for i in range(50):
+                cache.set(f"company{n}-{i}", "info@x.com", None, None, "Bing")
+                cache.get(f"company{n}-{i}")
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert not errors
+
+
+def test_result_of_a_narrower_search_is_a_miss_for_other_fields(tmp_path):
+    """ผลที่ค้นหาจนครบแค่ website ใช้ตอบงานที่ต้องการ email/phone ไม่ได้ แต่ผลที่ค้นหา
+    email/phone ครบทุกแหล่งแล้วใช้ได้แม้จะไม่พบ phone"""
+    cache = ContactCache(str(tmp_path / "cache.sqlite3"))
+    cache.set("acme", None, None, "https://acme.co.th", "Bing", ("website",))
+    cache.set("beta", "info@beta.co.th", None, None, "Bing", ("email", "phone"))
+    
+    assert cache.get("acme", ("website",)) == (None, None, "https://acme.co.th", "Bing")
+    assert cache.get("acme", ("email", "phone")) is None
+    assert cache.get("beta", ("email", "phone")) == ("info@beta.co.th", None, None, "Bing")
+    assert cache.get("beta", ("email",)) is not None
+    assert cache.get("beta", ("website",)) is None
+
+
+def test_cache_from_before_required_fields_is_upgraded(tmp_path):
+    """cache รุ่นเก่าที่ไม่มีคอลัมน์ required ยังอ่านได้ และถือว่าค้นหาแบบหยุดเมื่อพบอย่างใดอย่างหนึ่ง"""
+    import sqlite3
+    import time
+    
+    path = str(tmp_path / "cache.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE contacts (key TEXT PRIMARY KEY, email TEXT, phone TEXT, website TEXT, source TEXT,'
+                 ' created_at REAL NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)')
+    conn.execute('INSERT INTO contacts VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                 ("acme", None, None, "https://acme.co.th", "Bing", 0, time.time() + 3600, 0))
+    conn.commit()
+    conn.close()
+    
+    cache = ContactCache(path)
+    assert cache.get("acme") == (None, None, "https://acme.co.th", "Bing")
+    assert cache.get("acme", ("email",)) is None
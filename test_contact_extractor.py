@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+import time
+
+from bench_extractor import adversarial_page, legacy_extract_contact_info, synthetic_search_page
+from contact_extractor import extract_contact_info, extract_contact_info_html
+
+
+def test_extracts_first_valid_contact():
+    """เลือกผลแรกที่ผ่านตัวกรอง spam/exclude ตามลำดับ pattern เดิม"""
+    html = (
+        '<a href="https://www.facebook.com/acme">fb</a> noreply@acme.co.th '
+        'อีเมล sales@acme.co.th โทร 02-123 4567 หรือ +66812345678 '
+        'เว็บไซต์ www.acme.co.th https://acme.co.th/contact'
+    )
+    assert extract_contact_info(html) == ("sales@acme.co.th", "021234567", "https://acme.co.th/contact")
+
+
+def test_bare_domain_gets_https_prefix():
+    """ชื่อโดเมนที่ไม่มี scheme ได้ https:// นำหน้า"""
+    assert extract_contact_info("ดูที่ acme.co.th/about.") == (None, None, "https://acme.co.th/about")
+
+
+def test_matches_legacy_extractor_on_search_page():
+    """ผลลัพธ์ตรงกับ extract_contact_info เวอร์ชันเดิม"""
+    html = synthetic_search_page(200 * 1024)
+    assert extract_contact_info(html) == legacy_extract_contact_info(html)
+
+
+def test_adversarial_input_is_fast():
+    """ชื่อโดเมนยาวที่ไม่มี TLD ต้องไม่ทำให้ regex backtrack แบบกำลังสอง"""
+    html = adversarial_page(1024 * 1024)
+    start = time.perf_counter()
+    assert extract_contact_info(html) == (None, None, None)
+    assert time.perf_counter() - start < 2
+
+
+def test_html_extractor_ignores_scripts_and_reads_anchor_links():
+    """ข้อมูลใน script/style ไม่ถูกนับ และ mailto:/tel: ถูกใช้ก่อนข้อความ"""
+    html = (
+        '<html><head><style>.a{background:url(https://cdn.example.com/x.png)}</style>'
+        '<script>var tracker = "bot@tracker.com 0899999999 https://tracker.com";</script></head>'
+        '<body><svg><text>https://icons.example.net</text></svg>'
+        '<a href="mailto:Sales%40acme.co.th?subject=hello">อีเมล</a>'
+        '<a href="tel:+66-2-123-4567">โทร</a> เว็บไซต์ https://acme.co.th/contact</body></html>'
+    )
+    assert extract_contact_info(html)[0] == "bot@tracker.com"
+    assert extract_contact_info_html(html) == ("Sales@acme.co.th", "+6621234567", "https://acme.co.th/contact")
+
+
+def test_html_extractor_falls_back_to_regex_on_text():
+    """ข้อความที่ไม่มี anchor ให้ผลเหมือน extract_contact_info"""
+    text = "อีเมล sales@acme.co.th โทร 02-123 4567 www.acme.co.th"
+    assert extract_contact_info_html(text) == extract_contact_info(text)
+    assert extract_contact_info_html("") == (None, None, None)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+import asyncio
+import time
+
+from app import ImprovedContactSearcher
+from crawler import ContactCrawler, contact_links, site_root
+from dns_cache import DomainResolver
+
+
+def make_fetch(pages, fetched, delay=0.0):
+    async def fetch(url, timeout, **kwargs):
+        fetched.append(url)
+        if delay:
+            await asyncio.sleep(delay)
+        return pages.get(url)
+    return fetch
+
+
+def test_site_root():
+    assert site_root("example.co.th/th/home") == "https://example.co.th/"
+    assert site_root("http://example.co.th") == "http://example.co.th/"
+
+
+def test_contact_links_ranked_and_same_host():
+    """ลิงก์หน้าติดต่อมาก่อน ไม่เอาลิงก์ที่ไม่เกี่ยว และไม่ตามลิงก์ไปโดเมนอื่น"""
+    html = """
+    <a href="/products">สินค้า</a>
+    <a href="/about">เกี่ยวกับเรา</a>
+    <a href="/th/contact-us#map">ติดต่อเรา</a>
+    <a href="https://facebook.com/contact">Facebook</a>
+    """
+    links = contact_links(html, "https://example.co.th/")
+    assert links[0] == "https://example.co.th/th/contact-us"
+    assert links == ["https://example.co.th/th/contact-us", "https://example.co.th/about"]
+
+
+def test_crawl_fills_fields_from_contact_page():
+    pages = {
+        "https://example.co.th/": "<a href='/company/info'>ข้อมูลติดต่อบริษัท</a>",
+        "https://example.co.th/contact": "อีเมล sales@example.co.th",
+        "https://example.co.th/company/info": "โทร 02-123-4567",
+    }
+    fetched = []
+    crawler = ContactCrawler(make_fetch(pages, fetched), max_pages=20)
+    email, phone = asyncio.run(crawler.crawl("example.co.th", ("email", "phone")))
+    assert (email, phone) == ("sales@example.co.th", "021234567")
+
+
+def test_crawl_respects_robots_and_page_budget():
+    pages = {
+        "https://example.co.th/robots.txt": "User-agent: *\nDisallow: /contact\n",
+        "https://example.co.th/contact": "sales@example.co.th",
+    }
+    fetched = []
+    crawler = ContactCrawler(make_fetch(pages, fetched), max_pages=3)
+    email, phone = asyncio.run(crawler.crawl("https://example.co.th", ("email", "phone")))
+    assert (email, phone) == (None, None)
+    assert "https://example.co.th/contact" not in fetched
+    # robots.txt + ไม่เกิน max_pages หน้า
+    assert len(fetched) == 1 + 3
+
+
+def test_crawl_stops_at_deadline():
+    fetched = []
+    crawler = ContactCrawler(make_fetch({}, fetched, delay=5), deadline=0.2)
+    start = time.time()
+    assert asyncio.run(crawler.crawl("example.co.th")) == (None, None)
+    assert time.time() - start < 1
+
+
+def test_searcher_merges_crawled_fields():
+    """ผลจากแหล่งค้นหาที่มีแต่เว็บไซต์ถูกเติมด้วยข้อมูลจากหน้าติดต่อ"""
+    searcher = ImprovedContactSearcher(use_async=True, resolver=DomainResolver(resolve=lambda host: None))
+    pages = {"https://example.co.th/contact": "info@example.co.th โทร 02-123-4567"}
+    searcher.async_engine.fetch = make_fetch(pages, [])
+    try:
+        result = searcher.crawl_contact_pages("example", None, "021111111", "https://example.co.th", "Google")
+    finally:
+        searcher.close()
+    assert result == ("info@example.co.th", "021111111", "https://example.co.th", "Google + Contact Page (email)")
+
+
+def test_searcher_does_not_crawl_search_or_directory_sites():
+    """"เว็บไซต์" ที่เป็นเครื่องมือค้นหาหรือไดเรกทอรีเองไม่ถูกเปิดหาหน้าติดต่อ"""
+    searcher = ImprovedContactSearcher(use_async=True, resolver=DomainResolver(resolve=lambda host: None))
+    fetched = []
+    pages = {"https://www.yellowpages.co.th/contact": "info@yellowpages.co.th โทร 02-123-4567"}
+    searcher.async_engine.fetch = make_fetch(pages, fetched)
+    try:
+        for website in ("https://www.yellowpages.co.th/company/acme", "duckduckgo.com", "https://bing.com/maps"):
+            result = searcher.crawl_contact_pages("acme", None, None, website, "Bing")
+            assert result == (None, None, website, "Bing")
+    finally:
+        searcher.close()
+    assert fetched == []
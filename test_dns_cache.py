@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+import asyncio
+import socket
+import time
+
+from dns_cache import DomainResolver, NegativeDNSCache
+
+
+def test_missing_hosts_are_cached_on_disk(tmp_path):
+    """ชื่อที่ไม่มีอยู่จริงถูกจำไว้ และครั้งถัดไปไม่ต้อง resolve ซ้ำ"""
+    lookups = []
+    
+    def resolve(host):
+        lookups.append(host)
+        if host.startswith("missing"):
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        if host.startswith("flaky"):
+            raise socket.gaierror(socket.EAI_AGAIN, "Temporary failure in name resolution")
+    
+    path = str(tmp_path / "dns.sqlite3")
+    resolver = DomainResolver(NegativeDNSCache(path), resolve=resolve)
+    hosts = ["found.co.th", "missing.com", "flaky.net"]
+    assert resolver.resolve_many(hosts) == {"found.co.th": True, "missing.com": False, "flaky.net": False}
+    
+    # เปิด cache ใหม่จากไฟล์เดิม: missing.com ไม่ต้อง lookup อีก แต่ flaky.net ยังลองใหม่
+    lookups.clear()
+    resolver = DomainResolver(NegativeDNSCache(path), resolve=resolve)
+    assert asyncio.run(resolver.resolve_many_async(hosts)) == {
+        "found.co.th": True, "missing.com": False, "flaky.net": False}
+    assert sorted(lookups) == ["flaky.net", "found.co.th"]
+
+
+def test_negative_entries_expire(tmp_path):
+    """รายการใน negative cache หมดอายุตาม ttl"""
+    cache = NegativeDNSCache(str(tmp_path / "dns.sqlite3"), ttl=0.05)
+    cache.add("missing.com")
+    assert cache.missing(["missing.com", "other.com"]) == {"missing.com"}
+    time.sleep(0.1)
+    assert cache.missing(["missing.com"]) == set()
+
+
+def test_slow_lookups_do_not_block_past_timeout():
+    """ชื่อที่ resolve ไม่ทัน timeout ถือว่าใช้ไม่ได้ในรอบนี้"""
+    def resolve(host):
+        if host == "slow.com":
+            time.sleep(1)
+    
+    resolver = DomainResolver(timeout=0.1, resolve=resolve)
+    start = time.monotonic()
+    assert resolver.resolve_many(["fast.com", "slow.com"]) == {"fast.com": True, "slow.com": False}
+    assert time.monotonic() - start < 0.5
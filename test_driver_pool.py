@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+import time
+
+from driver_pool import DriverPool
+
+
+class FakeDriver:
+    def __init__(self):
+        self.alive = True
+        self.heap = 0
+        self.quit_called = False
+    
+    def get(self, url):
+        pass
+    
+    def execute_script(self, script):
+        if not self.alive:
+            raise RuntimeError("chrome not reachable")
+        return self.heap if "usedJSHeapSize" in script else 1
+    
+    def quit(self):
+        self.quit_called = True
+
+
+def make_pool(**kwargs):
+    launched = []
+    
+    def factory():
+        driver = FakeDriver()
+        launched.append(driver)
+        return driver
+    
+    return DriverPool(driver_factory=factory, **kwargs), launched
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_pool_prewarms_and_reuses_drivers():
+    """driver ถูกเปิดล่วงหน้าและใช้ซ้ำ ไม่เปิดใหม่ทุกครั้ง"""
+    pool, launched = make_pool(size=2)
+    pool.start(wait=True)
+    assert len(launched) == 2
+    
+    for _ in range(5):
+        with pool.driver() as driver:
+            driver.get("https://example.com")
+    assert len(launched) == 2
+
+
+def test_pool_recycles_after_max_pages():
+    """driver ที่โหลดครบ max_pages ถูกปิดและเปิดตัวใหม่แทน"""
+    pool, launched = make_pool(size=1, max_pages=2)
+    with pool.driver() as driver:
+        driver.get("https://example.com")
+        driver.get("https://example.com")
+    
+    assert launched[0].quit_called
+    assert wait_for(lambda: len(launched) == 2)
+    assert pool.restarts == 1
+
+
+def test_pool_recycles_on_memory_growth():
+    """driver ที่ใช้ JS heap เกินกำหนดถูก recycle"""
+    pool, launched = make_pool(size=1, max_memory_mb=1)
+    with pool.driver() as driver:
+        driver.driver.heap = 2 * 1024 * 1024
+    
+    assert launched[0].quit_called
+    assert wait_for(lambda: len(launched) == 2)
+
+
+def test_pool_replaces_crashed_driver_transparently():
+    """driver ที่ crash ระหว่างรอใน pool ถูกแทนที่ก่อนส่งให้ผู้ยืม"""
+    pool, launched = make_pool(size=1)
+    pool.start(wait=True)
+    launched[0].alive = False
+    
+    with pool.driver() as driver:
+        assert driver.driver is launched[1]
+    assert pool.restarts == 1
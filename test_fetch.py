@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app import ImprovedContactSearcher
+from async_search import AsyncSearchEngine
+from rate_limit import HostRateLimiter
+
+
+class LargePageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = ("<p>" + "ก" * 1000 + "</p>").encode("utf-8") * 1000
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def page_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), LargePageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_stops_reading_at_byte_limit(page_url):
+    """อ่าน body ไม่เกิน max_bytes ทั้งแบบ requests และ aiohttp (หน้าจริงยาว 3 MB)"""
+    searcher = ImprovedContactSearcher(use_async=True, rate_limiter=HostRateLimiter(jitter=0))
+    text = searcher.fetch_text(page_url, timeout=5, max_bytes=10000)
+    assert 0 < len(text) <= 10000
+    assert text.startswith("<p>กกก")
+    
+    engine = AsyncSearchEngine(searcher, include_selenium=False, max_page_bytes=20000)
+    try:
+        text = asyncio.run_coroutine_threadsafe(engine.fetch(page_url, timeout=5), engine._loop).result()
+    finally:
+        engine.close()
+    assert 0 < len(text) <= 20000
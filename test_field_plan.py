@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+import asyncio
+import random
+
+import app
+from app import ImprovedContactSearcher
+from async_search import AsyncSearchEngine
+from dns_cache import DomainResolver
+from field_plan import MergedResult, wanted_source
+from source_stats import SourceStats
+
+
+def test_merged_result_keeps_provenance_and_prefers_better_rank():
+    merged = MergedResult()
+    assert merged.add("Bing", (None, None, "https://b.com"), rank=2) == ["website"]
+    assert merged.add("DuckDuckGo", ("a@b.com", None, "https://www.b.com"), rank=1) == ["email", "website"]
+    assert merged.add("Business Directories", ("x@b.com", "021234567", None), rank=3) == ["phone"]
+
+    assert merged.as_tuple() == ("a@b.com", "021234567", "https://www.b.com")
+    assert merged.source_label() == "DuckDuckGo (email, website) + Business Directories (phone)"
+    assert merged.complete(("email", "phone"))
+    assert MergedResult().source_label() == "ไม่พบข้อมูล"
+
+
+def test_wanted_source_skips_sources_that_cannot_fill_missing_fields():
+    stats = SourceStats(rng=random.Random(0), min_attempts=10)
+    for _ in range(10):
+        stats.record("Bing", ("a@b.com", None, None), 1.0)
+    merged = MergedResult()
+    merged.add("DuckDuckGo", ("a@b.com", None, "https://b.com"))
+
+    assert stats.covers("Bing", ["email"]) and not stats.covers("Bing", ["phone"])
+    assert stats.covers("Unseen", ["phone"])
+    assert not wanted_source("Bing", merged, ("email", "phone"), stats)
+    assert wanted_source("Business Directories", merged, ("email", "phone"), stats)
+    assert not wanted_source("Direct Website", merged, ("email", "phone"))
+    assert wanted_source("Direct Website", merged, ("email", "phone"), crawl_known_website=False)
+    assert not wanted_source("Business Directories", merged, ("email",))
+
+
+def test_sequential_search_merges_fields_across_sources(monkeypatch):
+    monkeypatch.setitem(app.app.config, "ADAPTIVE_SOURCES", False)
+    searcher = ImprovedContactSearcher(use_async=False, use_selenium=False, required_fields=("email", "phone"))
+    calls = []
+
+    def stub(name, result):
+        def search(company_name):
+            calls.append(name)
+            return result
+        return search
+
+    searcher.search_duckduckgo = stub("DuckDuckGo", (None, None, "https://example.co.th"))
+    searcher.search_bing = stub("Bing", ("info@example.co.th", None, None))
+    searcher.search_company_website_direct = stub("Direct Website", ("x@example.co.th", "020000000", None))
+    searcher.search_business_directories = stub("Business Directories", (None, "021234567", None))
+
+    email, phone, website, source = searcher.sequential_search("example")
+
+    assert (email, phone, website) == ("info@example.co.th", "021234567", "https://example.co.th")
+    assert source == "Bing (email) + Business Directories (phone) + DuckDuckGo (website)"
+    assert calls == ["DuckDuckGo", "Bing", "Business Directories"]
+
+
+def test_async_search_cancels_sources_no_longer_needed():
+    searcher = ImprovedContactSearcher(use_async=True, resolver=DomainResolver(resolve=lambda host: None),
+                                       source_stats=SourceStats())
+    engine = AsyncSearchEngine(searcher, required_fields=("email", "phone"), include_selenium=False)
+    cancelled = []
+
+    async def fake_fetch(url, timeout, **kwargs):
+        try:
+            if "duckduckgo" in url:
+                await asyncio.sleep(0.02)
+                return "https://example.co.th"
+            if "bing.com" in url:
+                await asyncio.sleep(0.05)
+                return "info@example.co.th"
+            await asyncio.sleep(0.5 if "example.co.th" in url else 0.1)
+            return "โทร 02-123-4567"
+        except asyncio.CancelledError:
+            cancelled.append(url)
+            raise
+
+    engine.fetch = fake_fetch
+    try:
+        email, phone, website, source = engine.run("example")
+    finally:
+        engine.close()
+
+    assert (email, phone, website) == ("info@example.co.th", "021234567", "https://example.co.th")
+    assert "Bing" in source and "Business Directories (phone)" in source
+    assert any("example.co.th" in url and "duckduckgo" not in url and "bing" not in url for url in cancelled)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+import random
+
+import pytest
+import requests
+from urllib3.exceptions import NewConnectionError, ProtocolError
+
+import metrics
+from app import ImprovedContactSearcher
+from backoff import RetryPolicy, parse_retry_after
+from bench_search import StandInServer
+from http_session import retryable_error
+from rate_limit import HostRateLimiter
+
+
+def make_searcher(server, retries=2):
+    return ImprovedContactSearcher(
+        search_urls=server.search_urls(),
+        use_selenium=False,
+        rate_limiter=HostRateLimiter({}, default_rate=1000, default_burst=1000, jitter=0),
+        retry_policy=RetryPolicy(retries=retries, backoff=0.001),
+    )
+
+
+def fetch(searcher, url, use_async):
+    if use_async:
+        return searcher.async_engine.run_coroutine(searcher.async_engine.fetch(url, 5))
+    return searcher.fetch_text(url, timeout=5)
+
+
+def connection_counts():
+    return {kind: sum(metrics.http_connections.value(client=client, kind=kind)
+                      for client in ("requests", "aiohttp"))
+            for kind in ("new", "reused")}
+
+
+def test_backoff_grows_exponentially_with_bounded_jitter():
+    policy = RetryPolicy(retries=3, backoff=1, max_backoff=5, jitter=0.5, rng=random.Random(1))
+    for attempt, base in enumerate([1, 2, 4, 5, 5]):
+        assert base * 0.5 <= policy.delay(attempt) <= base * 1.5
+    assert policy.delay(0, retry_after=4) >= 4
+    assert policy.delay(0, retry_after=60) <= 7.5
+    assert policy.should_retry(2) and not policy.should_retry(3)
+    assert not policy.should_retry(0, method="POST")
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:10 GMT", now=1445412480) == 10.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_only_dropped_connections_are_retryable():
+    assert retryable_error(requests.ConnectionError(ProtocolError("Connection aborted.")))
+    assert retryable_error(requests.exceptions.ChunkedEncodingError())
+    assert not retryable_error(requests.ConnectionError(NewConnectionError(None, "refused")))
+    assert not retryable_error(requests.ConnectTimeout())
+    assert not retryable_error(requests.ReadTimeout())
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_retryable_status_is_retried_then_given_up(use_async):
+    server = StandInServer(latency=0, rate_429=1.0).start()
+    searcher = make_searcher(server, retries=2)
+    retries_before = metrics.http_retries.value(host="127.0.0.1", reason="429")
+    try:
+        assert fetch(searcher, server.search_urls()["bing"].format(query="a"), use_async) is None
+    finally:
+        searcher.close()
+        server.stop()
+    assert server.requests == {"bing:429": 3}
+    assert metrics.http_retries.value(host="127.0.0.1", reason="429") - retries_before == 2
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_connections_are_reused_across_requests(use_async):
+    server = StandInServer(latency=0).start()
+    searcher = make_searcher(server)
+    before = connection_counts()
+    try:
+        for query in ("a", "b", "c"):
+            assert fetch(searcher, server.search_urls()["bing"].format(query=query), use_async)
+    finally:
+        searcher.close()
+        server.stop()
+    after = connection_counts()
+    assert after["new"] - before["new"] == 1
+    assert after["reused"] - before["reused"] == 2
+    assert metrics.connection_reuse_rate() > 0
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+import threading
+
+import pytest
+
+from jobs import JobManager, JobQueueFull
+
+
+def test_jobs_keep_separate_progress():
+    """แต่ละงานมี progress ของตัวเอง และรันพร้อมกันไม่เกิน max_running"""
+    release = threading.Event()
+    running = []
+    lock = threading.Lock()
+    peak = [0]
+    
+    def run_job(job):
+        with lock:
+            running.append(job.job_id)
+            peak[0] = max(peak[0], len(running))
+        release.wait(5)
+        job.progress['current'] = len(job.filepath)
+        job.progress['results'] = {'filename': job.filepath}
+        with lock:
+            running.remove(job.job_id)
+    
+    manager = JobManager(run_job, max_running=2, max_queued=10)
+    jobs = [manager.submit(f"file{'x' * i}.xlsx") for i in range(4)]
+    release.set()
+    manager._queue.join()
+    
+    assert peak[0] <= 2
+    assert len({job.job_id for job in jobs}) == 4
+    for job in jobs:
+        snapshot = manager.get(job.job_id).snapshot()
+        assert snapshot['status'] == 'completed'
+        assert snapshot['results'] == {'filename': job.filepath}
+        assert snapshot['current'] == len(job.filepath)
+
+
+def test_queue_full_rejects_new_jobs():
+    """เมื่อคิวเต็มต้องปฏิเสธงานใหม่ แทนที่จะรับงานไม่จำกัด"""
+    release = threading.Event()
+    started = threading.Event()
+    
+    def run_job(job):
+        started.set()
+        release.wait(5)
+    
+    manager = JobManager(run_job, max_running=1, max_queued=1)
+    manager.submit("a.xlsx")
+    assert started.wait(5)
+    manager.submit("b.xlsx")
+    with pytest.raises(JobQueueFull):
+        manager.submit("c.xlsx")
+    
+    release.set()
+    manager._queue.join()
+    assert manager.latest().filepath == "b.xlsx"
+    assert manager.latest().progress['status'] == 'failed'
+
+
+def test_rows_per_second_excludes_resumed_rows():
+    manager = JobManager(lambda job: None, max_running=1)
+    job = manager.submit("a.xlsx")
+    manager._queue.join()
+    assert job.started_at is not None and job.finished_at >= job.started_at
+    job.started_at, job.finished_at = 100.0, 110.0
+    job.progress.update(current=50, resumed_rows=30)
+    assert job.rows_per_second() == 2.0
+    assert manager.jobs() == [job]
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+import asyncio
+
+import pytest
+
+import metrics
+from app import app
+from rate_limit import HostRateLimiter
+
+
+def test_render_text_format():
+    registry = metrics.Registry()
+    counter = registry.register(metrics.Counter("x_total", "Things", ["host", "status"]))
+    histogram = registry.register(metrics.Histogram("x_seconds", "Latency", ["source"], buckets=(0.1, 1)))
+    registry.register(metrics.Gauge("x_jobs", "Jobs", ["state"], callback=lambda: [({"state": "queued"}, 3)]))
+    counter.inc(host='a"b', status=200)
+    counter.inc(2, host='a"b', status=200)
+    histogram.observe(0.05, source="Bing")
+    histogram.observe(0.5, source="Bing")
+    
+    text = registry.render()
+    assert '# TYPE x_total counter\nx_total{host="a\\"b",status="200"} 3\n' in text
+    assert 'x_seconds_bucket{source="Bing",le="0.1"} 1\n' in text
+    assert 'x_seconds_bucket{source="Bing",le="+Inf"} 2\n' in text
+    assert 'x_seconds_sum{source="Bing"} 0.55\n' in text
+    assert 'x_seconds_count{source="Bing"} 2\n' in text
+    assert 'x_jobs{state="queued"} 3\n' in text
+    with pytest.raises(ValueError):
+        counter.inc(host="a")
+    with pytest.raises(ValueError):
+        registry.register(metrics.Counter("x_total", "again"))
+
+
+def outcome_count(source, outcome):
+    return metrics.search_results.value(source=source, outcome=outcome)
+
+
+def test_track_source_outcomes():
+    """ผลของแหล่งนับตามข้อมูลที่ได้ และ fetch ที่หมดเวลาระหว่างค้นหา"""
+    with metrics.track_source("T hit") as call:
+        call.result = ("a@b.co.th", None, None)
+    with metrics.track_source("T timeout") as call:
+        metrics.observe_response("example.com", "timeout")
+        call.result = (None, None, None)
+    with pytest.raises(RuntimeError):
+        with metrics.track_source("T error"):
+            raise RuntimeError("boom")
+    with metrics.track_source("T miss") as call:
+        call.result = (None, None, None)
+    
+    assert outcome_count("T hit", "hit") == 1
+    assert outcome_count("T timeout", "timeout") == 1
+    assert outcome_count("T error", "error") == 1
+    assert outcome_count("T miss", "miss") == 1
+    assert metrics.search_seconds.count(source="T hit") == 1
+
+
+def test_track_source_counts_fetches_in_child_tasks_and_cancellation():
+    async def child():
+        metrics.observe_response("example.com", "error")
+    
+    async def search():
+        with metrics.track_source("T child") as call:
+            await asyncio.ensure_future(child())
+            call.result = (None, None, None)
+    
+    async def slow():
+        with metrics.track_source("T cancelled"):
+            await asyncio.sleep(5)
+    
+    async def main():
+        await search()
+        task = asyncio.ensure_future(slow())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    
+    asyncio.run(main())
+    assert outcome_count("T child", "error") == 1
+    assert outcome_count("T cancelled", "cancelled") == 1
+    assert metrics.search_seconds.count(source="T cancelled") == 0
+
+
+def test_rate_limiter_records_wait():
+    limiter = HostRateLimiter({"metrics.test": (1.0, 1)}, jitter=0)
+    before = metrics.rate_limit_wait.count(host="metrics.test")
+    limiter.delay("https://metrics.test/a")
+    limiter.delay("https://metrics.test/b")
+    assert metrics.rate_limit_wait.count(host="metrics.test") == before + 2
+
+
+def test_metrics_endpoint():
+    response = app.test_client().get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    assert 'contact_jobs{state="queued"}' in text
+    assert "# TYPE contact_search_source_seconds histogram" in text
+
+
+def test_company_sites_share_one_host_label():
+    HostRateLimiter({"search.metrics.test": (1.0, 1)}, jitter=0)
+    before = metrics.http_responses.value(host="company_site", status=200)
+    metrics.observe_response("html.search.metrics.test", 200)
+    metrics.observe_response("acme-widgets.co.th", 200)
+    metrics.observe_response("another-company.com", 200)
+    assert metrics.http_responses.value(host="search.metrics.test", status=200) == 1
+    assert metrics.http_responses.value(host="company_site", status=200) - before == 2
+    assert 'host="acme-widgets.co.th"' not in metrics.REGISTRY.render()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+import os
+
+from openpyxl import load_workbook
+
+from page_store import PageStore
+from reextract import reextract
+
+
+def test_pages_are_deduplicated_and_compressed(tmp_path):
+    """หน้าที่เนื้อหาเหมือนกันเก็บไฟล์เดียว และอ่านกลับได้ตรงเดิม"""
+    store = PageStore(str(tmp_path))
+    html = "<html>" + "ติดต่อ info@example.co.th " * 1000 + "</html>"
+    first = store.put("Example Co., Ltd.", "Bing", "https://www.bing.com/search?q=a", html)
+    second = store.put("บริษัท อื่น จำกัด", "DuckDuckGo", "https://duckduckgo.com/html/?q=b", html)
+    
+    assert first == second
+    assert store.get(first) == html
+    assert store.total_bytes() < len(html.encode("utf-8")) // 10
+    blob_files = [name for _, _, files in os.walk(tmp_path) for name in files if name.endswith(".z")]
+    assert len(blob_files) == 1
+    assert [name for _, name in store.companies()] == ["Example Co., Ltd.", "บริษัท อื่น จำกัด"]
+    assert store.pages("example") == [("Bing", "https://www.bing.com/search?q=a", first)]
+
+
+def test_eviction_keeps_store_under_size_cap(tmp_path):
+    """เมื่อขนาดรวมเกิน max_bytes ต้องลบหน้าที่เก็บไว้นานที่สุดออก"""
+    store = PageStore(str(tmp_path), max_bytes=3000, evict_every=1)
+    digests = [store.put(f"company{i}", "Bing", f"https://b/{i}", os.urandom(1000).hex())
+               for i in range(5)]
+    
+    assert store.total_bytes() <= 3000
+    assert store.pages("company0") == []
+    assert store.pages("company4") == [("Bing", "https://b/4", digests[4])]
+
+
+def test_reextract_builds_sheet_offline(tmp_path):
+    """re-extract อ่านจาก store ด้วยหลายโปรเซส และรวมแต่ละ field จากหลายหน้าพร้อมแหล่งที่มา"""
+    root = str(tmp_path / "pages")
+    store = PageStore(root)
+    store.put("alpha", "Business Directories", "https://yp/alpha", "<p>sales@alpha.co.th</p>")
+    store.put("alpha", "Bing", "https://bing/alpha", "<p>https://alpha.co.th info@alpha.co.th</p>")
+    store.put("alpha", "Direct Website", "https://alpha.co.th", "<p>โทร 02-123-4567</p>")
+    store.put("alpha", "DuckDuckGo", "https://ddg/alpha", "<p>02-999-9999</p>")
+    store.put("beta", "Bing", "https://bing/beta", "<p>nothing here</p>")
+    
+    output = str(tmp_path / "out.xlsx")
+    assert reextract(root, output, processes=2) == 2
+    
+    rows = list(load_workbook(output, read_only=True).active.iter_rows(values_only=True))
+    assert rows[0] == ("Company", "Email", "Phone", "Website", "Source", "Url")
+    # ครบ email และเบอร์โทรแล้วจึงไม่ดูหน้า DuckDuckGo ส่วน email ใช้ของ Bing ซึ่งลำดับดีกว่าไดเรกทอรี
+    assert rows[1][:4] == ("alpha", "info@alpha.co.th", "021234567", "https://alpha.co.th")
+    assert rows[1][4:] == ("Bing (email, website) + Direct Website (phone)",
+                           "https://bing/alpha + https://alpha.co.th")
+    assert rows[2][0] == "beta" and rows[2][4] == "ไม่พบข้อมูล"
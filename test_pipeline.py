@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+import io
+import json
+import random
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import app
+from contact_cache import ContactCache
+from job_journal import JobJournal, JournalBusy, unfinished_jobs
+
+
+@pytest.fixture(autouse=True)
+def journal_folder(tmp_path, monkeypatch):
+    folder = tmp_path / "journals"
+    monkeypatch.setitem(app.app.config, "JOURNAL_FOLDER", str(folder))
+    monkeypatch.setitem(app.app.config, "SOURCE_STATS_PATH", str(tmp_path / "source_stats.json"))
+    return folder
+
+
+def test_process_companies_keeps_row_order(tmp_path, monkeypatch):
+    """ผลลัพธ์ต้องเรียงตามลำดับแถวเดิม แม้ worker จะค้นหาพร้อมกัน"""
+    thread_ids = set()
+    
+    def fake_search(self, company_name):
+        thread_ids.add(threading.get_ident())
+        time.sleep(random.uniform(0, 0.02))
+        return f"info@{company_name}.com", None, None, "Fake"
+    
+    monkeypatch.setattr(app.ImprovedContactSearcher, "comprehensive_search", fake_search)
+    monkeypatch.setitem(app.app.config, "RESULT_FOLDER", str(tmp_path))
+    monkeypatch.setattr(app, "contact_cache", None)
+    
+    companies = [""] + [f"company{i}" for i in range(20)]
+    input_path = tmp_path / "input.xlsx"
+    pd.DataFrame({"Company": companies}).to_excel(input_path, index=False)
+    
+    progress = app.process_companies_async(str(input_path), max_workers=4)
+    assert progress['completed']
+    assert progress['current'] == len(companies)
+    assert progress['results']['found_emails'] == 20
+    assert len(thread_ids) > 1
+    
+    result_df = pd.read_excel(tmp_path / progress['results']['filename']).fillna('')
+    assert result_df['Source'].iloc[0] == 'ไม่มีข้อมูล'
+    assert list(result_df['Email'][1:]) == [f"info@{c}.com" for c in companies[1:]]
+
+
+def test_cache_hits_skip_search(tmp_path, monkeypatch):
+    """แถวที่มีใน cache แล้วไม่ต้องค้นหาใหม่ และนับจำนวนใน summary"""
+    searched = []
+    
+    def fake_search(self, company_name):
+        searched.append(company_name)
+        return None, "021234567", None, "Fake"
+    
+    monkeypatch.setattr(app.ImprovedContactSearcher, "comprehensive_search", fake_search)
+    monkeypatch.setitem(app.app.config, "RESULT_FOLDER", str(tmp_path))
+    monkeypatch.setattr(app, "contact_cache", ContactCache(str(tmp_path / "cache.sqlite3")))
+    
+    input_path = tmp_path / "input.xlsx"
+    pd.DataFrame({"Company": ["alpha", "beta"]}).to_excel(input_path, index=False)
+    
+    progress = app.process_companies_async(str(input_path), max_workers=2)
+    assert progress['results']['from_cache'] == 0
+    
+    progress = app.process_companies_async(str(input_path), max_workers=2)
+    assert sorted(searched) == ["alpha", "beta"]
+    assert progress['results']['from_cache'] == 2
+    
+    result_df = pd.read_excel(tmp_path / progress['results']['filename']).fillna('')
+    assert list(result_df['Cached']) == ['ใช่', 'ใช่']
+    assert list(result_df['Source']) == ['Fake', 'Fake']
+
+
+def test_duplicate_companies_are_searched_once(tmp_path, monkeypatch):
+    """ชื่อที่ต่างกันแค่รูปแบบนิติบุคคลค้นหาครั้งเดียว แล้วคัดลอกผลไปทุกแถว"""
+    searched = []
+    
+    def fake_search(self, company_name):
+        searched.append(company_name)
+        return "info@siamcement.com", None, None, "Fake"
+    
+    monkeypatch.setattr(app.ImprovedContactSearcher, "comprehensive_search", fake_search)
+    monkeypatch.setitem(app.app.config, "RESULT_FOLDER", str(tmp_path))
+    monkeypatch.setattr(app, "contact_cache", None)
+    
+    companies = ["Siam Cement Co., Ltd.", "SIAM CEMENT Company Limited", "siam  cement", "Other Co"]
+    input_path = tmp_path / "input.xlsx"
+    pd.DataFrame({"Company": companies}).to_excel(input_path, index=False)
+    
+    progress = app.process_companies_async(str(input_path), max_workers=2)
+    
+    assert sorted(searched) == ["Other Co", "Siam Cement Co., Ltd."]
+    results = progress['results']
+    assert results['unique_companies'] == 2
+    assert results['dedupe_ratio'] == 0.5
+    
+    result_df = pd.read_excel(tmp_path / results['filename'])
+    assert list(result_df['Company']) == companies
+    assert list(result_df['Email']) == ["info@siamcement.com"] * 4
+
+
+def test_resume_from_journal_after_crash(tmp_path, monkeypatch, journal_folder):
+    """งานที่ล้มกลางทางทำต่อจากแถวที่บันทึกใน journal ด้วยรหัสงานเดิม โดยไม่ค้นหาแถวเดิมซ้ำ
+    (รวมแถวซ้ำของบริษัทที่ค้นหาไปแล้วก่อนล่ม)"""
+    searched = []
+    
+    def crashing_search(self, company_name):
+        if company_name == "company10":
+            raise RuntimeError("browser crashed")
+        return f"info@{company_name}.com", None, None, "Fake"
+    
+    def fake_search(self, company_name):
+        searched.append(company_name)
+        return f"info@{company_name}.com", None, None, "Fake"
+    
+    monkeypatch.setitem(app.app.config, "RESULT_FOLDER", str(tmp_path))
+    monkeypatch.setattr(app, "contact_cache", None)
+    
+    companies = [f"company{i}" for i in range(20)] + ["Company3", "company5"]
+    input_path = tmp_path / "input.xlsx"
+    pd.DataFrame({"Company": companies}).to_excel(input_path, index=False)
+    
+    monkeypatch.setattr(app.ImprovedContactSearcher, "comprehensive_search", crashing_search)
+    progress = app.process_companies_async(str(input_path), max_workers=2, job_id="job1")
+    assert progress['status'] == 'failed'
+    assert progress['results'] is None
+    assert len(list(journal_folder.glob("*.jsonl"))) == 1
+    
+    # จำลองโปรเซสล่มระหว่างเขียนบรรทัด: บรรทัดที่ไม่สมบูรณ์ต้องถูกตัดทิ้ง
+    with open(next(journal_folder.glob("*.jsonl")), "a", encoding="utf-8") as f:
+        f.write('{"Company": "compa')
+    assert unfinished_jobs(str(journal_folder)) == [("job1", str(input_path))]
+    
+    submitted = []
+    monkeypatch.setattr(app, "row_queue", None)
+    monkeypatch.setattr(app.job_manager, "submit", lambda filepath, job_id=None: submitted.append((job_id, filepath)))
+    assert app.resume_unfinished_jobs() == 1
+    assert submitted == [("job1", str(input_path))]
+    
+    monkeypatch.setattr(app.ImprovedContactSearcher, "comprehensive_search", fake_search)
+    results = app.process_companies_async(str(input_path), max_workers=2, job_id="job1")['results']
+    assert sorted(searched) == sorted(companies[10:20])
+    assert results['resumed_rows'] == 10
+    assert results['total_companies'] == 22
+    assert results['unique_companies'] == 20
+    assert list(journal_folder.glob("*.jsonl")) == []
+    
+    result_df = pd.read_excel(tmp_path / results['filename'])
+    assert list(result_df['Company']) == companies
+    assert list(result_df['Email']) == [f"info@{c}.com" for c in companies[:20]] + ["info@company3.com", "info@company5.com"]
+
+
+def test_journals_are_per_job_and_checked_against_the_file(tmp_path, journal_folder):
+    """อัปโหลดไฟล์เนื้อหาเดียวกันซ้ำระหว่างงานแรกยังทำอยู่ได้ journal แยกกัน
+    และ journal ของรหัสงานเดิมที่เป็นของไฟล์อื่นถูกเริ่มใหม่"""
+    input_path = tmp_path / "input.csv"
+    input_path.write_text("Company\nalpha\n", encoding="utf-8")
+    first = JobJournal.open(str(journal_folder), str(input_path), job_id="a")
+    second = JobJournal.open(str(journal_folder), str(input_path), job_id="b")
+    with pytest.raises(JournalBusy):
+        JobJournal.open(str(journal_folder), str(input_path), job_id="a")
+    first.append({"Company": "alpha"})
+    first.close()
+    second.close()
+    first = JobJournal.open(str(journal_folder), str(input_path), job_id="a")
+    assert first.completed_rows == 1
+    first.close()
+    
+    input_path.write_text("Company\nbeta\n", encoding="utf-8")
+    journal = JobJournal.open(str(journal_folder), str(input_path), job_id="b")
+    assert journal.completed_rows == 0
+    journal.close()
+    reopened = JobJournal.open(str(journal_folder), str(input_path), job_id="b")
+    assert reopened.completed_rows == 0 and reopened.file_hash == journal.file_hash
+    reopened.close()
+
+
+def test_upload_progress_and_download_by_job_id(tmp_path, monkeypatch):
+    """อัปโหลดสองไฟล์ได้รหัสงานแยกกัน ดูความคืบหน้าและดาวน์โหลดผลของแต่ละงานได้"""
+    def fake_search(self, company_name):
+        return f"info@{company_name}.com", None, None, "Fake"
+    
+    monkeypatch.setattr(app.ImprovedContactSearcher, "comprehensive_search", fake_search)
+    monkeypatch.setitem(app.app.config, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setitem(app.app.config, "RESULT_FOLDER", str(tmp_path))
+    monkeypatch.setattr(app, "contact_cache", None)
+    
+    client = app.app.test_client()
+    job_ids = []
+    for name in ["alpha", "beta"]:
+        data = ("Company\n" + name + "\n").encode("utf-8")
+        response = client.post("/upload", data={"file": (io.BytesIO(data), "companies.csv")})
+        assert response.status_code == 200
+        job_ids.append(response.get_json()["job_id"])
+    assert job_ids[0] != job_ids[1]
+    
+    for job_id, name in zip(job_ids, ["alpha", "beta"]):
+        deadline = time.time() + 10
+        while not client.get(f"/progress/{job_id}").get_json()["completed"]:
+            assert time.time() < deadline
+            time.sleep(0.05)
+        progress = client.get(f"/progress/{job_id}").get_json()
+        assert progress["status"] == "completed"
+        
+        response = client.get(f"/download/{job_id}")
+        assert response.status_code == 200
+        result_df = pd.read_excel(io.BytesIO(response.data))
+        assert list(result_df["Email"]) == [f"info@{name}.com"]
+    
+    assert client.get("/progress/unknown").status_code == 404
+
+
+def test_progress_stream_pushes_row_events(tmp_path, monkeypatch):
+    """stream ส่ง event ของทุกแถวพร้อมยอดรวม และปิดเมื่องานเสร็จ"""
+    release = threading.Event()
+    
+    def fake_search(self, company_name):
+        release.wait(5)
+        if company_name == "beta":
+            return None, None, None, "ไม่พบข้อมูล"
+        return f"info@{company_name}.com", None, None, "Fake"
+    
+    monkeypatch.setattr(app.ImprovedContactSearcher, "comprehensive_search", fake_search)
+    monkeypatch.setitem(app.app.config, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setitem(app.app.config, "RESULT_FOLDER", str(tmp_path))
+    monkeypatch.setattr(app, "contact_cache", None)
+    
+    client = app.app.test_client()
+    data = "Company\nalpha\nbeta\n".encode("utf-8")
+    response = client.post("/upload", data={"file": (io.BytesIO(data), "companies.csv")})
+    job_id = response.get_json()["job_id"]
+    
+    response = client.get(f"/progress/{job_id}/stream")
+    assert response.mimetype == "text/event-stream"
+    release.set()
+    body = response.get_data(as_text=True)
+    
+    events = []
+    for chunk in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in chunk.split("\n") if not line.startswith(":"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    
+    rows = [data for event, data in events if event == "row" and data["state"] != "searching"]
+    assert [(row["row"], row["company"], row["state"]) for row in rows] == [
+        (1, "alpha", "found"), (2, "beta", "not_found")]
+    assert rows[0]["email"] == "info@alpha.com"
+    
+    event, final = events[-1]
+    assert event == "progress"
+    assert final["completed"] and final["status"] == "completed"
+    assert final["found"] == {"emails": 1, "phones": 0, "websites": 0}
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+import asyncio
+import time
+
+import pytest
+
+from rate_limit import HostRateLimiter, TokenBucket, host_key, parse_host_rates
+
+
+def test_host_key_and_parse_rates():
+    """host ตัด www. และ port ออก และอ่านอัตราจากข้อความ config ได้"""
+    assert host_key("https://www.Bing.com:443/search?q=a") == "bing.com"
+    assert host_key("https://html.duckduckgo.com/html/") == "html.duckduckgo.com"
+    assert parse_host_rates("google.com=0.3:2, bing.com=1") == {
+        "google.com": (0.3, 2), "bing.com": (1.0, 1)}
+    assert parse_host_rates("") == {}
+
+
+def test_token_bucket_reserves_in_order():
+    """ใช้ได้ทันทีตาม burst จากนั้นแต่ละคนต้องรอต่อคิวกันตาม rate"""
+    now = [0.0]
+    bucket = TokenBucket(rate=2, burst=2, clock=lambda: now[0])
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+    
+    now[0] = 10.0
+    assert bucket.reserve() == 0.0
+
+
+def test_limiter_only_waits_for_busy_host():
+    """host ที่โควตาหมดต้องรอ แต่ host อื่นยังยิงได้ทันที"""
+    limiter = HostRateLimiter({"google.com": (1, 1)}, default_rate=100, default_burst=10, jitter=0)
+    assert limiter.delay("https://www.google.com/search?q=a") == 0
+    assert limiter.delay("https://www.google.com/search?q=b") > 0.9
+    
+    start = time.monotonic()
+    for i in range(5):
+        limiter.wait(f"https://example{i % 2}.co.th/")
+    asyncio.run(limiter.wait_async("https://www.bing.com/search?q=a"))
+    assert time.monotonic() - start < 0.1
+
+
+def test_subdomain_uses_parent_rate():
+    """โดเมนย่อยใช้โควตาตามที่ตั้งไว้ของโดเมนแม่"""
+    limiter = HostRateLimiter({"duckduckgo.com": (0.5, 1)}, default_rate=100, jitter=0)
+    assert limiter.delay("https://html.duckduckgo.com/html/") == 0
+    assert limiter.delay("https://html.duckduckgo.com/html/") == pytest.approx(2.0, abs=0.01)
+
+
+def test_buckets_of_unconfigured_hosts_are_capped():
+    """เก็บถังของเว็บไซต์บริษัทไว้แค่ max_hosts ถังที่ใช้ล่าสุด ส่วน host ที่ตั้งอัตราไว้ไม่ถูกทิ้ง"""
+    limiter = HostRateLimiter({"google.com": (1, 1)}, default_rate=1, default_burst=1, jitter=0, max_hosts=2)
+    limiter.delay("https://www.google.com/search?q=a")
+    limiter.delay("https://a.co.th/")
+    limiter.delay("https://b.co.th/")
+    assert limiter.delay("https://a.co.th/contact") > 0.9
+    for i in range(5):
+        limiter.delay(f"https://site{i}.co.th/")
+    
+    assert len(limiter._site_buckets) == 2
+    assert limiter.delay("https://a.co.th/") == 0
+    assert limiter.delay("https://www.google.com/search?q=b") > 0.9
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import app
+from company_io import iter_result_rows
+from queue_worker import QueueWorker
+from row_queue import FAILED_RESULT, RowQueue
+
+
+def found_row(company_name):
+    return {"Company": company_name, "Email": f"info@{company_name}.co.th", "Phone": "", "Website": "",
+            "Address": "", "Source": "Fake", "Cached": ""}
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return RowQueue(str(tmp_path / "rows.sqlite3"), lease_seconds=60)
+
+
+def test_duplicates_wait_for_first_row_and_results_keep_order(queue):
+    assert queue.enqueue("job", "input.xlsx", ["alpha", "Beta Co., Ltd.", "ALPHA", "beta"])
+    assert not queue.enqueue("job", "input.xlsx", ["alpha"])
+    assert queue.counts("job") == {"pending": 2, "waiting": 2}
+
+    claimed = queue.claim("w1", limit=10)
+    assert [row_index for _, row_index, _ in claimed] == [0, 1]
+    for job_id, row_index, company_name in claimed:
+        queue.complete(job_id, row_index, found_row(company_name))
+
+    rows = queue.results("job")
+    assert [row_index for row_index, _ in rows] == [0, 1, 2, 3]
+    assert list(queue.iter_results("job", page_size=3)) == rows
+    assert [row["Company"] for _, row in rows] == ["alpha", "Beta Co., Ltd.", "ALPHA", "beta"]
+    assert [row["First"] for _, row in rows] == [True, True, False, False]
+    assert rows[2][1]["Email"] == "info@alpha.co.th"
+    # ค้นหาครบแล้วแต่ยังไม่ได้เขียนไฟล์ผลลัพธ์ ต้องยังอยู่ในรายการให้หน้าเว็บทำต่อ
+    assert queue.unfinished_jobs() == [("job", "input.xlsx")]
+
+    queue.remove("job")
+    assert queue.total("job") is None
+    assert queue.unfinished_jobs() == []
+
+
+def test_expired_lease_is_reclaimed_then_failed_after_max_attempts(tmp_path):
+    queue = RowQueue(str(tmp_path / "rows.sqlite3"), lease_seconds=0.05, max_attempts=2)
+    queue.enqueue("job", "input.xlsx", ["alpha"])
+
+    assert queue.claim("crashed") == [("job", 0, "alpha")]
+    assert queue.claim("other") == []
+    time.sleep(0.1)
+    assert queue.claim("other") == [("job", 0, "alpha")]
+    time.sleep(0.1)
+
+    assert queue.claim("third") == []
+    [(_, row)] = queue.results("job")
+    assert row["Source"] == FAILED_RESULT["Source"]
+
+
+def test_extend_keeps_lease_of_slow_row(tmp_path):
+    queue = RowQueue(str(tmp_path / "rows.sqlite3"), lease_seconds=0.2)
+    queue.enqueue("job", "input.xlsx", ["alpha"])
+    queue.claim("w1")
+    for _ in range(3):
+        time.sleep(0.1)
+        queue.extend("w1", [("job", 0)])
+        assert queue.claim("w2") == []
+
+
+def test_concurrent_claims_never_share_a_row(queue):
+    queue.enqueue("job", "input.xlsx", [f"company{i}" for i in range(200)])
+    claimed = [[] for _ in range(8)]
+
+    def claim_all(index):
+        while True:
+            rows = queue.claim(f"w{index}", limit=3)
+            if not rows:
+                return
+            claimed[index].extend(row_index for _, row_index, _ in rows)
+
+    threads = [threading.Thread(target=claim_all, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    everything = [row_index for rows in claimed for row_index in rows]
+    assert sorted(everything) == list(range(200))
+
+
+def test_worker_retries_rows_that_raise(queue):
+    queue.enqueue("job", "input.xlsx", ["alpha", "beta", "gamma"])
+    calls = []
+
+    def search_row(company_name):
+        calls.append(company_name)
+        if company_name == "beta" and calls.count("beta") == 1:
+            raise RuntimeError("boom")
+        return found_row(company_name)
+
+    worker = QueueWorker(queue, search_row, threads=2, poll_interval=0.01)
+    assert worker.run(idle_exit=0.1) == 3
+    assert calls.count("beta") == 2
+    assert [row["Email"] for _, row in queue.results("job")] == [
+        "info@alpha.co.th", "info@beta.co.th", "info@gamma.co.th"]
+
+
+def test_web_job_waits_for_workers_and_writes_results(queue, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.app.config, "RESULT_FOLDER", str(tmp_path))
+    monkeypatch.setitem(app.app.config, "ROW_QUEUE_POLL_SECONDS", 0.01)
+    companies = [f"company{i}" for i in range(20)] + ["Company3 Co., Ltd.", ""]
+    input_path = str(tmp_path / "input.xlsx")
+    pd.DataFrame({"Company": companies}).to_excel(input_path, index=False)
+
+    searched = []
+
+    def search_row(company_name):
+        searched.append(company_name)
+        if not company_name:
+            return app.search_company_row(company_name, get_searcher=None)
+        return found_row(company_name)
+
+    stop = threading.Event()
+    workers = [QueueWorker(queue, search_row, threads=3, poll_interval=0.01) for _ in range(2)]
+    threads = [threading.Thread(target=worker.run, args=(stop,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    try:
+        progress = app.process_companies_queued(input_path, job_id="queued", queue=queue)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    assert progress["status"] == "completed", progress["message"]
+    assert progress["current"] == progress["total"] == len(companies)
+    assert progress["results"]["unique_companies"] == len(companies) - 1
+    assert len(searched) == len(companies) - 1
+    assert sum(worker.completed for worker in workers) == len(companies) - 1
+
+    rows = list(iter_result_rows(os.path.join(str(tmp_path), progress["results"]["filename"])))
+    assert [row["Company"] for row in rows] == companies
+    assert rows[20]["Email"] == "info@company3.co.th"
+    assert rows[21]["Source"] == "ไม่มีข้อมูล"
+    assert queue.total("queued") is None
+
+
+def test_enqueue_reads_rows_outside_the_write_lock(queue):
+    queue.enqueue("other", "other.xlsx", ["alpha"])
+    claimed_while_reading = []
+
+    def company_names():
+        for i in range(5):
+            # อีกโปรเซสยืมแถวได้ระหว่างที่ยังอ่านไฟล์ของงานนี้อยู่ และยังไม่ได้แถวของงานนี้
+            claimed_while_reading.extend(queue.claim(f"w{i}"))
+            yield f"company{i}"
+
+    assert queue.enqueue("job", "input.xlsx", company_names(), chunk_size=2)
+    assert claimed_while_reading == [("other", 0, "alpha")]
+    assert queue.total("job") == 5
+    assert len(queue.claim("w", limit=10)) == 5
+
+
+def test_worker_backs_off_while_queue_is_locked(queue):
+    queue.enqueue("job", "input.xlsx", ["alpha"])
+    real_claim = queue.claim
+    calls = []
+
+    def flaky_claim(worker, limit=1):
+        calls.append(worker)
+        if len(calls) <= 2:
+            raise sqlite3.OperationalError("database is locked")
+        return real_claim(worker, limit)
+
+    queue.claim = flaky_claim
+    worker = QueueWorker(queue, found_row, threads=1, poll_interval=0.01)
+    assert worker.run(idle_exit=0.1) == 1
+    assert len(calls) > 2
@@ -32,7 +32,7 @@ def test_search():
         print(f"✅ สถานะ: {'พบข้อมูล' if any([email, phone, website]) else 'ไม่พบข้อมูล'}")
         print()
     
-    searcher.close_driver()
+    searcher.close()
     print("🎉 ทดสอบเสร็จสิ้น!")
 
 if __name__ == "__main__":
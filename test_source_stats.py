@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+import random
+
+from source_stats import SourceStats
+
+
+def record_many(stats, source, hits, misses, latency):
+    for _ in range(hits):
+        stats.record(source, ("a@b.com", None, None), latency)
+    for _ in range(misses):
+        stats.record(source, (None, None, None), latency)
+
+
+def test_plan_prefers_cheap_source_that_hits():
+    """แหล่งที่เร็วและพบข้อมูลบ่อยได้ไปก่อน แหล่งที่ช้าอยู่ท้าย"""
+    stats = SourceStats(rng=random.Random(0), explore=0)
+    record_many(stats, "Selenium Google", hits=5, misses=5, latency=20.0)
+    record_many(stats, "DuckDuckGo", hits=6, misses=4, latency=0.5)
+    
+    plans = [stats.plan(["Selenium Google", "DuckDuckGo"]) for _ in range(50)]
+    assert sum(plan[0] == "DuckDuckGo" for plan in plans) >= 48
+    assert stats.first_choice["DuckDuckGo"] >= 48
+
+
+def test_plan_skips_sources_that_never_hit():
+    """แหล่งที่ลองพอแล้วแต่ไม่เคยพบข้อมูลถูกข้าม แต่ต้องเหลืออย่างน้อยหนึ่งแหล่ง"""
+    stats = SourceStats(rng=random.Random(0), min_attempts=10, explore=0)
+    record_many(stats, "Bing", hits=0, misses=20, latency=1.0)
+    record_many(stats, "DuckDuckGo", hits=5, misses=5, latency=1.0)
+    
+    assert stats.plan(["Bing", "DuckDuckGo"]) == ["DuckDuckGo"]
+    assert stats.plan(["Bing"]) == ["Bing"]
+    assert stats.skipped["Bing"] == 1
+
+
+def test_job_stats_feed_parent_and_persist(tmp_path):
+    """สถิติของงานบันทึกต่อไปยังสถิติรวม และสถิติรวมบันทึก/โหลดจากไฟล์ได้"""
+    parent = SourceStats()
+    job = SourceStats(parent=parent)
+    job.record("Bing", ("a@b.com", "021234567", None), 1.0)
+    job.record("Bing", (None, None, None), 3.0)
+    job.plan(["Bing"])
+    
+    (row,) = job.summary()
+    assert row["source"] == "Bing"
+    assert row["attempts"] == 2
+    assert row["hit_rate"] == 0.5
+    assert row["coverage"] == {"email": 0.5, "phone": 0.5, "website": 0}
+    assert row["avg_latency"] == 2.0
+    assert row["first_choice"] == 1
+    
+    path = str(tmp_path / "stats.json")
+    parent.save(path)
+    loaded = SourceStats()
+    loaded.load(path)
+    assert loaded.summary()[0]["attempts"] == 2
+    
+    missing = SourceStats()
+    missing.load(str(tmp_path / "missing.json"))
+    assert missing.summary() == []
+
+
+def test_save_merges_with_stats_saved_by_other_processes(tmp_path):
+    """โปรเซสที่ใช้ไฟล์เดียวกันรวมผลเข้าด้วยกัน ไม่ทับของกัน และบันทึกซ้ำไม่นับซ้ำ"""
+    path = str(tmp_path / "stats.json")
+    first, second = SourceStats(), SourceStats()
+    for stats in (first, second):
+        stats.load(path)
+    record_many(first, "Bing", hits=1, misses=1, latency=1.0)
+    record_many(second, "Bing", hits=0, misses=3, latency=1.0)
+    record_many(second, "DuckDuckGo", hits=2, misses=0, latency=1.0)
+    first.save(path)
+    second.save(path)
+    second.save(path)
+    
+    loaded = SourceStats()
+    loaded.load(path)
+    rows = {row["source"]: row for row in loaded.summary()}
+    assert rows["Bing"]["attempts"] == 5 and rows["Bing"]["hit_rate"] == 0.2
+    assert rows["DuckDuckGo"]["attempts"] == 2
+    assert {row["source"]: row["attempts"] for row in second.summary()} == {"Bing": 5, "DuckDuckGo": 2}
+
+
+def test_old_results_fade_so_a_skipped_source_is_tried_again():
+    """สถิติเก่าลดน้ำหนักตามเวลาและถูกจำกัดจำนวนครั้ง แหล่งที่เคยถูกข้ามจึงได้ลองใหม่"""
+    now = [0.0]
+    stats = SourceStats(rng=random.Random(0), min_attempts=10, explore=0, half_life=3600, window=40,
+                        clock=lambda: now[0])
+    
+    def bing():
+        return next(row for row in stats.summary() if row["source"] == "Bing")
+    
+    record_many(stats, "Bing", hits=0, misses=100, latency=1.0)
+    assert bing()["attempts"] == 40
+    assert stats.plan(["Bing", "DuckDuckGo"]) == ["DuckDuckGo"]
+    
+    now[0] = 3 * 3600
+    assert bing()["attempts"] == 5
+    assert "Bing" in stats.plan(["Bing", "DuckDuckGo"])
+    
+    record_many(stats, "Bing", hits=20, misses=0, latency=1.0)
+    assert bing()["hit_rate"] > 0.7
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+import asyncio
+import json
+import threading
+
+import pandas as pd
+
+import app
+import tracing
+
+
+def test_span_is_shared_no_op_without_tracer():
+    assert tracing.current() is None
+    assert tracing.span("a") is tracing.span("b", url="x")
+    with tracing.span("a"):
+        pass
+
+
+def test_tracer_records_nested_spans_per_thread(tmp_path):
+    tracer = tracing.Tracer("job1")
+    
+    def work(name):
+        token = tracing.activate(tracer)
+        try:
+            with tracing.span("row", "row", company=name):
+                with tracing.span("fetch", "http"):
+                    pass
+        finally:
+            tracing.deactivate(token)
+    
+    threads = [threading.Thread(target=work, args=(f"c{i}",), name=f"worker-{i}") for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    path = tmp_path / "trace.json"
+    tracer.save(str(path))
+    events = json.loads(path.read_text(encoding="utf-8"))["traceEvents"]
+    spans = [e for e in events if e["ph"] == "X"]
+    lanes = {e["args"]["name"] for e in events if e["name"] == "thread_name"}
+    
+    assert {e["name"] for e in spans} == {"row", "fetch"}
+    assert lanes == {"worker-0", "worker-1"}
+    for row in (e for e in spans if e["name"] == "row"):
+        fetch = next(e for e in spans if e["name"] == "fetch" and e["tid"] == row["tid"])
+        assert row["ts"] <= fetch["ts"] and fetch["ts"] + fetch["dur"] <= row["ts"] + row["dur"]
+    assert tracing.current() is None
+
+
+def test_async_tasks_get_own_lanes_and_errors_are_marked():
+    tracer = tracing.Tracer("job", max_events=3)
+    
+    async def source(name):
+        with tracing.span(name):
+            await asyncio.sleep(0.01)
+            if name == "Bing":
+                raise ValueError("blocked")
+    
+    async def main():
+        await asyncio.gather(source("DuckDuckGo"), source("Bing"), return_exceptions=True)
+    
+    asyncio.run(tracing.run_traced(tracer, main()))
+    spans = [e for e in tracer.events() if e["ph"] == "X"]
+    assert len({e["tid"] for e in spans}) == 2
+    assert next(e for e in spans if e["name"] == "Bing")["args"] == {"error": "ValueError"}
+    
+    for _ in range(3):
+        with tracer.span("extra"):
+            pass
+    assert tracer.dropped == 2
+
+
+def test_finished_tasks_hand_their_lane_to_the_next_task():
+    """แถวของ task ที่จบแล้วถูกใช้ซ้ำ จำนวนแถวจึงไม่โตตามจำนวน task"""
+    tracer = tracing.Tracer("job")
+    
+    async def source(name):
+        with tracing.span(name):
+            with tracing.span("fetch"):
+                await asyncio.sleep(0)
+    
+    async def main():
+        for i in range(50):
+            await asyncio.gather(source("DuckDuckGo"), source("Bing"))
+    
+    asyncio.run(tracing.run_traced(tracer, main()))
+    spans = [e for e in tracer.events() if e["ph"] == "X"]
+    assert len(spans) == 200
+    assert len({e["tid"] for e in spans}) == 2
+    assert len([e for e in tracer.events() if e["name"] == "thread_name"]) == 2
+
+
+def test_job_trace_is_downloadable(tmp_path, monkeypatch):
+    """งานที่เปิด TRACE_JOBS มีไฟล์ trace ของทุกแถวคู่กับไฟล์ผลลัพธ์"""
+    def fake_search(self, company_name):
+        with tracing.span("Fake"):
+            return None, "021234567", None, "Fake"
+    
+    monkeypatch.setattr(app.ImprovedContactSearcher, "concurrent_search", fake_search)
+    monkeypatch.setattr(app.ImprovedContactSearcher, "sequential_search", fake_search)
+    monkeypatch.setitem(app.app.config, "TRACE_JOBS", True)
+    monkeypatch.setitem(app.app.config, "RESULT_FOLDER", str(tmp_path))
+    monkeypatch.setitem(app.app.config, "JOURNAL_FOLDER", str(tmp_path / "journals"))
+    monkeypatch.setitem(app.app.config, "SOURCE_STATS_PATH", "")
+    monkeypatch.setattr(app, "contact_cache", None)
+    
+    input_path = tmp_path / "input.xlsx"
+    pd.DataFrame({"Company": ["alpha", "beta", "gamma"]}).to_excel(input_path, index=False)
+    progress = app.process_companies_async(str(input_path), max_workers=2, job_id="tracejob")
+    assert progress['results']['trace_filename'] == "contact_trace_tracejob.json"
+    
+    response = app.app.test_client().get("/download/tracejob/trace")
+    assert response.status_code == 200
+    events = json.loads(response.get_data())["traceEvents"]
+    names = [e["name"] for e in events if e["ph"] == "X"]
+    assert names.count("row") == 3
+    assert names.count("comprehensive_search") == 3
+    assert names.count("Fake") == 3
+    response.close()
+    
+    assert app.app.test_client().get("/download/other/trace").status_code == 404
@@ -0,0 +1,162 @@
+"""บันทึกช่วงเวลา (span) ของแต่ละแถวและแต่ละขั้นตอนการค้นหา แล้วส่งออกเป็นไฟล์
+Chrome trace-event JSON (เปิดด้วย chrome://tracing หรือ https://ui.perfetto.dev)
+
+tracer ของงานถูกเก็บใน context variable: โค้ดที่อยู่นอกงานที่เปิด tracing จะได้
+span ว่างตัวเดียวกันทุกครั้ง จึงแทบไม่มีค่าใช้จ่ายเมื่อปิดอยู่
+"""
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+import weakref
+from contextlib import nullcontext
+
+_current = contextvars.ContextVar('contact_tracer', default=None)
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'category', 'args', 'lane', 'started')
+
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.lane = self.tracer._lane(self.name)
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ended = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer._add(self.name, self.category, self.lane, self.started, ended, self.args)
+        return False
+
+
+class Tracer:
+    """เก็บ span ของงานหนึ่งงาน (ไม่เกิน max_events รายการ ที่เกินจะนับไว้ใน dropped)
+
+    span ที่เกิดใน thread เดียวกันอยู่แถวเดียวกันใน timeline ส่วน span ใน asyncio
+    task แยกแถวตาม task เพราะหลาย task ทำงานซ้อนกันบน thread เดียว แถวของ task
+    ที่จบแล้วถูกใช้ซ้ำกับ task ถัดไปบน thread เดียวกัน จำนวนแถวจึงเท่ากับจำนวน task
+    ที่ทำงานพร้อมกันมากที่สุด ไม่ใช่จำนวน task ทั้งหมดของงาน
+    """
+
+    def __init__(self, name='job', max_events=200000):
+        self.name = name
+        self.max_events = max_events
+        self.dropped = 0
+        self._origin = time.perf_counter_ns()
+        self._events = []
+        # แถวของ thread และ task ผูกกับตัว object (ไม่ใช่ ident/id ที่ถูกใช้ซ้ำได้หลัง object หายไป)
+        self._lanes = weakref.WeakKeyDictionary()
+        self._lane_names = []
+        self._task_lanes = weakref.WeakKeyDictionary()
+        self._free_task_lanes = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _new_lane(self, label):
+        lane = len(self._lane_names) + 1
+        self._lane_names.append((lane, label))
+        return lane
+
+    def _lane(self, span_name):
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        thread = threading.current_thread()
+        with self._lock:
+            if len(self._events) >= self.max_events:
+                # span นี้จะถูกนับเป็น dropped อยู่แล้ว ไม่ต้องสร้างแถวใหม่ให้
+                return 0
+            if task is None:
+                lane = self._lanes.get(thread)
+                if lane is None:
+                    lane = self._lanes[thread] = self._new_lane(thread.name)
+                return lane
+            lane = self._task_lanes.get(task)
+            if lane is None:
+                free = self._free_task_lanes.setdefault(thread, [])
+                lane = free.pop() if free else self._new_lane(f'{thread.name} async')
+                self._task_lanes[task] = lane
+                task.add_done_callback(lambda _, free=free, lane=lane: self._release_lane(free, lane))
+            return lane
+
+    def _release_lane(self, free, lane):
+        with self._lock:
+            free.append(lane)
+
+    def _add(self, name, category, lane, started, ended, args):
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': (started - self._origin) / 1000,
+            'dur': (ended - started) / 1000,
+            'pid': 1,
+            'tid': lane,
+        }
+        if args:
+            event['args'] = args
+        with self._lock:
+            if len(self._events) < self.max_events:
+                self._events.append(event)
+            else:
+                self.dropped += 1
+
+    def span(self, name, category='search', **args):
+        return _Span(self, name, category, args)
+
+    def events(self):
+        """event ทั้งหมดพร้อม metadata ชื่อ process และชื่อแถว"""
+        with self._lock:
+            events = list(self._events)
+            lane_names = list(self._lane_names)
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': self.name}}]
+        metadata.extend({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': lane, 'args': {'name': label}}
+                        for lane, label in lane_names)
+        return metadata + events
+
+    def save(self, path):
+        """เขียนไฟล์ trace (JSON object format) แบบ atomic"""
+        data = {'traceEvents': self.events(), 'displayTimeUnit': 'ms',
+                'otherData': {'job': self.name, 'dropped_events': self.dropped}}
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+def current():
+    """tracer ที่ทำงานอยู่ใน context นี้ (None ถ้าปิด)"""
+    return _current.get()
+
+
+def activate(tracer):
+    """ตั้ง tracer ให้ context นี้ คืน token สำหรับ deactivate"""
+    return _current.set(tracer)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def span(name, category='search', **args):
+    """context manager ของ span หนึ่งช่วง (ไม่ทำอะไรถ้าไม่มี tracer)"""
+    tracer = _current.get()
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, category, **args)
+
+
+async def run_traced(tracer, coro):
+    """รัน coro ใน task นี้โดยใช้ tracer (ใช้เมื่อส่ง coroutine ข้าม thread ไปยัง event loop อื่น)"""
+    _current.set(tracer)
+    return await coro